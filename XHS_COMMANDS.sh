@@ -85,8 +85,17 @@ cat /home/vimalinx/.openclaw/skills/xhs-auto-publisher/SKILL.md
 # 数据管理
 # ========================================
 
-# 查看运行记录
-cat /home/vimalinx/.openclaw/workspace/xhs-auto-records.json
+# 查看运行记录（最近 10 条和汇总）
+python3 /home/vimalinx/.openclaw/workspace/xhs_records.py --tail 10
+
+# 查看发布队列（待发布排期和各状态数量）
+python3 /home/vimalinx/.openclaw/workspace/xhs_publish_scheduler.py
+
+# 常驻发布循环（按排期发布队列中的笔记，需启用 publish_engine）
+python3 /home/vimalinx/.openclaw/workspace/xiaohongshu-auto-pipeline.py dispatch
+
+# 查看配图缓存大小（--max-mb 按上限清理最久未用的文件）
+python3 /home/vimalinx/.openclaw/workspace/xhs_artifact_cache.py
 
 # 查看测试报告
 cat /home/vimalinx/.openclaw/workspace/xhs-automation-test-report.json
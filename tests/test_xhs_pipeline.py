@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小红书自动化流水线测试
+发布引擎、发布记录、阶段 DAG、发布排期、产物缓存和配图缓存（不启动浏览器，不访问网络）
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import xhs_publish_engine
+import xhs_records
+from xhs_artifact_cache import ArtifactCache, cache_key, link_or_copy
+from xhs_publish_engine import PublishEngine
+from xhs_publish_scheduler import PublishScheduler, ScheduleStore, parse_windows, plan_slots
+from xhs_records import RecordStore
+from xhs_stage_dag import StageDAG, StageError
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+
+def load_script(name):
+    """按文件名加载脚本（文件名带连字符，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), PROJECT_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.cookies = []
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def new_page(self):
+        return FakePage()
+
+    async def storage_state(self, path):
+        Path(path).write_text(json.dumps({"cookies": self.cookies}), encoding="utf-8")
+
+
+class FakeBrowser:
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    """代替 async_playwright()：start() 得到的对象只需要 chromium.launch 和 stop"""
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def launch(self, headless=True):
+        return FakeBrowser()
+
+    async def stop(self):
+        pass
+
+
+def test_publish_engine():
+    """测试发布引擎：按账号分组，不同账号并发、同一账号串行，结果与输入顺序对应"""
+    print("\n" + "=" * 60)
+    print("测试发布引擎")
+    print("=" * 60)
+
+    active = {}
+    peak = {"total": 0, "per_account": 0}
+    calls = []
+
+    async def fake_publish(page, post, submit):
+        account = post["account"]
+        active[account] = active.get(account, 0) + 1
+        peak["total"] = max(peak["total"], sum(active.values()))
+        peak["per_account"] = max(peak["per_account"], active[account])
+        calls.append(post["title"])
+        await asyncio.sleep(0.01)
+        active[account] -= 1
+        return {"success": post["title"] != "b2", "message": "ok"}
+
+    posts = [
+        {"account": "a", "title": "a1"},
+        {"account": "b", "title": "b1"},
+        {"account": "a", "title": "a2"},
+        {"account": "b", "title": "b2"},
+        {"account": "c", "title": "c1"},
+    ]
+
+    original = xhs_publish_engine.async_playwright
+    xhs_publish_engine.async_playwright = FakePlaywright
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            accounts = {}
+            for account in ["a", "b"]:
+                cookies_file = Path(tmp_dir) / f"{account}.json"
+                cookies_file.write_text(json.dumps({"web_session": account}), encoding="utf-8")
+                accounts[account] = str(cookies_file)
+
+            engine = PublishEngine(accounts, max_concurrency=2, state_dir=Path(tmp_dir) / "state",
+                                   publish_func=fake_publish)
+
+            async def run():
+                async with engine:
+                    return await engine.publish_many(posts)
+
+            results = asyncio.run(run())
+            assert not engine.started
+            # 退出时保存各账号的登录状态
+            assert sorted(path.name for path in (Path(tmp_dir) / "state").iterdir()) == ["a.json", "b.json"]
+    finally:
+        xhs_publish_engine.async_playwright = original
+
+    assert [result["title"] for result in results] == ["a1", "b1", "a2", "b2", "c1"]
+    assert [result["success"] for result in results] == [True, True, True, False, False]
+    assert results[4]["message"] == "未配置账号: c"
+    # 同一账号按顺序串行，不同账号并发
+    assert calls.index("a1") < calls.index("a2") and calls.index("b1") < calls.index("b2")
+    assert peak == {"total": 2, "per_account": 1}
+    assert engine.stats == {"browser_launches": 1, "contexts_created": 2, "published": 3, "failed": 2}
+
+    print("\n✅ 发布引擎测试通过")
+
+
+def test_record_store():
+    """测试发布记录：旧版 JSON 迁移、追加与迁移共用锁、跳过未写完的最后一行和损坏的行"""
+    print("\n" + "=" * 60)
+    print("测试发布记录")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_file = Path(tmp_dir) / "records.json"
+        legacy = [
+            {"timestamp": "2024-01-01 10:00", "topic": "AI工具", "feedback": {"views": 10, "likes": 2}},
+            {"timestamp": "2024-01-02 10:00", "topic": "效率神器", "success": False, "views": 5},
+        ]
+        legacy_file.write_text(json.dumps(legacy, ensure_ascii=False), encoding="utf-8")
+
+        path = Path(tmp_dir) / "records.jsonl"
+        store = RecordStore(path, legacy_file=legacy_file)
+        assert list(store) == legacy
+        # 记录文件已存在时不再迁移
+        assert RecordStore(path, legacy_file=legacy_file).migrate(legacy_file) == 0
+
+        store.append_many([{"timestamp": "2024-01-03 10:00", "topic": "AI工具", "views": 1}])
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"timestamp": "2024-01-04')
+        # 正在写入的最后一行不读
+        assert [record["timestamp"] for record in store] == ["2024-01-01 10:00", "2024-01-02 10:00", "2024-01-03 10:00"]
+
+        # 写入中断后又追加了新记录：损坏的行跳过
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n")
+        store.append({"timestamp": "2024-01-05 10:00", "topic": "AI工具"})
+        assert [record["timestamp"] for record in store.iter_records(since="2024-01-02", topic="AI工具")] == \
+            ["2024-01-03 10:00", "2024-01-05 10:00"]
+        assert store.tail(1) == [{"timestamp": "2024-01-05 10:00", "topic": "AI工具"}]
+
+        summary = store.summary()
+        assert summary["total_posts"] == 4 and summary["successful_posts"] == 3
+        assert summary["total_views"] == 16 and summary["total_likes"] == 2
+
+        # 迁移持有锁文件时追加要等待，不会写进即将被 os.replace 换掉的旧文件
+        if xhs_records.fcntl is not None:
+            with open(store.lock_file, 'a') as lock, xhs_records._locked(lock):
+                writer = threading.Thread(target=store.append, args=({"timestamp": "2024-01-06 10:00"},))
+                writer.start()
+                writer.join(0.2)
+                assert writer.is_alive() and store.tail(1)[0]["timestamp"] == "2024-01-05 10:00"
+            writer.join()
+            assert store.tail(1) == [{"timestamp": "2024-01-06 10:00"}]
+
+    print("\n✅ 发布记录测试通过")
+
+
+def test_stage_dag():
+    """测试阶段 DAG：展开执行保持顺序并限制并发，超时的阶段使依赖它的阶段跳过，其余阶段照常完成"""
+    print("\n" + "=" * 60)
+    print("测试阶段 DAG")
+    print("=" * 60)
+
+    running = {"now": 0, "peak": 0}
+
+    async def render(spec, style):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        # 先开始的元素后完成
+        await asyncio.sleep(0.01 * (4 - spec))
+        running["now"] -= 1
+        return f"{style}-{spec}"
+
+    dag = StageDAG()
+    dag.add("specs", lambda topic: [1, 2, 3], ["topic"])
+    dag.add("style", lambda topic: topic.upper(), ["topic"])
+    dag.add("images", render, ["specs", "style"], fan_out="specs", item_arg="spec", max_concurrency=2)
+    dag.add("post", lambda images, style: {"images": images, "style": style}, ["images", "style"])
+    result = dag.run_sync({"topic": "ai"})
+    assert result["images"] == ["AI-1", "AI-2", "AI-3"]
+    assert result["post"] == {"images": ["AI-1", "AI-2", "AI-3"], "style": "AI"}
+    assert running["peak"] == 2
+    spans = {span["stage"]: span for span in result.spans}
+    assert spans["images"]["items"] == 3 and all(span["status"] == "ok" for span in result.spans)
+
+    # 互不依赖的阶段同时执行：两个阶段各自等待对方开始
+    async def run_parallel():
+        started = {"left": asyncio.Event(), "right": asyncio.Event()}
+
+        async def left():
+            started["left"].set()
+            await asyncio.wait_for(started["right"].wait(), 1)
+            return "left"
+
+        async def right():
+            started["right"].set()
+            await asyncio.wait_for(started["left"].wait(), 1)
+            return "right"
+
+        return await StageDAG().add("left", left).add("right", right).run()
+
+    result = asyncio.run(run_parallel())
+    assert (result["left"], result["right"]) == ("left", "right")
+
+    # 超时：依赖它的阶段跳过，不相关的阶段照常执行
+    async def hang(topic):
+        await asyncio.Event().wait()
+
+    dag = StageDAG()
+    dag.add("content", hang, ["topic"], timeout=0.05)
+    dag.add("publish", lambda content: content, ["content"])
+    dag.add("feedback", lambda publish: publish, ["publish"])
+    dag.add("images", lambda topic: [topic], ["topic"])
+    result = dag.run_sync({"topic": "ai"}, raise_on_error=False)
+    statuses = {span["stage"]: span["status"] for span in result.spans}
+    assert statuses == {"content": "timeout", "publish": "skipped", "feedback": "skipped", "images": "ok"}
+    assert list(result.errors) == ["content"] and result["images"] == ["ai"]
+    try:
+        dag.run_sync({"topic": "ai"})
+        raise AssertionError("超时应抛出 StageError")
+    except StageError as e:
+        assert e.stage == "content"
+
+    # 输入没有来源、依赖成环
+    for stages in [[("a", ["missing"])], [("a", ["b"]), ("b", ["a"])]]:
+        dag = StageDAG()
+        for name, inputs in stages:
+            dag.add(name, lambda **kwargs: None, inputs)
+        try:
+            dag.run_sync()
+            raise AssertionError("应拒绝无效的 DAG")
+        except ValueError:
+            pass
+
+    print("\n✅ 阶段 DAG 测试通过")
+
+
+def test_plan_slots():
+    """测试发布排期：只排在时段内，轮流使用各时段，避开已占用时间并保持间隔，每天不超过上限"""
+    print("\n" + "=" * 60)
+    print("测试发布排期")
+    print("=" * 60)
+
+    windows = parse_windows(["18:00-19:00", "07:00-08:00", "12:00-13:00"])
+    assert [begin.hour for begin, _ in windows] == [7, 12, 18]
+
+    start = datetime(2026, 1, 5, 7, 30)
+    taken = [datetime(2026, 1, 5, 12, 10)]
+    slots = plan_slots(7, windows, start, min_gap=timedelta(minutes=30), max_per_day=4, taken=taken)
+    # 第一天已占用一个，12 点时段离已占用时间太近，只能再排 3 篇；第二天先每个时段各取一个
+    assert [slot.strftime("%m-%d %H:%M") for slot in slots] == [
+        "01-05 07:30", "01-05 08:00", "01-05 18:00",
+        "01-06 07:00", "01-06 07:30", "01-06 12:00", "01-06 18:00",
+    ]
+    for slot in slots:
+        assert any(begin <= slot.time() <= end for begin, end in windows)
+    occupied = sorted(slots + taken)
+    assert all(later - earlier >= timedelta(minutes=30) for earlier, later in zip(occupied, occupied[1:]))
+
+    # 排不下时报错，而不是超出上限
+    try:
+        plan_slots(5, windows, start, max_per_day=4, max_days=1)
+        raise AssertionError("超出上限应报错")
+    except ValueError:
+        pass
+    try:
+        parse_windows(["10:00-09:00"])
+        raise AssertionError("结束早于开始的时段应报错")
+    except ValueError:
+        pass
+
+    print("\n✅ 发布排期测试通过")
+
+
+def test_schedule_store():
+    """测试排期队列：到点取出不重复，失败按退避重试，超时未发布和发布异常都会结束并回调，中断的发布可恢复"""
+    print("\n" + "=" * 60)
+    print("测试排期队列")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "schedule.db"
+        store = ScheduleStore(db_file)
+        other = ScheduleStore(db_file)
+        base = datetime(2026, 1, 5, 12, 0)
+        ids = store.add_many([(base + timedelta(minutes=minutes), {"title": f"p{minutes}"}) for minutes in [10, 0, 20]])
+        assert store.next_fire_at() == base
+        assert [post["title"] for _, post in store.pending()] == ["p0", "p10", "p20"]
+
+        # 两个发布进程不会取到同一条
+        claimed = store.claim_due(base + timedelta(minutes=10))
+        assert [entry["post"]["title"] for entry in claimed] == ["p0", "p10"]
+        assert claimed[0]["attempts"] == 1 and claimed[0]["fire_at"] == base
+        assert other.claim_due(base + timedelta(minutes=10)) == []
+        assert store.count_open(ids) == 3 and store.count_by_status() == {"pending": 1, "publishing": 2}
+
+        # 发布中的排期未超时不恢复，进程中断后恢复为待发布
+        assert store.recover(stale_after=3600) == 0
+        assert store.recover(stale_after=0) == 2
+        assert [entry["attempts"] for entry in other.claim_due(base + timedelta(minutes=10))] == [2, 2]
+        for entry in claimed:
+            store.finish(entry["id"], "done", {"success": True})
+        assert store.count_open(ids) == 1
+        # 已发布的时间仍算作占用，新排期会避开
+        assert sorted(store.slots(base)) == [base + timedelta(minutes=minutes) for minutes in [0, 10, 20]]
+        other.close()
+        store.close()
+
+        # 当天早些时候已发布的计入每日上限：上限 3 篇、当天已发 3 篇，新排期从第二天开始
+        scheduler = PublishScheduler(store=ScheduleStore(Path(tmp_dir) / "cap.db"), max_per_day=3,
+                                     windows=["07:00-10:00", "12:00-13:00", "18:00-19:00"])
+        day = datetime(2026, 1, 5)
+        for hour in [7, 8, 9]:
+            entry_id = scheduler.schedule_at({"title": f"h{hour}"}, day.replace(hour=hour))
+            scheduler.store.finish(entry_id, "done", {"success": True})
+        planned = [slot for slot, _ in scheduler.plan([{"title": "a"}, {"title": "b"}], day.replace(hour=11))]
+        assert [slot.strftime("%m-%d %H:%M") for slot in planned] == ["01-06 07:00", "01-06 12:00"]
+        scheduler.store.close()
+
+        # 发布循环：失败按 retry_delay * 2^(attempts-1) 重试，用完次数后回调
+        now = [base]
+        results = []
+        calls = []
+
+        async def publish(posts):
+            calls.append([post["title"] for post in posts])
+            if posts[0]["title"] == "crash":
+                raise RuntimeError("browser closed")
+            return [{"success": post["title"] == "ok", "message": post["title"]} for post in posts]
+
+        scheduler = PublishScheduler(publish, store=ScheduleStore(Path(tmp_dir) / "loop.db"),
+                                     on_result=lambda post, result: results.append((post["title"], result)),
+                                     max_attempts=2, retry_delay=60, max_lateness=3600, clock=lambda: now[0])
+        ok_id = scheduler.schedule_at({"title": "ok"}, base)
+        bad_id = scheduler.schedule_at({"title": "bad"}, base)
+        late_id = scheduler.schedule_at({"title": "late"}, base - timedelta(hours=2))
+
+        assert asyncio.run(scheduler.dispatch_due()) == 3
+        assert calls == [["ok", "bad"]]
+        assert [(title, result["schedule_id"], result["success"]) for title, result in results] == \
+            [("late", late_id, False), ("ok", ok_id, True)]
+        assert scheduler.store.next_fire_at() == base + timedelta(seconds=60)
+
+        # 未到重试时间不发布
+        now[0] = base + timedelta(seconds=59)
+        assert asyncio.run(scheduler.dispatch_due()) == 0
+        now[0] = base + timedelta(seconds=60)
+        assert asyncio.run(scheduler.dispatch_due()) == 1
+        assert results[-1][0] == "bad" and results[-1][1]["schedule_id"] == bad_id
+        assert scheduler.store.count_by_status() == {"done": 1, "failed": 1, "expired": 1}
+
+        # 发布函数抛出异常时整批按失败处理，不会停留在发布中
+        crash_id = scheduler.schedule_at({"title": "crash"}, now[0])
+        asyncio.run(scheduler.dispatch_due())
+        assert scheduler.store.count_open([crash_id]) == 1 and scheduler.store.recover(stale_after=0) == 0
+        now[0] += timedelta(seconds=60)
+        asyncio.run(scheduler.dispatch_due())
+        assert results[-1][0] == "crash" and "browser closed" in results[-1][1]["message"]
+        assert scheduler.store.count_open([crash_id]) == 0
+        scheduler.store.close()
+
+    print("\n✅ 排期队列测试通过")
+
+
+def test_artifact_cache():
+    """测试产物缓存：规范化后相同的提示词命中，每次查找计一次命中或未命中，按最近使用淘汰且保留刚写入的文件"""
+    print("\n" + "=" * 60)
+    print("测试产物缓存")
+    print("=" * 60)
+
+    key = cache_key("AI工具 相关封面，效率提升300%", provider="grsai", style="xhs")
+    assert cache_key("  ａｉ工具\t相关封面，效率提升３００%。", style="xhs", provider="grsai") == key
+    assert cache_key("AI工具 相关封面，效率提升300%", provider="volcengine", style="xhs") != key
+    assert ArtifactCache.from_config({"automation": {"image_generation": {"cache": {"enabled": False}}}}) is None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ArtifactCache(Path(tmp_dir) / "cache", max_bytes=25)
+        renders = []
+
+        def render(path):
+            renders.append(path)
+            path.write_bytes(b"x" * 10)
+
+        first = cache.get_or_create(key, render, ".jpg")
+        assert cache.get_or_create(key, render, ".jpg") == first
+        assert len(renders) == 1 and cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+        assert cache.get_json("missing") is None and cache.stats["misses"] == 2
+
+        # 发布队列引用的是 images/ 下的链接或副本，缓存淘汰后仍然存在
+        image_path = link_or_copy(first, Path(tmp_dir) / "images" / "post.jpg")
+
+        second = cache.put("second", b"y" * 10, ".jpg")
+        os.utime(first, (1000, 1000))
+        os.utime(second, (2000, 2000))
+        # 超出上限：淘汰最久未用的 first
+        third = cache.put("third", b"z" * 10, ".jpg")
+        assert not first.exists() and second.exists() and third.exists()
+        assert cache.stats["evictions"] == 1 and cache.size() == 20
+        assert image_path.read_bytes() == b"x" * 10
+
+        # keep 指定的文件即使最久未用也保留
+        os.utime(third, (0, 0))
+        cache.max_bytes = 10
+        assert cache.evict(keep=third) == 1 and not second.exists() and third.exists()
+        assert cache.get_or_create(key, render, ".jpg").exists() and len(renders) == 2
+
+    print("\n✅ 产物缓存测试通过")
+
+
+def test_image_cache_hit():
+    """测试配图缓存：同一话题和标题重复走策略制定 → 配图生成，第二次命中缓存（图片描述中的随机措辞不影响缓存键）"""
+    print("\n" + "=" * 60)
+    print("测试配图缓存命中")
+    print("=" * 60)
+
+    pipeline = load_script("xiaohongshu-auto-pipeline")
+    hot_topics = [{"topic": "AI工具", "trend": "rising", "heat": 95, "engagement_rate": 12.5}]
+    sleep = pipeline.time.sleep
+    pipeline.time.sleep = lambda seconds: None
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pipeline.RECORDS_FILE = Path(tmp_dir) / "records.jsonl"
+            pipeline.STATE_FILE = Path(tmp_dir) / "state.json"
+            pipeline.IMAGES_DIR = Path(tmp_dir) / "images"
+            automator = pipeline.XiaoHongShuAutomator(
+                {"automation": {"image_generation": {"cache": {"dir": str(Path(tmp_dir) / "cache")}}}})
+            # 标题从几个模板中随机选，固定下来；正文、副标题等其余随机内容每次不同
+            automator.generate_title = lambda topic, template_type="curiosity": f"{topic}不能错过"
+
+            image_paths = []
+            for seed in [1, 2]:
+                pipeline.random.seed(seed)
+                strategy = automator.strategy_formulation(hot_topics)
+                image_paths.append(Path(automator.image_generation(strategy)))
+
+            assert automator.image_cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+            assert image_paths[0] != image_paths[1] and all(path.exists() for path in image_paths)
+    finally:
+        pipeline.time.sleep = sleep
+        pipeline.random.seed()
+
+    print("\n✅ 配图缓存命中测试通过")
+
+
+TESTS = {
+    "engine": test_publish_engine,
+    "records": test_record_store,
+    "dag": test_stage_dag,
+    "slots": test_plan_slots,
+    "schedule": test_schedule_store,
+    "cache": test_artifact_cache,
+    "image_cache": test_image_cache_hit,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(TESTS)
+    for name in names:
+        if name not in TESTS:
+            print(f"未知测试: {name}")
+            print(f"可用测试: {', '.join(TESTS)}")
+            sys.exit(1)
+        TESTS[name]()
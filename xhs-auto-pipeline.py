@@ -5,11 +5,46 @@
 """
 import asyncio
 import json
+from functools import partial
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Optional
+
+from xhs_artifact_cache import ArtifactCache, cache_key
+from xhs_records import RecordStore
+from xhs_stage_dag import StageDAG
 
 XHS_DIR = Path("/home/vimalinx/.openclaw/skills/xhs-auto-publisher")
 TASKS_FILE = Path("/home/vimalinx/.openclaw/workspace/tasks.json")
+# 发布记录仍放在工作区，旧版 JSON 数组首次写入时迁移到同目录的 JSONL
+RECORDS_FILE = Path("/home/vimalinx/.openclaw/workspace/xhs-auto-records.jsonl")
+LEGACY_RECORDS_FILE = Path("/home/vimalinx/.openclaw/workspace/xhs-auto-records.json")
+CONFIG_FILE = Path(__file__).parent / "xhs-auto-pipeline-config.json"
+
+# 各阶段超时（秒）
+STAGE_TIMEOUTS = {
+    "hot_topics": 60,
+    "strategy": 30,
+    "content": 120,
+    "image_specs": 10,
+    "images": 300,
+    "publish": 300,
+    "feedback": 60
+}
+
+# 同时生成的配图数
+IMAGE_CONCURRENCY = 4
+
+# 默认配图服务（配置中 automation.image_generation.provider 未设置时使用）
+IMAGE_PROVIDER = "grsai"
+
+
+def load_config(config_file: Path = CONFIG_FILE) -> Dict:
+    """读取配置文件，不存在时返回空配置（全部使用默认值）"""
+    if not Path(config_file).exists():
+        return {}
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 async def monitor_hot_topics(keywords):
     """监控热点话题"""
@@ -80,19 +115,41 @@ async def generate_content(strategy):
     print(f"✅ 内容已生成: {content['title'][:20]}...")
     return content
 
-async def generate_images(content):
-    """生成配图（调用 Grsai API）"""
-    print("🎨 正在生成配图...")
+def plan_images(strategy):
+    """规划配图（只依赖策略，可以和正文生成同时进行）"""
+    return [
+        {"topic": strategy["topic"], "text": "工具界面", "index": 1},
+        {"topic": strategy["topic"], "text": "效果对比", "index": 2},
+        {"topic": strategy["topic"], "text": "使用教程", "index": 3}
+    ]
+
+async def generate_image(spec, cache: Optional[ArtifactCache] = None, provider: str = IMAGE_PROVIDER,
+                         style: Optional[str] = None):
+    """
+    生成一张配图（调用 Grsai API）
+    :param cache: 配图缓存，相同话题和配图文字直接返回上次的结果；None 表示不缓存
+    """
+    key = cache_key(f"{spec['topic']} {spec['text']}", provider=provider, style=style)
+    image = cache.get_json(key) if cache is not None else None
+    if image is not None:
+        print(f"⚡ 命中配图缓存: {image['url']}")
+        return image
+
+    print(f"🎨 正在生成配图: {spec['text']}")
 
     # TODO: 集成 Grsai API
-    images = [
-        {"url": "mock_image_1.png", "text": "工具界面"},
-        {"url": "mock_image_2.png", "text": "效果对比"},
-        {"url": "mock_image_3.png", "text": "使用教程"}
-    ]
+    image = {"url": f"mock_image_{spec['index']}.png", "text": spec["text"]}
+    if cache is not None:
+        cache.put_json(key, image)
+
+    print(f"✅ 配图已生成: {image['url']}")
+    return image
 
+async def generate_images(image_specs, cache: Optional[ArtifactCache] = None):
+    """并发生成全部配图"""
+    images = await asyncio.gather(*(generate_image(spec, cache) for spec in image_specs))
     print(f"✅ 已生成 {len(images)} 张配图")
-    return images
+    return list(images)
 
 async def auto_publish(content, images):
     """自动发布（调用 xhs-auto-publisher）"""
@@ -126,31 +183,41 @@ async def collect_feedback(post_url):
 
     return feedback
 
-async def full_auto_pipeline(topic_keywords):
-    """完整自动化流程"""
+async def full_auto_pipeline(topic_keywords, config: Optional[Dict] = None,
+                             image_cache: Optional[ArtifactCache] = None):
+    """
+    完整自动化流程
+    :param config: 配置（配图服务和风格取自 automation.image_generation）
+    :param image_cache: 配图缓存，由调用方按配置创建（ArtifactCache.from_config）
+    """
+    image_config = (config or {}).get("automation", {}).get("image_generation", {})
     print("=" * 60)
     print("🚀 启动小红书全自动闭环")
     print("=" * 60)
 
     start_time = datetime.now()
 
-    # 1. 热点监控
-    hot_topics = await monitor_hot_topics(topic_keywords)
-
-    # 2. 策略制定
-    strategy = await generate_strategy(hot_topics)
-
-    # 3. 内容生成
-    content = await generate_content(strategy)
-
-    # 4. 配图生成
-    images = await generate_images(content)
-
-    # 5. 自动发布
-    publish_result = await auto_publish(content, images)
-
-    # 6. 数据反馈
-    feedback = await collect_feedback(publish_result["post_url"])
+    # 热点 → 策略 → 正文 / 配图（配图按张展开）并发 → 发布 → 数据反馈
+    dag = StageDAG()
+    dag.add("hot_topics", monitor_hot_topics, ["keywords"], timeout=STAGE_TIMEOUTS["hot_topics"])
+    dag.add("strategy", generate_strategy, ["hot_topics"], timeout=STAGE_TIMEOUTS["strategy"])
+    dag.add("content", generate_content, ["strategy"], timeout=STAGE_TIMEOUTS["content"])
+    dag.add("image_specs", plan_images, ["strategy"], timeout=STAGE_TIMEOUTS["image_specs"])
+    image_func = partial(generate_image, cache=image_cache, provider=image_config.get("provider", IMAGE_PROVIDER),
+                         style=image_config.get("style"))
+    dag.add("images", image_func, ["image_specs"], fan_out="image_specs", item_arg="spec",
+            max_concurrency=IMAGE_CONCURRENCY, timeout=STAGE_TIMEOUTS["images"])
+    dag.add("publish_result", auto_publish, ["content", "images"], timeout=STAGE_TIMEOUTS["publish"])
+    dag.add("feedback", lambda publish_result: collect_feedback(publish_result["post_url"]),
+            ["publish_result"], timeout=STAGE_TIMEOUTS["feedback"])
+
+    result = await dag.run({"keywords": topic_keywords})
+    strategy = result["strategy"]
+    publish_result = result["publish_result"]
+    feedback = result["feedback"]
+
+    print("\n⏱️ 阶段时间线:")
+    print(result.timeline())
 
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
@@ -169,17 +236,7 @@ async def full_auto_pipeline(topic_keywords):
         "feedback": feedback
     }
 
-    record_file = Path("/home/vimalinx/.openclaw/workspace/xhs-auto-records.json")
-    records = []
-
-    if record_file.exists():
-        with open(record_file, 'r', encoding='utf-8') as f:
-            records = json.load(f)
-
-    records.append(record)
-
-    with open(record_file, 'w', encoding='utf-8') as f:
-        json.dump(records, f, ensure_ascii=False, indent=2)
+    RecordStore(RECORDS_FILE, legacy_file=LEGACY_RECORDS_FILE).append(record)
 
     return publish_result
 
@@ -190,9 +247,12 @@ async def main():
     # 目标关键词
     keywords = ["AI工具", "效率神器", "副业搞钱", "自动化工具"]
 
+    config = load_config()
+    image_cache = ArtifactCache.from_config(config)
+
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         # 测试模式
-        result = await full_auto_pipeline(keywords)
+        result = await full_auto_pipeline(keywords, config, image_cache)
         return
 
     print("🐺 小红书全自动闭环系统")
@@ -204,7 +264,7 @@ async def main():
     # 询问是否执行
     if len(sys.argv) > 1:
         print(f"\n⚠️ 真实模式暂未完全实现，使用 test 模式测试")
-        result = await full_auto_pipeline(keywords)
+        result = await full_auto_pipeline(keywords, config, image_cache)
     else:
         print("\n💡 提示: 添加 'test' 参数运行测试")
 
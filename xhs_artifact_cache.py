@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成产物缓存（配图、文案）
+按内容寻址：键是提示词（规范化后）和模型参数的哈希，相同或只差空白、全半角、大小写的提示词命中同一个文件
+缓存目录有大小上限，超出时按最近使用时间（文件 mtime，命中时更新）淘汰最久未用的文件
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+CACHE_DIR = Path(__file__).parent / "xhs-artifact-cache"
+
+# 默认缓存上限 512MB
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：全角转半角、转小写、合并空白、去掉首尾空白和标点"""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .,;:!?。，；：！？")
+
+
+def cache_key(prompt: str, **params) -> str:
+    """
+    计算缓存键
+    :param prompt: 提示词
+    :param params: 影响生成结果的参数（模型、风格、尺寸等）
+    :return: sha256 十六进制字符串
+    """
+    payload = json.dumps({"prompt": normalize_prompt(prompt), "params": params},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(src: Path, dest: Path) -> Path:
+    """
+    把缓存文件硬链接到 dest（不同文件系统等不支持硬链接时复制），缓存淘汰后 dest 仍然有效
+    :return: dest
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+    return dest
+
+
+class ArtifactCache:
+    """磁盘上的内容寻址缓存（多进程共用同一目录，写入先写临时文件再原子替换）"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir: 缓存目录（首次写入时创建）
+        :param max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["ArtifactCache"]:
+        """按 automation.image_generation.cache 配置创建，未启用时返回 None"""
+        cache_config = config.get("automation", {}).get("image_generation", {}).get("cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        return cls(
+            cache_dir=cache_config.get("dir", CACHE_DIR),
+            max_bytes=int(cache_config.get("max_mb", DEFAULT_MAX_BYTES // (1024 * 1024)) * 1024 * 1024)
+        )
+
+    def _path(self, key: str, suffix: str) -> Path:
+        # 按前两位分子目录，避免单个目录文件过多
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = "") -> Optional[Path]:
+        """
+        查找缓存文件，命中时更新最近使用时间
+        :return: 文件路径，未命中返回 None
+        """
+        path = self._path(key, suffix)
+        if not self._touch(path):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return path
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """文件存在时更新最近使用时间"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, data: bytes, suffix: str = "") -> Path:
+        """写入缓存文件（超出上限时淘汰旧文件），返回文件路径"""
+        return self._commit(key, suffix, lambda tmp_path: tmp_path.write_bytes(data))
+
+    def get_json(self, key: str) -> Optional[Dict]:
+        """读取缓存的 JSON 产物（如文案、配图地址）"""
+        path = self.get(key, ".json")
+        if path is None:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def put_json(self, key: str, value: Dict) -> Path:
+        """缓存 JSON 产物"""
+        return self.put(key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ".json")
+
+    def get_or_create(self, key: str, create: Callable[[Path], None], suffix: str = "") -> Path:
+        """
+        取缓存文件，未命中时调用 create(path) 生成到临时路径后写入缓存
+        同一进程内同一个键同时只生成一次，每次调用计一次命中或未命中
+        :param create: 把产物写到给定路径的函数
+        :return: 缓存文件路径
+        """
+        path = self._path(key, suffix)
+        if self._touch(path):
+            self.stats["hits"] += 1
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # 等锁期间可能已由其他线程生成
+            if self._touch(path):
+                self.stats["hits"] += 1
+                return path
+            self.stats["misses"] += 1
+            path = self._commit(key, suffix, create)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return path
+
+    def _commit(self, key: str, suffix: str, write: Callable[[Path], None]) -> Path:
+        """写临时文件后原子替换到缓存路径，再按上限淘汰"""
+        path = self._path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.evict(keep=path)
+        return path
+
+    def size(self) -> int:
+        """缓存总大小（字节）"""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return [entry for entry in self.cache_dir.glob("*/*") if entry.is_file() and not entry.name.startswith(".")]
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        总大小超过上限时按最近使用时间从旧到新删除
+        :param keep: 不删除的文件（刚写入的）
+        :return: 删除的文件数
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return 0
+
+            removed = 0
+            for _, entry_size, entry in sorted(entries, key=lambda item: item[0]):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and entry == keep:
+                    continue
+                try:
+                    entry.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= entry_size
+                removed += 1
+            self.stats["evictions"] += removed
+            return removed
+
+
+def main():
+    """命令行：查看缓存大小或按上限清理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小红书生成产物缓存")
+    parser.add_argument("--dir", default=str(CACHE_DIR), help="缓存目录")
+    parser.add_argument("--max-mb", type=int, help="按该上限清理（MB）")
+    args = parser.parse_args()
+
+    cache = ArtifactCache(args.dir)
+    if args.max_mb is not None:
+        cache.max_bytes = args.max_mb * 1024 * 1024
+        print(f"🧹 已清理 {cache.evict()} 个文件")
+    print(f"📦 {cache.cache_dir}: {len(cache._entries())} 个文件，{cache.size() / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
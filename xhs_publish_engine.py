@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小红书发布引擎
+基于 Playwright 异步 API：浏览器每天只启动一次，每个账号保留一个已登录的浏览器上下文（cookies 注入，
+登录状态保存到本地），多篇笔记按账号分组并发发布，同一账号内串行
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:
+    # 只写入排期、查看队列时不需要 Playwright，启动引擎时再报错
+    async_playwright = None
+
+PUBLISH_URL = "https://creator.xiaohongshu.com/publish/publish"
+
+# 浏览器重启间隔（秒）：长时间运行的进程每天重启一次浏览器，释放内存
+BROWSER_TTL = 24 * 3600
+
+# 登录状态保存目录（每个账号一个 storage_state 文件）
+STATE_DIR = Path(__file__).parent / "xhs-browser-state"
+
+
+class PublishError(Exception):
+    """发布失败（登录过期、页面元素找不到等）"""
+
+
+def load_cookies(cookies_file) -> List[Dict]:
+    """
+    读取 cookies 文件并转换为 Playwright 格式
+    支持 {name: value} 字典（publish_xhs_with_cookies.py 使用的格式）和 Playwright 导出的 cookie 列表
+    """
+    with open(cookies_file, 'r', encoding='utf-8') as f:
+        cookies_data = json.load(f)
+
+    if isinstance(cookies_data, list):
+        return cookies_data
+
+    return [
+        {
+            "name": name,
+            "value": str(value),
+            "domain": ".xiaohongshu.com",
+            "path": "/",
+        }
+        for name, value in cookies_data.items()
+    ]
+
+
+def post_from_strategy(strategy: Dict, image_paths, account: Optional[str] = None) -> Dict:
+    """
+    把自动化流程的策略转换为发布任务
+    :param strategy: strategy_formulation 生成的策略（content 可以是字符串或 generate_content 的结果）
+    :param image_paths: 配图路径（字符串或列表）
+    :param account: 发布账号，默认取策略中的 account
+    """
+    content = strategy.get("content", "")
+    if isinstance(content, dict):
+        content = content.get("content", "")
+    if isinstance(image_paths, (str, Path)):
+        image_paths = [image_paths]
+
+    return {
+        "account": account or strategy.get("account"),
+        "topic": strategy.get("topic"),
+        "title": strategy.get("title", "")[:20],
+        "content": content,
+        "images": [str(path) for path in image_paths or []],
+        "content_type": strategy.get("content_type"),
+        "estimated_engagement": strategy.get("estimated_engagement", 0),
+    }
+
+
+async def _fill_first_visible(page, selectors: List[str], text: str) -> bool:
+    """在多个候选选择器中找到第一个可见元素并填写"""
+    for selector in selectors:
+        for element in await page.query_selector_all(selector):
+            if await element.is_visible():
+                await element.click()
+                await element.fill(text)
+                return True
+    return False
+
+
+async def fill_and_publish(page, post: Dict, submit: bool = True, timeout: int = 30000) -> Dict:
+    """
+    默认发布流程：打开创作者中心发布页，上传配图，填写标题和正文，点击发布
+    :param page: Playwright 页面（已在账号上下文中打开）
+    :param post: 发布任务
+    :param submit: 为 False 时只填写不点击发布（预览）
+    """
+    await page.goto(PUBLISH_URL, wait_until="domcontentloaded", timeout=timeout)
+    if "login" in page.url.lower():
+        raise PublishError("登录已过期，请更新 cookies")
+
+    if post["images"]:
+        file_input = await page.wait_for_selector('input[type="file"]', state="attached", timeout=timeout)
+        await file_input.set_input_files(post["images"])
+
+    if not await _fill_first_visible(page, ['input[placeholder*="标题"]', 'input[class*="title"]'], post["title"]):
+        raise PublishError("找不到标题输入框")
+    if not await _fill_first_visible(page, ['[contenteditable="true"]', 'textarea'], post["content"]):
+        raise PublishError("找不到正文输入框")
+
+    if not submit:
+        return {"success": True, "message": "已填写，等待人工确认发布", "submitted": False}
+
+    await page.click('button:has-text("发布")', timeout=timeout)
+    await page.wait_for_selector('text=发布成功', timeout=timeout)
+    return {"success": True, "message": "发布成功", "submitted": True}
+
+
+class PublishEngine:
+    """浏览器常驻的并发发布引擎"""
+
+    def __init__(self, accounts: Dict[str, str], headless: bool = True, max_concurrency: int = 2,
+                 submit: bool = True, browser_ttl: float = BROWSER_TTL, state_dir=STATE_DIR,
+                 viewport: Optional[Dict] = None, publish_func: Callable = fill_and_publish,
+                 clock: Callable = time.time):
+        """
+        :param accounts: {账号名: cookies 文件路径}
+        :param headless: 无头模式
+        :param max_concurrency: 同时发布的账号数
+        :param submit: 是否点击发布按钮（False 时只填写，用于预览）
+        :param browser_ttl: 浏览器重启间隔（秒）
+        :param state_dir: 登录状态保存目录
+        :param viewport: 页面视口
+        :param publish_func: 发布流程 async (page, post, submit) -> 结果字典
+        :param clock: 时钟函数
+        """
+        if not accounts:
+            raise ValueError("至少需要配置一个发布账号")
+        self.accounts = dict(accounts)
+        self.default_account = next(iter(self.accounts))
+        self.headless = headless
+        self.max_concurrency = max_concurrency
+        self.submit = submit
+        self.browser_ttl = browser_ttl
+        self.state_dir = Path(state_dir)
+        self.viewport = viewport or {"width": 1280, "height": 900}
+        self.publish_func = publish_func
+        self.clock = clock
+
+        self._playwright = None
+        self._browser = None
+        self._launched_at = None
+        self._contexts = {}
+        self._account_locks = {}
+        self._browser_lock = None
+        self._semaphore = None
+        self._active = 0
+        self.stats = {"browser_launches": 0, "contexts_created": 0, "published": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict, **kwargs) -> "PublishEngine":
+        """按 xhs-auto-pipeline-config.json 的 publish_engine 配置创建"""
+        engine_config = config.get("publish_engine", {})
+        return cls(
+            accounts=engine_config.get("accounts", {}),
+            headless=engine_config.get("headless", config.get("chrome", {}).get("headless", True)),
+            max_concurrency=engine_config.get("max_concurrency", 2),
+            submit=engine_config.get("submit", True),
+            browser_ttl=engine_config.get("browser_ttl_hours", 24) * 3600,
+            state_dir=engine_config.get("state_dir", STATE_DIR),
+            **kwargs
+        )
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    @property
+    def started(self) -> bool:
+        """是否已启动（stop() 后为 False，可以再次 start()）"""
+        return self._playwright is not None
+
+    async def start(self):
+        """启动 Playwright 和浏览器"""
+        if async_playwright is None:
+            raise RuntimeError("发布引擎需要 Playwright: pip install playwright && playwright install chromium")
+        self._browser_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._playwright = await async_playwright().start()
+        await self._ensure_browser()
+
+    async def stop(self):
+        """保存登录状态，关闭浏览器"""
+        if self._browser is not None:
+            await self._close_browser()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _ensure_browser(self):
+        """浏览器未启动、已断开或超过重启间隔（且没有其他进行中的发布）时启动新的浏览器"""
+        async with self._browser_lock:
+            # 调用方自己的发布已计入 _active
+            expired = (
+                self._browser is not None
+                and self._active <= 1
+                and self.clock() - self._launched_at >= self.browser_ttl
+            )
+            if self._browser is not None and self._browser.is_connected() and not expired:
+                return self._browser
+            if self._browser is not None:
+                await self._close_browser()
+
+            print("🌐 正在启动浏览器...")
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._launched_at = self.clock()
+            self.stats["browser_launches"] += 1
+            return self._browser
+
+    async def _close_browser(self):
+        """保存每个账号的登录状态后关闭浏览器"""
+        for account, context in list(self._contexts.items()):
+            try:
+                await context.storage_state(path=str(self._state_file(account)))
+            except Exception as e:
+                print(f"⚠️ 保存账号 {account} 登录状态失败: {e}")
+        self._contexts = {}
+        try:
+            await self._browser.close()
+        except Exception:
+            pass
+        self._browser = None
+
+    def _state_file(self, account: str) -> Path:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        return self.state_dir / f"{account}.json"
+
+    async def _context(self, account: str):
+        """获取账号的浏览器上下文：复用已打开的，没有时用保存的登录状态或 cookies 新建"""
+        browser = await self._ensure_browser()
+        context = self._contexts.get(account)
+        if context is not None:
+            return context
+
+        state_file = self._state_file(account)
+        if state_file.exists():
+            context = await browser.new_context(viewport=self.viewport, storage_state=str(state_file))
+        else:
+            context = await browser.new_context(viewport=self.viewport)
+            await context.add_cookies(load_cookies(self.accounts[account]))
+        self._contexts[account] = context
+        self.stats["contexts_created"] += 1
+        print(f"✅ 账号 {account} 浏览器上下文已就绪")
+        return context
+
+    async def publish(self, post: Dict) -> Dict:
+        """
+        发布一篇笔记（同一账号的发布串行执行）
+        :param post: 发布任务（post_from_strategy 的结果）
+        :return: 发布结果
+        """
+        account = post.get("account") or self.default_account
+        if account not in self.accounts:
+            self.stats["failed"] += 1
+            return {"success": False, "message": f"未配置账号: {account}", "account": account,
+                    "title": post.get("title")}
+
+        lock = self._account_locks.setdefault(account, asyncio.Lock())
+        async with lock, self._semaphore:
+            start = time.perf_counter()
+            # 先计入进行中的发布，避免准备上下文期间浏览器被按重启间隔关闭
+            self._active += 1
+            page = None
+            try:
+                context = await self._context(account)
+                page = await context.new_page()
+                result = await self.publish_func(page, post, self.submit)
+            except Exception as e:
+                result = {"success": False, "message": f"发布失败: {e}"}
+            finally:
+                self._active -= 1
+                if page is not None:
+                    await page.close()
+
+        self.stats["published" if result.get("success") else "failed"] += 1
+        result.update({
+            "account": account,
+            "topic": post.get("topic"),
+            "title": post.get("title"),
+            "published_at": datetime.now().isoformat(),
+            "duration": round(time.perf_counter() - start, 3),
+        })
+        status = "✅" if result["success"] else "❌"
+        print(f"{status} [{account}] {post.get('title')} | {result['message']} ({result['duration']}s)")
+        return result
+
+    async def publish_many(self, posts: List[Dict]) -> List[Dict]:
+        """
+        发布一批笔记：不同账号并发（最多 max_concurrency 个），同一账号按顺序
+        :param posts: 发布任务列表
+        :return: 与 posts 顺序对应的发布结果
+        """
+        queues = {}
+        for index, post in enumerate(posts):
+            queues.setdefault(post.get("account") or self.default_account, []).append(index)
+
+        results = [None] * len(posts)
+
+        async def run_account(indexes):
+            for index in indexes:
+                results[index] = await self.publish(posts[index])
+
+        await asyncio.gather(*(run_account(indexes) for indexes in queues.values()))
+        return results
+
+
+async def _main_async(args):
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    posts = []
+    with open(args.posts, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                posts.append(json.loads(line))
+
+    async with PublishEngine.from_config(config, **({"submit": False} if args.preview else {})) as engine:
+        results = await engine.publish_many(posts)
+    success = sum(1 for result in results if result["success"])
+    print(f"\n📤 发布完成: 成功 {success}/{len(results)} | {engine.stats}")
+
+
+def main():
+    """命令行：发布 JSONL 文件中的笔记（每行 {"account", "title", "content", "images"}）"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小红书并发发布引擎")
+    parser.add_argument("posts", help="JSONL 发布任务文件")
+    parser.add_argument("--config", default=str(Path(__file__).parent / "xhs-auto-pipeline-config.json"),
+                        help="配置文件（读取 publish_engine 配置）")
+    parser.add_argument("--preview", action="store_true", help="只填写不点击发布")
+    asyncio.run(_main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
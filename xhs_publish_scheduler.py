@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小红书发布排期
+把一批笔记分散排进每天的流量高峰时段（相邻两篇至少间隔 min_gap，每天不超过上限），
+排期写入 SQLite 队列，单个发布循环在到点时交给发布函数（通常是 PublishEngine.publish_many）发布
+等待期间不占用浏览器，进程重启后从队列恢复
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 默认流量高峰时段：早间通勤、午休、晚间
+DEFAULT_TRAFFIC_WINDOWS = ["07:00-09:00", "12:00-13:30", "18:00-22:00"]
+
+SCHEDULE_DB = Path(__file__).parent / "xhs-publish-schedule.db"
+
+
+def parse_windows(windows: Sequence[str]) -> List[Tuple[dt_time, dt_time]]:
+    """
+    解析时段配置
+    :param windows: ["HH:MM-HH:MM", ...]
+    :return: [(开始时间, 结束时间)]，按开始时间排序
+    """
+    parsed = []
+    for window in windows:
+        begin, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in window.split("-"))
+        if end <= begin:
+            raise ValueError(f"时段结束时间必须晚于开始时间: {window}")
+        parsed.append((begin, end))
+    return sorted(parsed)
+
+
+def plan_slots(count: int, windows: Sequence[Tuple[dt_time, dt_time]], start: datetime,
+               min_gap: timedelta = timedelta(minutes=30), max_per_day: int = 10,
+               taken: Sequence[datetime] = (), max_days: int = 60) -> List[datetime]:
+    """
+    为 count 篇笔记安排发布时间
+    每天轮流从各个时段取时间点（先取每个时段的第一个，再取第二个……），让笔记分散在不同高峰，
+    与已排期的时间（taken）和彼此之间至少间隔 min_gap
+    :param count: 笔记数
+    :param windows: parse_windows 的结果
+    :param start: 最早发布时间
+    :param min_gap: 相邻两篇的最小间隔
+    :param max_per_day: 每天最多发布数（包括 taken 中当天的）
+    :param taken: 已占用的发布时间
+    :param max_days: 最多向后排多少天
+    :return: 按时间排序的发布时间列表
+    """
+    occupied = sorted(taken)
+    slots = []
+    day = start.date()
+
+    for _ in range(max_days):
+        if len(slots) >= count:
+            break
+        used_today = sum(1 for slot in occupied if slot.date() == day)
+
+        # 每个时段内按 min_gap 间隔生成候选时间点
+        candidates = []
+        for begin, end in windows:
+            points = []
+            point = datetime.combine(day, begin)
+            while point <= datetime.combine(day, end):
+                if point >= start:
+                    points.append(point)
+                point += min_gap
+            candidates.append(points)
+
+        for round_index in range(max(map(len, candidates), default=0)):
+            for points in candidates:
+                if len(slots) >= count or used_today >= max_per_day:
+                    break
+                if round_index >= len(points):
+                    continue
+                point = points[round_index]
+                if all(abs(point - other) >= min_gap for other in occupied):
+                    slots.append(point)
+                    occupied.append(point)
+                    used_today += 1
+        day += timedelta(days=1)
+
+    if len(slots) < count:
+        raise ValueError(f"{max_days} 天内只能安排 {len(slots)} 篇，请放宽时段或每日上限")
+    return sorted(slots)
+
+
+class ScheduleStore:
+    """
+    排期队列（SQLite，WAL 模式）
+    任何流程都可以写入排期，单个发布进程按 fire_at 取出到点的笔记，重启后从数据库恢复
+    """
+
+    def __init__(self, db_file=SCHEDULE_DB):
+        """
+        :param db_file: SQLite 数据库文件
+        """
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduled_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fire_at REAL NOT NULL,
+                account TEXT,
+                title TEXT,
+                post TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scheduled_posts_due ON scheduled_posts (status, fire_at)"
+        )
+        self._conn.commit()
+
+    def add_many(self, planned: List[Tuple[datetime, Dict]]) -> List[int]:
+        """
+        写入排期，一次事务完成
+        :param planned: [(发布时间, 发布任务)]
+        :return: 排期ID列表
+        """
+        now = time.time()
+        ids = []
+        with self._lock:
+            for fire_at, post in planned:
+                cursor = self._conn.execute(
+                    "INSERT INTO scheduled_posts (fire_at, account, title, post, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (fire_at.timestamp(), post.get("account"), post.get("title"),
+                     json.dumps(post, ensure_ascii=False), now, now)
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.commit()
+        return ids
+
+    def slots(self, since: datetime) -> List[datetime]:
+        """since 之后已占用的发布时间（待发布和已发布），用于排期避让"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fire_at FROM scheduled_posts WHERE fire_at >= ? AND status IN ('pending', 'publishing', 'done')",
+                (since.timestamp(),)
+            ).fetchall()
+        return [datetime.fromtimestamp(row["fire_at"]) for row in rows]
+
+    def next_fire_at(self) -> Optional[datetime]:
+        """最早的待发布时间，没有待发布笔记时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(fire_at) AS fire_at FROM scheduled_posts WHERE status = 'pending'"
+            ).fetchone()
+        return datetime.fromtimestamp(row["fire_at"]) if row["fire_at"] is not None else None
+
+    def claim_due(self, now: datetime) -> List[Dict]:
+        """
+        取出到点的排期并标记为发布中（IMMEDIATE 事务，多个发布进程不会取到同一条）
+        :return: [{"id", "fire_at", "attempts", "post"}]
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT id, fire_at, attempts, post FROM scheduled_posts "
+                "WHERE status = 'pending' AND fire_at <= ? ORDER BY fire_at, id",
+                (now.timestamp(),)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE scheduled_posts SET status = 'publishing', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                [(time.time(), row["id"]) for row in rows]
+            )
+            self._conn.commit()
+        return [
+            {
+                "id": row["id"],
+                "fire_at": datetime.fromtimestamp(row["fire_at"]),
+                "attempts": row["attempts"] + 1,
+                "post": json.loads(row["post"])
+            }
+            for row in rows
+        ]
+
+    def finish(self, entry_id: int, status: str, result: Dict, retry_at: Optional[datetime] = None):
+        """
+        记录发布结果
+        :param status: done / failed / expired，需要重试时为 pending 并给出 retry_at
+        """
+        with self._lock:
+            if retry_at is not None:
+                self._conn.execute(
+                    "UPDATE scheduled_posts SET status = 'pending', fire_at = ?, result = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (retry_at.timestamp(), json.dumps(result, ensure_ascii=False), time.time(), entry_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE scheduled_posts SET status = ?, result = ?, updated_at = ? WHERE id = ?",
+                    (status, json.dumps(result, ensure_ascii=False), time.time(), entry_id)
+                )
+            self._conn.commit()
+
+    def recover(self, stale_after: float = 900) -> int:
+        """
+        发布进程异常退出时留下的发布中排期改回待发布
+        :param stale_after: 标记为发布中超过多少秒视为中断（正常发布远小于这个时间）
+        :return: 恢复的条数
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE scheduled_posts SET status = 'pending', updated_at = ? "
+                "WHERE status = 'publishing' AND updated_at <= ?",
+                (now, now - stale_after)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def pending(self) -> List[Tuple[datetime, Dict]]:
+        """待发布的排期（按时间排序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fire_at, post FROM scheduled_posts WHERE status = 'pending' ORDER BY fire_at, id"
+            ).fetchall()
+        return [(datetime.fromtimestamp(row["fire_at"]), json.loads(row["post"])) for row in rows]
+
+    def count_open(self, ids: Sequence[int]) -> int:
+        """ids 中尚未结束（待发布或发布中）的排期数"""
+        if not ids:
+            return 0
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM scheduled_posts WHERE id IN ({placeholders}) "
+                "AND status IN ('pending', 'publishing')",
+                list(ids)
+            ).fetchone()
+        return row[0]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """各状态的排期数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM scheduled_posts GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class PublishScheduler:
+    """按时段排期，单个发布循环在到点时发布"""
+
+    def __init__(self, publish_func: Optional[Callable[[List[Dict]], Awaitable[List[Dict]]]] = None,
+                 store: Optional[ScheduleStore] = None, windows: Sequence[str] = DEFAULT_TRAFFIC_WINDOWS,
+                 min_gap_minutes: float = 30, max_per_day: int = 10,
+                 on_result: Optional[Callable[[Dict, Dict], None]] = None,
+                 max_attempts: int = 3, retry_delay: float = 600, max_lateness: float = 6 * 3600,
+                 idle_check: float = 60, on_idle: Optional[Callable[[], Awaitable[None]]] = None,
+                 idle_threshold: float = 1800, clock: Callable[[], datetime] = datetime.now):
+        """
+        :param publish_func: async (posts) -> results，同一时间到点的笔记一起交给它（只写入排期时可以为空）
+        :param store: 排期队列，默认使用 SCHEDULE_DB
+        :param windows: 流量高峰时段 ["HH:MM-HH:MM", ...]
+        :param min_gap_minutes: 相邻两篇的最小间隔（分钟）
+        :param max_per_day: 每天最多发布数
+        :param on_result: 每篇发布结束（成功或不再重试）后以 (post, result) 调用，result 带 schedule_id
+        :param max_attempts: 发布失败最多尝试次数
+        :param retry_delay: 首次重试等待秒数，之后翻倍
+        :param max_lateness: 超过排期时间多久（秒）仍未发布的笔记不再发布（进程长时间停止后避免集中补发）
+        :param idle_check: 没有临近排期时多久检查一次数据库（其他流程写入的新排期）
+        :param on_idle: 距下一次发布超过 idle_threshold 秒时调用（如关闭浏览器释放资源）
+        :param idle_threshold: 见 on_idle
+        :param clock: 时钟函数
+        """
+        self.publish_func = publish_func
+        self.store = store or ScheduleStore()
+        self.windows = parse_windows(windows)
+        self.min_gap = timedelta(minutes=min_gap_minutes)
+        self.max_per_day = max_per_day
+        self.on_result = on_result
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_lateness = max_lateness
+        self.idle_check = idle_check
+        self.on_idle = on_idle
+        self.idle_threshold = idle_threshold
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, config: Dict, publish_func=None, **kwargs) -> "PublishScheduler":
+        """按 xhs-auto-pipeline-config.json 的 automation.auto_publish 配置创建"""
+        publish_config = config.get("automation", {}).get("auto_publish", {})
+        kwargs.setdefault("store", ScheduleStore(publish_config.get("schedule_db", SCHEDULE_DB)))
+        return cls(
+            publish_func,
+            windows=publish_config.get("traffic_windows", DEFAULT_TRAFFIC_WINDOWS),
+            min_gap_minutes=publish_config.get("min_gap_minutes", 30),
+            max_per_day=publish_config.get("max_posts_per_day", 10),
+            max_attempts=publish_config.get("max_attempts", 3),
+            max_lateness=publish_config.get("max_lateness_hours", 6) * 3600,
+            **kwargs
+        )
+
+    def plan(self, posts: List[Dict], start: Optional[datetime] = None) -> List[Tuple[datetime, Dict]]:
+        """
+        为一批笔记安排发布时间（避开队列中已排期的时间），不写入队列
+        :param posts: 发布任务列表
+        :param start: 最早发布时间，默认当前时间
+        :return: [(发布时间, 发布任务)]
+        """
+        start = start or self.clock()
+        # 从当天零点查起：当天更早已发布的也计入每日上限（再往前 min_gap 用于和前一天末尾保持间隔）
+        taken = self.store.slots(datetime.combine(start.date(), dt_time.min) - self.min_gap)
+        slots = plan_slots(len(posts), self.windows, start, self.min_gap, self.max_per_day, taken=taken)
+        return list(zip(slots, posts))
+
+    def schedule(self, posts: List[Dict], start: Optional[datetime] = None) -> List[int]:
+        """
+        安排发布时间并写入队列
+        :return: 排期ID列表（与 posts 顺序对应）
+        """
+        return self.store.add_many(self.plan(posts, start))
+
+    def schedule_at(self, post: Dict, fire_at: datetime) -> int:
+        """按指定时间写入一篇笔记（不按时段排期），返回排期ID"""
+        return self.store.add_many([(fire_at, post)])[0]
+
+    def pending(self) -> List[Tuple[datetime, Dict]]:
+        """尚未发布的排期"""
+        return self.store.pending()
+
+    async def dispatch_due(self) -> int:
+        """
+        发布所有到点的排期
+        :return: 处理的条数
+        """
+        now = self.clock()
+        entries = self.store.claim_due(now)
+        if not entries:
+            return 0
+
+        batch = []
+        for entry in entries:
+            lateness = (now - entry["fire_at"]).total_seconds()
+            if lateness > self.max_lateness:
+                result = {"success": False, "message": f"超过排期时间 {lateness / 3600:.1f} 小时，不再发布"}
+                self.store.finish(entry["id"], "expired", result)
+                print(f"⏭️ {entry['post'].get('title')} | {result['message']}")
+                if self.on_result:
+                    self.on_result(entry["post"], dict(result, schedule_id=entry["id"]))
+                continue
+            batch.append(entry)
+
+        if batch:
+            try:
+                results = await self.publish_func([entry["post"] for entry in batch])
+            except Exception as e:
+                # 发布函数整体失败（如浏览器启动失败）时整批按失败处理，照常重试，不留在 publishing 状态
+                print(f"❌ 发布异常: {e}")
+                results = [{"success": False, "message": f"发布异常: {e}"}] * len(batch)
+            for entry, result in zip(batch, results):
+                self._finish(entry, result)
+        return len(entries)
+
+    def _finish(self, entry: Dict, result: Dict):
+        """记录结果：成功或用完重试次数时结束，否则按指数退避重新排期"""
+        result = dict(result, schedule_id=entry["id"])
+        if result.get("success"):
+            self.store.finish(entry["id"], "done", result)
+        elif entry["attempts"] < self.max_attempts:
+            retry_at = self.clock() + timedelta(seconds=self.retry_delay * 2 ** (entry["attempts"] - 1))
+            self.store.finish(entry["id"], "pending", result, retry_at=retry_at)
+            print(f"🔁 {entry['post'].get('title')} 将于 {retry_at.strftime('%H:%M')} 重试")
+            return
+        else:
+            self.store.finish(entry["id"], "failed", result)
+
+        if self.on_result:
+            self.on_result(entry["post"], result)
+
+    async def run(self, wait_for: Optional[Sequence[int]] = None, stop_event: Optional[asyncio.Event] = None):
+        """
+        发布循环：睡到最早的排期时间再发布，没有临近排期时每 idle_check 秒检查一次新排期
+        :param wait_for: 这些排期都结束后退出，默认一直运行
+        :param stop_event: 设置后退出
+        """
+        if self.publish_func is None:
+            raise ValueError("没有发布函数，只能写入排期")
+
+        idle = False
+        while not (stop_event and stop_event.is_set()):
+            recovered = self.store.recover()
+            if recovered:
+                print(f"♻️ 恢复 {recovered} 条中断的发布")
+            if await self.dispatch_due():
+                idle = False
+            if wait_for is not None and not self.store.count_open(wait_for):
+                break
+
+            next_fire = self.store.next_fire_at()
+            wait = self.idle_check if next_fire is None else (next_fire - self.clock()).total_seconds()
+            if self.on_idle and not idle and (next_fire is None or wait > self.idle_threshold):
+                await self.on_idle()
+                idle = True
+
+            wait = min(max(wait, 0), self.idle_check)
+            if stop_event is None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await asyncio.wait_for(stop_event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+
+def format_plan(planned: List[Tuple[datetime, Dict]]) -> str:
+    """排期列表的文本形式"""
+    return "\n".join(
+        f"   {slot.strftime('%m-%d %H:%M')}  [{post.get('account') or '-'}] {post.get('title')}"
+        for slot, post in planned
+    )
+
+
+def main():
+    """命令行：查看排期队列"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小红书发布排期队列")
+    parser.add_argument("--db", default=str(SCHEDULE_DB), help="排期数据库")
+    args = parser.parse_args()
+
+    store = ScheduleStore(args.db)
+    pending = store.pending()
+    print(f"🗓️ 待发布 {len(pending)} 篇:")
+    if pending:
+        print(format_plan(pending))
+    print(f"\n📊 {store.count_by_status()}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
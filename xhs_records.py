@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小红书发布记录存储
+JSONL 只追加写入：每条记录一行，写入和迁移共用同一个锁文件，多个流程同时写不会互相覆盖
+旧版 xhs-auto-records.json（整个数组）首次使用时自动迁移
+"""
+
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，退化为不加锁（只适合单进程写入）
+    fcntl = None
+
+RECORDS_FILE = Path(__file__).parent / "xhs-auto-records.jsonl"
+LEGACY_RECORDS_FILE = Path(__file__).parent / "xhs-auto-records.json"
+
+
+@contextmanager
+def _locked(f, exclusive: bool = True):
+    """对已打开的文件加 flock 锁"""
+    if fcntl is None:
+        yield f
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield f
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class RecordStore:
+    """发布记录存储（追加写入 O(1)，按行迭代读取）"""
+
+    def __init__(self, path=RECORDS_FILE, legacy_file: Optional[Path] = LEGACY_RECORDS_FILE):
+        """
+        :param path: JSONL 记录文件
+        :param legacy_file: 旧版 JSON 数组文件，记录文件不存在时从这里迁移
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_file = self.path.with_name(self.path.name + ".lock")
+        self._warned_corrupt = False
+        if legacy_file is not None and not self.path.exists() and Path(legacy_file).exists():
+            self.migrate(legacy_file)
+
+    def migrate(self, legacy_file: Path) -> int:
+        """
+        把旧版 JSON 数组导入 JSONL 记录文件（旧文件保留不动）
+        :return: 迁移的记录数
+        """
+        with open(self.lock_file, 'a') as lock, _locked(lock):
+            # 拿到锁后再检查一次，多个进程同时启动时只迁移一次
+            if self.path.exists():
+                return 0
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+        print(f"📦 已从 {legacy_file} 迁移 {len(records)} 条发布记录到 {self.path}")
+        return len(records)
+
+    def append(self, record: Dict):
+        """追加一条记录"""
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """追加多条记录（一次加锁、一次写入）"""
+        if not records:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        # 与 migrate 使用同一个锁文件：迁移用 os.replace 换掉记录文件，锁记录文件本身挡不住迁移
+        with open(self.lock_file, 'a') as lock, _locked(lock):
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+
+    def iter_records(self, since: Optional[str] = None, topic: Optional[str] = None) -> Iterator[Dict]:
+        """
+        按写入顺序逐条读取记录（不把整个文件读入内存）
+        :param since: 只返回 timestamp 不早于该时间的记录（与记录中的 timestamp 同格式比较）
+        :param topic: 只返回该话题的记录
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # 跳过空行和正在写入的最后一行
+                if not line.endswith("\n") or not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 损坏的行（如写入中断后又追加了新记录）跳过，只提示一次
+                    if not self._warned_corrupt:
+                        print(f"⚠️ {self.path} 中有无法解析的记录行，已跳过")
+                        self._warned_corrupt = True
+                    continue
+                if since and str(record.get("timestamp", "")) < since:
+                    continue
+                if topic and record.get("topic") != topic:
+                    continue
+                yield record
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_records()
+
+    def tail(self, count: int = 10) -> List[Dict]:
+        """最近 count 条记录"""
+        return list(deque(self.iter_records(), maxlen=count))
+
+    def summary(self, since: Optional[str] = None) -> Dict:
+        """汇总发布数和互动数据"""
+        summary = {
+            "total_posts": 0,
+            "successful_posts": 0,
+            "total_views": 0,
+            "total_likes": 0,
+            "total_collects": 0,
+            "total_comments": 0
+        }
+        for record in self.iter_records(since=since):
+            summary["total_posts"] += 1
+            # xhs-auto-pipeline.py 的记录没有 success 字段、互动数据在 feedback 中
+            if record.get("success", True):
+                summary["successful_posts"] += 1
+            metrics = record.get("feedback") or record
+            for key in ["views", "likes", "collects", "comments"]:
+                summary[f"total_{key}"] += metrics.get(key, 0) or 0
+        return summary
+
+
+def main():
+    """命令行：查看最近的发布记录和汇总"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小红书发布记录")
+    parser.add_argument("--file", default=str(RECORDS_FILE), help="记录文件")
+    parser.add_argument("--tail", type=int, default=10, help="显示最近多少条")
+    parser.add_argument("--since", help="只统计该时间之后的记录，如 2026-02-20")
+    args = parser.parse_args()
+
+    store = RecordStore(args.file)
+    for record in store.tail(args.tail):
+        print(json.dumps(record, ensure_ascii=False))
+    print(f"\n📊 汇总: {store.summary(args.since)}")
+
+
+if __name__ == "__main__":
+    main()
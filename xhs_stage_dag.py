@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流程阶段 DAG 执行器
+每个阶段声明依赖的输入，依赖都完成后立即开始；互不依赖的阶段并发执行，
+列表输入可以按元素展开并发执行（如多张配图同时生成）。每个阶段可设超时，执行时间记录为时间线
+同步函数在线程中执行，异步函数直接在事件循环中执行
+"""
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class StageError(Exception):
+    """阶段执行失败（异常或超时）"""
+
+    def __init__(self, stage: str, cause: BaseException):
+        self.stage = stage
+        self.cause = cause
+        super().__init__(f"阶段 {stage} 失败: {cause!r}")
+
+
+class Stage:
+    """流程中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable, inputs: Iterable[str] = (),
+                 timeout: Optional[float] = None, fan_out: Optional[str] = None,
+                 item_arg: Optional[str] = None, max_concurrency: Optional[int] = None):
+        """
+        :param name: 阶段名（也是输出的名字，供后续阶段作为输入）
+        :param func: 阶段函数，以输入名为关键字参数调用
+        :param inputs: 依赖的输入名（其他阶段名或 run() 传入的初始值）
+        :param timeout: 超时秒数（展开执行时是整个阶段的超时）
+        :param fan_out: 按元素展开的输入名：对该列表中每个元素各调用一次 func，输出为结果列表
+        :param item_arg: 展开时元素传给 func 的参数名，默认与展开输入同名
+        :param max_concurrency: 展开执行时的最大并发数
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.timeout = timeout
+        self.fan_out = fan_out
+        self.item_arg = item_arg or fan_out
+        self.max_concurrency = max_concurrency
+        if fan_out is not None and fan_out not in self.inputs:
+            raise ValueError(f"阶段 {name} 的展开输入 {fan_out} 不在 inputs 中")
+
+
+class StageDAG:
+    """按依赖关系并发执行阶段"""
+
+    def __init__(self, stages: Iterable[Stage] = ()):
+        self.stages = {}
+        for stage in stages:
+            self.add_stage(stage)
+
+    def add_stage(self, stage: Stage) -> "StageDAG":
+        if stage.name in self.stages:
+            raise ValueError(f"阶段重名: {stage.name}")
+        self.stages[stage.name] = stage
+        return self
+
+    def add(self, name: str, func: Callable, inputs: Iterable[str] = (), **kwargs) -> "StageDAG":
+        """添加阶段（参数同 Stage），返回自身以便链式调用"""
+        return self.add_stage(Stage(name, func, inputs, **kwargs))
+
+    def _check(self, initial: Dict[str, Any]):
+        """检查输入都有来源、没有环"""
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in self.stages and name not in initial:
+                    raise ValueError(f"阶段 {stage.name} 的输入 {name} 没有来源")
+
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖成环: {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def run(self, initial: Optional[Dict[str, Any]] = None, raise_on_error: bool = True) -> "DAGResult":
+        """
+        执行全部阶段
+        :param initial: 初始输入 {名字: 值}
+        :param raise_on_error: 有阶段失败时抛出 StageError（其余不依赖失败阶段的阶段仍会执行完）
+        :return: DAGResult
+        """
+        initial = dict(initial or {})
+        self._check(initial)
+
+        result = DAGResult(initial)
+        origin = time.perf_counter()
+        tasks = {}
+
+        async def wait_inputs(stage):
+            values = {}
+            for name in stage.inputs:
+                if name in tasks:
+                    values[name] = await tasks[name]
+                else:
+                    values[name] = initial[name]
+            return values
+
+        async def run_stage(stage):
+            try:
+                values = await wait_inputs(stage)
+            except StageError:
+                result.spans.append(_span(stage.name, "skipped", origin, None, None))
+                raise
+
+            start = time.perf_counter()
+            items = None
+            try:
+                if stage.fan_out is None:
+                    call = _call(stage.func, values)
+                else:
+                    items = list(values[stage.fan_out])
+                    call = _fan_out(stage, values, items)
+                output = await asyncio.wait_for(call, stage.timeout) if stage.timeout else await call
+            except asyncio.TimeoutError as e:
+                result.spans.append(_span(stage.name, "timeout", origin, start, items))
+                result.errors[stage.name] = e
+                raise StageError(stage.name, e) from e
+            except Exception as e:
+                result.spans.append(_span(stage.name, "failed", origin, start, items))
+                result.errors[stage.name] = e
+                raise StageError(stage.name, e) from e
+
+            result.spans.append(_span(stage.name, "ok", origin, start, items))
+            result.outputs[stage.name] = output
+            return output
+
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(stage))
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        result.duration = time.perf_counter() - origin
+        result.spans.sort(key=lambda span: (span["start"] is None, span["start"] or 0))
+        if raise_on_error and result.errors:
+            name, error = next(iter(result.errors.items()))
+            raise StageError(name, error)
+        return result
+
+    def run_sync(self, initial: Optional[Dict[str, Any]] = None, raise_on_error: bool = True) -> "DAGResult":
+        """
+        在新的事件循环中执行（供同步代码调用）
+        当前线程已有运行中的事件循环时（如已启动 Playwright 同步 API）在单独的线程中执行
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(initial, raise_on_error))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.run(initial, raise_on_error)).result()
+
+
+class DAGResult:
+    """执行结果：各阶段输出和时间线"""
+
+    def __init__(self, initial: Dict[str, Any]):
+        self.outputs = dict(initial)
+        self.errors = {}
+        self.spans = []
+        self.duration = 0.0
+
+    def __getitem__(self, name: str):
+        return self.outputs[name]
+
+    def get(self, name: str, default=None):
+        return self.outputs.get(name, default)
+
+    def timeline(self) -> str:
+        """按开始时间列出各阶段的起止时间和耗时"""
+        lines = []
+        for span in self.spans:
+            if span["start"] is None:
+                lines.append(f"   {span['stage']:<20} {'-':>8} {'-':>8} {'-':>8}  {span['status']}")
+                continue
+            items = f" ×{span['items']}" if span.get("items") is not None else ""
+            lines.append(
+                f"   {span['stage']:<20} {span['start']:>7.2f}s {span['end']:>7.2f}s "
+                f"{span['duration']:>7.2f}s  {span['status']}{items}"
+            )
+        lines.append(f"   总耗时 {self.duration:.2f}s")
+        return "\n".join(lines)
+
+
+def _span(name: str, status: str, origin: float, start: Optional[float], items: Optional[List]) -> Dict:
+    """生成一条时间线记录（时间相对于流程开始）"""
+    span = {"stage": name, "status": status, "start": None, "end": None, "duration": None}
+    if start is not None:
+        end = time.perf_counter()
+        span.update(start=round(start - origin, 3), end=round(end - origin, 3), duration=round(end - start, 3))
+    if items is not None:
+        span["items"] = len(items)
+    return span
+
+
+async def _call(func: Callable, kwargs: Dict[str, Any]):
+    """调用阶段函数：异步函数直接等待，同步函数放到线程中执行（返回协程的包装函数再等待其结果）"""
+    if inspect.iscoroutinefunction(func):
+        return await func(**kwargs)
+    output = await asyncio.to_thread(func, **kwargs)
+    if inspect.isawaitable(output):
+        output = await output
+    return output
+
+
+async def _fan_out(stage: Stage, values: Dict[str, Any], items: List) -> List:
+    """对展开输入的每个元素并发调用阶段函数，结果保持原顺序"""
+    semaphore = asyncio.Semaphore(stage.max_concurrency) if stage.max_concurrency else None
+
+    async def call_item(item):
+        kwargs = {name: value for name, value in values.items() if name != stage.fan_out}
+        kwargs[stage.item_arg] = item
+        if semaphore is None:
+            return await _call(stage.func, kwargs)
+        async with semaphore:
+            return await _call(stage.func, kwargs)
+
+    return list(await asyncio.gather(*(call_item(item) for item in items)))
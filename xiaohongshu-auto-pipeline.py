@@ -9,17 +9,29 @@ import asyncio
 import json
 import time
 import random
+import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 
 # Playwright
-from playwright.sync_api import sync_playwright
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    # 只生成内容、配图时不需要 Playwright，启动浏览器时再报错
+    sync_playwright = None
+
+from xhs_artifact_cache import ArtifactCache, cache_key, link_or_copy
+from xhs_publish_engine import PublishEngine, post_from_strategy
+from xhs_publish_scheduler import PublishScheduler, format_plan
+from xhs_records import RecordStore
+from xhs_stage_dag import StageDAG
 
 # 配置文件路径
 CONFIG_FILE = Path(__file__).parent / "xhs-auto-pipeline-config.json"
 STATE_FILE = Path(__file__).parent / "xhs-auto-state.json"
-RECORDS_FILE = Path(__file__).parent / "xhs-auto-records.json"
+RECORDS_FILE = Path(__file__).parent / "xhs-auto-records.jsonl"
+IMAGES_DIR = Path(__file__).parent / "images"
 
 # 内容模板
 CONTENT_TEMPLATES = {
@@ -90,6 +102,10 @@ class XiaoHongShuAutomator:
         self.records = self.load_records()
         self.browser = None
         self.page = None
+        # 配图缓存（automation.image_generation.cache），关闭时为 None
+        self.image_cache = ArtifactCache.from_config(config)
+        # 配置了 publish_engine 时用常驻浏览器的并发发布引擎发布
+        self.use_publish_engine = config.get("publish_engine", {}).get("enabled", False)
         
         # 添加统计
         self.stats = {
@@ -100,7 +116,7 @@ class XiaoHongShuAutomator:
             "successful_posts": 0,
             "total_views": 0,
             "total_likes": 0,
-            "total_collects": 0
+            "total_collects": 0,
             "total_comments": 0
         }
     
@@ -117,12 +133,9 @@ class XiaoHongShuAutomator:
         with open(STATE_FILE, 'w', encoding='utf-8') as f:
             json.dump(self.state, f, ensure_ascii=False, indent=2)
     
-    def load_records(self) -> List[Dict]:
-        """加载发布记录"""
-        if RECORDS_FILE.exists():
-            with open(RECORDS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+    def load_records(self) -> RecordStore:
+        """打开发布记录存储（追加写入，不把历史记录读入内存）"""
+        return RecordStore(RECORDS_FILE)
     
     def save_record(self, record: Dict):
         """保存发布记录"""
@@ -135,9 +148,6 @@ class XiaoHongShuAutomator:
             self.stats["total_collects"] += record.get("collects", 0)
             self.stats["total_comments"] += record.get("comments", 0)
         
-        with open(RECORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.records, f, ensure_ascii=False, indent=2)
-        
         # 更新状态
         self.state["last_post_time"] = datetime.now().isoformat()
         self.save_state()
@@ -160,8 +170,8 @@ class XiaoHongShuAutomator:
         """生成内容"""
         template = CONTENT_TEMPLATES.get(content_type, CONTENT_TEMPLATES["tutorial"])
         
-        # 选择emoji
-        emojis = template["emojis"]
+        # 选择emoji（分享、推荐模板没有单独配置，使用教程模板的）
+        emojis = template.get("emojis", CONTENT_TEMPLATES["tutorial"]["emojis"])
         selected_emojis = random.sample(emojis, min(5, len(emojis)))
         emoji_str = " ".join(selected_emojis)
         
@@ -189,7 +199,8 @@ class XiaoHongShuAutomator:
             tips=tips,
             target_audience=target_audience,
             call_to_action=call_to_action,
-            hashtags=hashtags
+            hashtags=hashtags,
+            reason=kwargs.get("reason", "")
         )
         
         return {
@@ -221,6 +232,8 @@ class XiaoHongShuAutomator:
         print("🌐 正在启动 Playwright 浏览器...")
         
         try:
+            if sync_playwright is None:
+                raise RuntimeError("需要 Playwright: pip install playwright && playwright install chromium")
             self.browser = sync_playwright().chromium.launch(
                 headless=self.config.get("chrome", {}).get("headless", False),
                 slow_mo=1000
@@ -279,8 +292,8 @@ class XiaoHongShuAutomator:
             "current_url": current_url
         }
     
-    def hotspot_monitoring(self) -> List[Dict]:
-        """热点监控（模拟）"""
+    def hotspot_monitoring(self, top_k: int = 3) -> List[Dict]:
+        """热点监控（模拟），返回热度最高的 top_k 个话题"""
         print("🔥 正在监控小红书热点...")
         
         # 模拟热点数据（真实场景需要集成 MediaCrawler）
@@ -295,8 +308,8 @@ class XiaoHongShuAutomator:
         # 按热度排序
         hot_topics.sort(key=lambda x: x["heat"], reverse=True)
         
-        # 选择前 3 个
-        top_topics = hot_topics[:3]
+        # 选择前 top_k 个
+        top_topics = hot_topics[:top_k]
         
         print(f"✅ 发现 {len(hot_topics)} 个热点话题")
         for i, topic in enumerate(top_topics):
@@ -341,12 +354,13 @@ class XiaoHongShuAutomator:
         if len(title) > 20:
             title = title[:20]
         
-        # 生成图片描述
+        # 生成图片描述（副标题和主色调按话题和标题固定选取，同一封面的描述每次相同）
+        cover_random = random.Random(f"{selected_topic}|{title}")
         image_prompt = f"""
         小红书风格封面图，{selected_topic}相关
         主标题：{title}
-        副标题：{random.choice(['太好用了', '绝对神器', '真心推荐', '谁用谁知道'])}
-        风格：简洁现代，使用{random.choice(['蓝色', '紫色', '橙色'])}为主色调
+        副标题：{cover_random.choice(['太好用了', '绝对神器', '真心推荐', '谁用谁知道'])}
+        风格：简洁现代，使用{cover_random.choice(['蓝色', '紫色', '橙色'])}为主色调
         元素：包含{selected_topic}相关图标或图形
         文字：大标题突出，副标题补充说明
         整体：干净整洁，吸引点击
@@ -372,18 +386,46 @@ class XiaoHongShuAutomator:
         return strategy
     
     def image_generation(self, strategy: Dict) -> str:
-        """配图生成（模拟）"""
+        """配图生成（模拟）：话题、标题、模板类型和生成参数相同时直接复用缓存中的配图"""
         print("🎨 正在生成配图...")
         
-        # 模拟图片文件路径
-        image_filename = f"xhs_post_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        image_path = Path(__file__).parent / "images" / image_filename
+        # 批量生成时多张图可能在同一秒完成，文件名带随机后缀
+        image_filename = f"xhs_post_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.jpg"
+        image_path = IMAGES_DIR / image_filename
         
         # 创建 images 目录（如果不存在）
         image_path.parent.mkdir(exist_ok=True)
+        if self.image_cache is None:
+            self.render_image(strategy, image_path)
+        else:
+            image_config = self.config.get("automation", {}).get("image_generation", {})
+            # 缓存键只用确定的输入，不用图片描述全文（策略中的描述可能带随机措辞）
+            key = cache_key(
+                f"{strategy['topic']}相关封面，{strategy['title']}",
+                template_type=strategy.get("template_type"),
+                provider=image_config.get("provider"),
+                style=image_config.get("style"),
+                size=image_config.get("size")
+            )
+            rendered = []
+            
+            def render(path):
+                rendered.append(path)
+                self.render_image(strategy, path)
+            
+            cached_path = self.image_cache.get_or_create(key, render, ".jpg")
+            # 发布队列引用 images/ 下的文件，缓存淘汰不影响待发布的笔记
+            link_or_copy(cached_path, image_path)
+            if not rendered:
+                print(f"⚡ 命中配图缓存: {cached_path}")
         
+        print(f"✅ 配图生成完成: {image_path.name}")
+        print(f"   保存路径: {image_path}")
+        return str(image_path)
+    
+    def render_image(self, strategy: Dict, image_path: Path):
+        """按策略生成配图并写到 image_path"""
         # 模拟生成过程
-        print(f"   正在生成: {image_filename}")
         print(f"   风格: {strategy['topic']}相关")
         print(f"   主标题: {strategy['title']}")
         
@@ -392,11 +434,6 @@ class XiaoHongShuAutomator:
         
         # 创建占位文件
         image_path.touch()
-        
-        print(f"✅ 配图生成完成: {image_filename}")
-        print(f"   保存路径: {image_path}")
-        
-        return str(image_path)
     
     def auto_publish(self, strategy: Dict, image_path: str) -> Dict:
         """自动发布（模拟）"""
@@ -414,11 +451,6 @@ class XiaoHongShuAutomator:
             print(f"   配图: {image_path}")
             print(f"   内容: {strategy['content'][:50]}...")
             
-            # 模拟等待时间（发布延迟）
-            publish_delay = strategy.get("publish_delay", 300)
-            print(f"   等待 {publish_delay} 秒后发布...")
-            time.sleep(min(publish_delay, 10))  # 最多等待 10 秒
-            
             # 模拟发布
             success = True
             message = "发布成功"
@@ -485,6 +517,84 @@ class XiaoHongShuAutomator:
                 "title": strategy["title"]
             }
     
+    def create_scheduler(self, publish_func=None, **kwargs) -> PublishScheduler:
+        """发布排期（automation.auto_publish 配置），不传发布函数时只用于写入排期"""
+        return PublishScheduler.from_config(self.config, publish_func, **kwargs)
+    
+    def enqueue_posts(self, jobs: List[tuple], fire_at: datetime = None) -> List[tuple]:
+        """
+        把笔记写入发布队列，由发布循环（dispatch）到点发布
+        :param jobs: [(strategy, image_path), ...]
+        :param fire_at: 发布时间，为空时按流量高峰时段排期
+        :return: [(排期ID, 发布时间, 发布任务)]
+        """
+        posts = [post_from_strategy(strategy, image_path) for strategy, image_path in jobs]
+        scheduler = self.create_scheduler()
+        planned = [(fire_at, post) for post in posts] if fire_at is not None else scheduler.plan(posts)
+        ids = scheduler.store.add_many(planned)
+        return [(entry_id, slot, post) for entry_id, (slot, post) in zip(ids, planned)]
+    
+    def record_published(self, post: Dict, result: Dict) -> Dict:
+        """保存发布队列中一篇笔记的发布结果，返回结构同 auto_publish 的结果"""
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "account": result.get("account"),
+            "topic": post["topic"],
+            "title": post["title"],
+            "content_type": post.get("content_type"),
+            "image_path": post["images"][0] if post.get("images") else None,
+            "success": result["success"],
+            "message": result["message"],
+            "views": 0,
+            "likes": 0,
+            "collects": 0,
+            "comments": 0,
+            "estimated_engagement": post.get("estimated_engagement", 0),
+            "duration": result.get("duration")
+        }
+        self.save_record(record)
+        if not result["success"]:
+            self.stats["failed_runs"] += 1
+        return dict(result, record=record)
+    
+    def dispatch(self, wait_for: List[int] = None) -> Dict[int, Dict]:
+        """
+        发布循环：按排期用发布引擎发布队列中的笔记
+        浏览器在第一篇到点时才启动，距下一篇较久时关闭，等待期间不占用资源
+        :param wait_for: 这些排期都发布后退出，默认一直运行
+        :return: {排期ID: 发布结果}（本次循环发布的笔记）
+        """
+        engine = PublishEngine.from_config(self.config)
+        published = {}
+        
+        def on_result(post, result):
+            published[result["schedule_id"]] = self.record_published(post, result)
+            if result["success"]:
+                self.data_feedback(published[result["schedule_id"]]["record"])
+        
+        async def publish(posts):
+            if not engine.started:
+                await engine.start()
+            return await engine.publish_many(posts)
+        
+        async def release():
+            if engine.started:
+                print("💤 距下一篇发布还早，先关闭浏览器")
+                await engine.stop()
+        
+        scheduler = self.create_scheduler(publish, on_result=on_result, on_idle=release)
+        
+        async def run():
+            try:
+                await scheduler.run(wait_for=wait_for)
+            finally:
+                if engine.started:
+                    await engine.stop()
+        
+        print(f"🗓️ 发布队列: {scheduler.store.db_file}")
+        asyncio.run(run())
+        return published
+    
     def data_feedback(self, record: Dict) -> Dict:
         """数据反馈"""
         print("📊 正在收集发布数据...")
@@ -544,56 +654,150 @@ class XiaoHongShuAutomator:
         
         return analysis
     
-    def run_full_pipeline(self, topic: str = None) -> Dict:
-        """运行完整流程"""
-        print("🚀 开始运行小红书自动化闭环...")
-        print("=" * 50)
+    def build_strategy(self, hot_topics: List[Dict], topic: str = None) -> Dict:
+        """制定策略：未指定话题时按热点制定，否则使用指定话题"""
+        if not topic:
+            return self.strategy_formulation(hot_topics)
         
-        # 步骤 1: 热点监控
-        print("\n📥 步骤 1: 热点监控")
-        hot_topics = self.hotspot_monitoring()
+        # 使用指定话题
+        content = self.generate_content(
+            topic=topic,
+            content_type="tutorial",
+            main_content=f"这个{topic}真的太好用了，完全改变了我的工作方式！",
+            tips=f"1. 一定要试 2. 绝对不后悔 3. 事半功倍",
+            target_audience=f"所有对{topic}感兴趣的朋友",
+            call_to_action=f"快来试试吧！",
+            hashtags=f" #{topic} #效率工具"
+        )
         
-        # 步骤 2: 策略制定
-        print("\n📊 步骤 2: 策略制定")
-        if not topic:
-            strategy = self.strategy_formulation(hot_topics)
-        else:
-            # 使用指定话题
-            content = self.generate_content(
-                topic=topic,
-                content_type="tutorial",
-                main_content=f"这个{topic}真的太好用了，完全改变了我的工作方式！",
-                tips=f"1. 一定要试 2. 绝对不后悔 3. 事半功倍",
-                target_audience=f"所有对{topic}感兴趣的朋友",
-                call_to_action=f"快来试试吧！",
-                hashtags=f" #{topic} #效率工具"
+        title = self.generate_title(topic, "curiosity")
+        if len(title) > 20:
+            title = title[:20]
+        
+        return {
+            "topic": topic,
+            "title": title,
+            "content": content,
+            "image_prompt": f"{topic}相关封面，{title}",
+            "content_type": "tutorial",
+            "template_type": "curiosity",
+            "publish_delay": random.randint(300, 600),
+            "estimated_engagement": 12.0
+        }
+    
+    def prepare_post(self, topic: str = None):
+        """
+        发布前的准备阶段（按依赖关系执行，配图生成不等待内容生成）
+        :param topic: 指定话题，为空时按热点选择
+        :return: DAGResult，包含 hot_topics / strategy / content / image_path
+        """
+        timeouts = self.config.get("automation", {}).get("stage_timeouts", {})
+        dag = StageDAG()
+        dag.add("hot_topics", self.hotspot_monitoring, timeout=timeouts.get("hot_topics"))
+        dag.add("strategy", self.build_strategy, ["hot_topics", "topic"], timeout=timeouts.get("strategy"))
+        dag.add("content", self.content_generation, ["strategy"], timeout=timeouts.get("content"))
+        dag.add("image_path", self.image_generation, ["strategy"], timeout=timeouts.get("image"))
+        
+        result = dag.run_sync({"topic": topic})
+        print("\n⏱️ 阶段时间线:")
+        print(result.timeline())
+        return result
+    
+    def prepare_campaign(self, count: int):
+        """
+        一次准备多篇笔记：热度前 count 的话题各制定一份策略，所有配图并发生成
+        :param count: 笔记数
+        :return: DAGResult，包含 hot_topics / strategies / image_paths
+        """
+        timeouts = self.config.get("automation", {}).get("stage_timeouts", {})
+        image_concurrency = self.config.get("automation", {}).get("campaign", {}).get("image_concurrency", 4)
+        dag = StageDAG()
+        dag.add("hot_topics", lambda: self.hotspot_monitoring(top_k=count), timeout=timeouts.get("hot_topics"))
+        dag.add("strategies", lambda topic: self.strategy_formulation([topic]), ["hot_topics"],
+                fan_out="hot_topics", item_arg="topic", timeout=timeouts.get("strategy"))
+        dag.add("image_paths", self.image_generation, ["strategies"], fan_out="strategies", item_arg="strategy",
+                max_concurrency=image_concurrency, timeout=timeouts.get("image"))
+        
+        result = dag.run_sync()
+        print("\n⏱️ 阶段时间线:")
+        print(result.timeline())
+        return result
+    
+    def run_campaign(self, count: int = None, plan_only: bool = False) -> Dict:
+        """
+        批量模式：一次生成 count 篇笔记，排进流量高峰时段，用发布引擎按排期发布
+        浏览器、配置和热点数据在整批笔记间共用
+        :param count: 笔记数，默认 automation.campaign.top_k
+        :param plan_only: 只输出排期不发布
+        """
+        count = count or self.config.get("automation", {}).get("campaign", {}).get("top_k", 3)
+        print(f"🚀 批量模式：本次生成 {count} 篇笔记")
+        print("=" * 50)
+        
+        prepared = self.prepare_campaign(count)
+        accounts = list(self.config.get("publish_engine", {}).get("accounts", {})) or [None]
+        jobs = []
+        for index, (strategy, image_path) in enumerate(zip(prepared["strategies"], prepared["image_paths"])):
+            # 多账号时轮流分配
+            strategy["account"] = accounts[index % len(accounts)]
+            jobs.append((strategy, image_path))
+        
+        if plan_only:
+            planned = self.create_scheduler().plan(
+                [post_from_strategy(strategy, image_path) for strategy, image_path in jobs]
             )
-            
-            title = self.generate_title(topic, "curiosity")
-            if len(title) > 20:
-                title = title[:20]
-            
-            strategy = {
-                "topic": topic,
-                "title": title,
-                "content": content,
-                "image_prompt": f"{topic}相关封面，{title}",
-                "content_type": "tutorial",
-                "template_type": "curiosity",
-                "publish_delay": random.randint(300, 600),
-                "estimated_engagement": 12.0
-            }
+            print("\n🗓️ 发布排期（未写入队列）:")
+            print(format_plan(planned))
+            return {"success": True, "planned": planned, "published": []}
+        
+        scheduled = self.enqueue_posts(jobs)
+        planned = [(slot, post) for _, slot, post in scheduled]
+        print("\n🗓️ 发布排期（已写入队列）:")
+        print(format_plan(planned))
+        
+        if not self.use_publish_engine:
+            print("\n⚠️ 未启用 publish_engine，笔记留在队列中，启用后运行 dispatch 发布")
+            return {"success": True, "planned": planned, "published": []}
         
-        # 步骤 3: 内容生成
-        print("\n✍️  步骤 3: 内容生成")
-        strategy = self.content_generation(strategy)
+        self.dispatch(wait_for=[entry_id for entry_id, _, _ in scheduled])
+        self.stats["total_runs"] += 1
+        return {"success": True, "planned": planned, "stats": self.stats}
+    
+    def run_full_pipeline(self, topic: str = None) -> Dict:
+        """
+        运行完整流程
+        启用 publish_engine 时笔记写入发布队列后立即返回，由 dispatch 发布循环按排期发布并收集数据反馈
+        """
+        print("🚀 开始运行小红书自动化闭环...")
+        print("=" * 50)
         
-        # 步骤 4: 配图生成
-        print("\n🎨 步骤 4: 配图生成")
-        image_path = self.image_generation(strategy)
+        # 步骤 1-4: 热点监控 → 策略制定 → 内容生成 / 配图生成（后两步互不依赖，并发执行）
+        print("\n📥 步骤 1-4: 热点监控 → 策略制定 → 内容生成 / 配图生成")
+        prepared = self.prepare_post(topic)
+        strategy = prepared["strategy"]
+        image_path = prepared["image_path"]
         
         # 步骤 5: 自动发布
         print("\n📤 步骤 5: 自动发布")
+        if self.use_publish_engine:
+            # 按策略的发布延迟写入发布队列，等待期间不占用浏览器
+            fire_at = datetime.now() + timedelta(seconds=strategy.get("publish_delay", 300))
+            entry_id, _, _ = self.enqueue_posts([(strategy, image_path)], fire_at=fire_at)[0]
+            print(f"   已加入发布队列（排期 #{entry_id}），{fire_at.strftime('%H:%M:%S')} 由发布循环发布")
+            print("   如发布循环未运行，请执行: python xiaohongshu-auto-pipeline.py dispatch")
+            self.stats["total_runs"] += 1
+            return {
+                "success": True,
+                "queued": True,
+                "schedule_id": entry_id,
+                "fire_at": fire_at.isoformat(),
+                "topic": strategy["topic"],
+                "title": strategy["title"],
+                "publish_result": None,
+                "feedback": None,
+                "stats": self.stats
+            }
+        
         publish_result = self.auto_publish(strategy, image_path)
         
         # 步骤 6: 数据反馈
@@ -674,8 +878,12 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="小红书自动化闭环系统")
-    parser.add_argument("action", choices=["run", "test", "stats"], help="要执行的操作")
+    parser.add_argument("action", choices=["run", "test", "stats", "campaign", "dispatch"],
+                        help="要执行的操作（启用 publish_engine 时 run/test 只写入发布队列，由常驻的 dispatch 发布；"
+                             "campaign 会一直运行到整批笔记按排期发布完成）")
     parser.add_argument("--topic", type=str, help="指定发布话题")
+    parser.add_argument("--count", type=int, help="批量模式生成的笔记数（默认 automation.campaign.top_k）")
+    parser.add_argument("--plan-only", action="store_true", help="批量模式只输出排期不发布")
     parser.add_argument("--mode", choices=["headless", "headed"], default="headed", help="浏览器模式")
     
     args = parser.parse_args()
@@ -692,19 +900,37 @@ def main():
     # 创建自动化系统
     automator = XiaoHongShuAutomator(config)
     
-    # 启动浏览器
-    if not automator.launch_browser():
-        print("❌ 浏览器启动失败，退出")
+    if args.action == "dispatch":
+        # 常驻发布循环：发布任何流程写入队列的笔记，重启后从队列继续
+        if not automator.use_publish_engine:
+            print("❌ 发布循环需要启用 publish_engine")
+            return
+        automator.dispatch()
         return
     
-    # 导航到小红书
-    if not automator.navigate_to_xiaohongshu():
-        print("❌ 导航失败，退出")
-        automator.cleanup()
+    if args.action == "campaign":
+        # 批量模式由发布引擎登录和发布，不启动同步浏览器
+        automator.run_campaign(args.count, plan_only=args.plan_only)
+        print("\n✅ 小红书自动化闭环系统执行完成！")
         return
     
-    # 检查登录状态
-    login_status = automator.check_login_status()
+    if automator.use_publish_engine:
+        # 发布引擎用各账号的 cookies 登录，发布时检查登录状态
+        login_status = {"is_logged_in": True, "status": "publish_engine"}
+    else:
+        # 启动浏览器
+        if not automator.launch_browser():
+            print("❌ 浏览器启动失败，退出")
+            return
+        
+        # 导航到小红书
+        if not automator.navigate_to_xiaohongshu():
+            print("❌ 导航失败，退出")
+            automator.cleanup()
+            return
+        
+        # 检查登录状态
+        login_status = automator.check_login_status()
     
     if args.action == "run":
         # 完整流程
@@ -725,13 +951,14 @@ def main():
         # 统计模式
         print("📊 统计模式")
         print("=" * 40)
-        print(f"📤 发布统计")
-        print(f"   总发布: {automator.stats['total_posts']}")
-        print(f"   成功发布: {automator.stats['successful_posts']}")
-        print(f"   总浏览量: {automator.stats['total_views']}")
-        print(f"   总点赞: {automator.stats['total_likes']}")
-        print(f"   总收藏: {automator.stats['total_collects']}")
-        print(f"   总评论: {automator.stats['total_comments']}")
+        summary = automator.records.summary()
+        print(f"📤 发布统计（全部记录）")
+        print(f"   总发布: {summary['total_posts']}")
+        print(f"   成功发布: {summary['successful_posts']}")
+        print(f"   总浏览量: {summary['total_views']}")
+        print(f"   总点赞: {summary['total_likes']}")
+        print(f"   总收藏: {summary['total_collects']}")
+        print(f"   总评论: {summary['total_comments']}")
         print()
         
         print(f"📈 运行统计")
@@ -3,35 +3,115 @@
 整合监控、策略、客户跟踪等功能
 """
 import json
-import time
 import sys
+import threading
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 
+from ingest import CommentQueue, PushServer
 from monitor import XHSMonitor
 from reply_strategy import ReplyStrategy
 from customer_tracker import CustomerTracker
+from reply_outbox import ReplyOutbox
+from reply_budget import ReplyBudget
+from reply_log import ReplyLog
+
+
+# 回复优先级：数值越小越先发送，咨询类评论优先
+REPLY_PRIORITY = {
+    "price": 0,
+    "question": 0,
+    "product": 1
+}
+
+# 评论来源的显示名称
+INGEST_MODE_NAMES = {
+    "poll": "轮询",
+    "push": "推送",
+    "hybrid": "推送 + 轮询兜底"
+}
+
+# 额度范围的显示名称
+BUDGET_SCOPE_NAMES = {
+    "account": "账号",
+    "note": "笔记",
+    "user": "用户"
+}
 
 
 class AutoReplySystem:
-    def __init__(self, config_file="./config.json"):
-        self.config = self._load_config(config_file)
-        self.monitor = XHSMonitor(config_file)
-        self.strategy = ReplyStrategy()
+    def __init__(self, config_file="./config.json", config=None, strategy=None, account="default"):
+        """
+        :param config_file: 配置文件
+        :param config: 已加载的配置（多账号运行时注入），提供时忽略 config_file
+        :param strategy: 共享的回复策略（多账号运行时注入），默认按配置新建
+        :param account: 账号名称（用于发件箱和额度）
+        """
+        self.config = config if config is not None else self._load_config(config_file)
+        self.account = account
+        self.monitor = XHSMonitor(config_file, config=self.config)
+        self.strategy = strategy or ReplyStrategy.from_config(self.config)
         self.tracker = CustomerTracker(
-            db_file=self.config.get("storage", {}).get("customer_db", "./data/customers.json")
+            db_file=self.config.get("storage", {}).get("customer_db", "./data/customers.json"),
+            store_file=self.config.get("storage", {}).get("customer_store"),
+            cache_size=self.config.get("customers", {}).get("cache_size", 10000)
         )
 
         # 创建必要的目录
         Path("./data").mkdir(parents=True, exist_ok=True)
         Path("./logs").mkdir(parents=True, exist_ok=True)
 
-        # 回复统计
+        # 回复发件箱：监控线程入队，后台线程按节奏发送
+        reply_config = self.config.get("reply", {})
+        # 批量模式：每轮检查的新评论统一规划、一次入队
+        self.batch_mode = reply_config.get("batch_mode", True)
+        # 评论来源：poll 轮询 / push 本地推送接口 / hybrid 推送为主、轮询兜底
+        self.ingest_mode = self.config.get("ingest", {}).get("mode", "poll")
+        # 推送接入运行时的评论队列和本地接口
+        self.comment_queue = None
+        self.push_server = None
+        self.outbox = ReplyOutbox(
+            send_func=self.monitor.post_reply,
+            db_file=self.config.get("storage", {}).get("outbox_db", "./data/outbox.db"),
+            on_sent=self._on_reply_sent,
+            on_failed=self._on_reply_failed,
+            reply_delay=reply_config.get("reply_delay", 5),
+            reply_delay_jitter=reply_config.get("reply_delay_jitter", 3),
+            daily_cap=self._daily_limit(),
+            max_attempts=reply_config.get("max_attempts", 5),
+            retry_base_delay=reply_config.get("retry_base_delay", 30),
+            reply_ttl_hours=reply_config.get("reply_ttl_hours", 24)
+        )
+
+        # 回复额度：账号 / 笔记 / 用户三级令牌桶，状态持久化，重启不重置
+        period = reply_config.get("budget_period_hours", 24) * 3600
+        self.budget = ReplyBudget(
+            db_file=self.config.get("storage", {}).get("reply_budget_db", "./data/reply_budget.db"),
+            limits={
+                "account": {"capacity": self._daily_limit(), "period": period},
+                "note": {"capacity": reply_config.get("max_reply_per_note", 20), "period": period},
+                "user": {"capacity": reply_config.get("max_reply_per_user", 3), "period": period}
+            }
+        )
+
+        # 结构化回复日志
+        log_config = self.config.get("reply_log", {})
+        self.reply_log = ReplyLog(
+            log_dir=self.config.get("storage", {}).get("reply_log", "./logs/replies"),
+            flush_records=log_config.get("flush_records", 100),
+            flush_interval=log_config.get("flush_interval", 5),
+            max_file_bytes=log_config.get("max_file_mb", 10) * 1024 * 1024
+        )
+
+        # 回复统计（从发件箱恢复，重启不清零）
         self.reply_stats = {
-            "total_replies": 0,
-            "today_replies": 0,
+            "total_replies": self.outbox.sent_count(self.account),
+            "today_replies": self.outbox.sent_today(self.account),
             "last_reset": datetime.now().strftime("%Y-%m-%d")
         }
+        # 本次运行处理过的新评论数（用于计算吞吐量）
+        self.comments_processed = 0
 
     def _load_config(self, config_file):
         """加载配置文件"""
@@ -42,15 +122,23 @@ class AutoReplySystem:
         with open(config_path, 'r', encoding='utf-8') as f:
             return json.load(f)
 
-    def _log_reply(self, note_id, comment, reply_text):
-        """记录回复日志"""
-        log_file = Path("./logs/reply.log")
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        log_entry = f"[{timestamp}] 笔记:{note_id} | 用户:{comment['user_name']} | 评论:{comment['content'][:30]}... | 回复:{reply_text[:30]}...\n"
-
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
+    def _log_reply(self, item):
+        """
+        记录回复日志（结构化，缓冲后批量写入）
+        :param item: 发件箱条目
+        """
+        comment = item["comment"]
+        self.reply_log.write({
+            "account": item["account"],
+            "note_id": item["note_id"],
+            "comment_id": item["comment_id"],
+            "user_id": comment.get("user_id"),
+            "user_name": comment.get("user_name"),
+            "category": comment.get("category"),
+            "template": comment.get("template"),
+            "comment": comment.get("content"),
+            "reply": item["content"]
+        })
 
     def _check_daily_reset(self):
         """检查是否需要重置每日统计"""
@@ -60,17 +148,26 @@ class AutoReplySystem:
             self.reply_stats["last_reset"] = today
             print(f"📅 新的一天开始，每日统计已重置")
 
-    def _should_reply(self, comment):
-        """判断是否应该回复"""
+    def _daily_limit(self):
+        """每日回复上限"""
+        reply_config = self.config.get("reply", {})
+        return reply_config.get("max_reply_per_day", reply_config.get("max_reply_per_note", 20))
+
+    def _should_reply(self, note_id, comment):
+        """
+        判断是否应该回复，应该回复时扣减一次额度
+        :param note_id: 笔记ID
+        :param comment: 评论数据
+        """
         # 检查是否为子评论（可选）
         if comment.get("is_sub_comment"):
             # 子评论是否也回复，根据配置决定
             return False
 
-        # 检查今日回复数量限制
-        max_replies = self.config.get("reply", {}).get("max_reply_per_note", 20)
-        if self.reply_stats["today_replies"] >= max_replies:
-            print(f"⚠️ 今日回复已达上限 ({max_replies})")
+        # 账号、笔记、用户三级额度都有余量才回复
+        blocked = self.budget.try_consume(note_id, comment.get("user_id"), self.account)
+        if blocked:
+            print(f"⚠️ {BUDGET_SCOPE_NAMES[blocked]}回复额度已用完，跳过: {comment.get('comment_id')}")
             return False
 
         return True
@@ -81,58 +178,204 @@ class AutoReplySystem:
         :param note_id: 笔记ID
         :param comment: 评论数据
         """
-        if not self._should_reply(comment):
+        self.comments_processed += 1
+        user_id = comment.get("user_id")
+        # 用户再次评论，计入上次回复所用模板的互动
+        self.strategy.template_index.record_engagement(user_id)
+        if not self._should_reply(note_id, comment):
             return
 
         # 获取用户历史
-        user_id = comment.get("user_id")
         user_history = self.tracker.get_user_history(user_id)
 
         # 选择回复策略
-        reply_text = self.strategy.get_reply_with_conversion(
+        reply_text, template = self.strategy.compose_reply(
             comment.get("content", ""),
-            user_history
+            user_history,
+            user_id
         )
 
-        # 添加延迟，模拟真人
-        reply_delay = self.config.get("reply", {}).get("reply_delay", 5)
-        time.sleep(reply_delay)
+        # 放入发件箱，由后台线程按真人节奏发送
+        category = self.strategy.classify_comment(comment.get("content", ""))
+        priority = REPLY_PRIORITY.get(category, 2)
+        comment = dict(comment, category=category, template=template)
+        if not self.outbox.enqueue(note_id, comment, reply_text, priority=priority, account=self.account):
+            # 已在队列中，归还额度
+            self.budget.refund(note_id, user_id, self.account)
+        self.budget.flush()
 
-        # 发布回复
-        success = self.monitor.post_reply(
-            note_id,
-            comment.get("comment_id"),
-            reply_text
+    def process_batch(self, results):
+        """
+        批量处理一轮检查发现的全部新评论
+        按用户和笔记分组、一次完成分类，在全局范围内分配每日和每篇笔记的额度，一次事务入队
+        :param results: {note_id: 新评论列表}
+        :return: 新加入发件箱的回复数量
+        """
+        # 先把已发送的回复写入客户跟踪，保证用户历史是最新的
+        self._record_sent_replies()
+
+        # 子评论不回复
+        candidates = [
+            (note_id, comment)
+            for note_id, comments in results.items()
+            for comment in comments
+            if not comment.get("is_sub_comment")
+        ]
+        self.comments_processed += len(candidates)
+        if not candidates:
+            return 0
+
+        for _, comment in candidates:
+            self.strategy.template_index.record_engagement(comment.get("user_id"))
+
+        analyses = self.strategy.analyze_many(
+            [comment.get("content", "") for _, comment in candidates],
+            [comment.get("comment_id") for _, comment in candidates]
         )
 
-        if success:
-            # 记录互动
+        # 同一用户在同一笔记下的多条评论只回复优先级最高的一条
+        grouped = {}
+        for (note_id, comment), analysis in zip(candidates, analyses):
+            priority = REPLY_PRIORITY.get(analysis["category"], 2)
+            key = (note_id, comment.get("user_id"))
+            if key not in grouped or priority < grouped[key][0]:
+                grouped[key] = (priority, dict(comment, category=analysis["category"]))
+
+        # 每个用户只查一次历史
+        histories = {}
+        items = []
+        for note_id, comment, priority in self._allocate_replies(grouped):
+            user_id = comment.get("user_id")
+            if user_id not in histories:
+                histories[user_id] = self.tracker.get_user_history(user_id)
+            reply_text, template = self.strategy.compose_reply(
+                comment.get("content", ""), histories[user_id], user_id
+            )
+            items.append((note_id, dict(comment, template=template), reply_text, priority))
+
+        added = set(self.outbox.enqueue_many(items, account=self.account))
+        for note_id, comment, _, _ in items:
+            if comment.get("comment_id") not in added:
+                # 已在队列中，归还额度
+                self.budget.refund(note_id, comment.get("user_id"), self.account)
+        self.budget.flush()
+
+        print(f"📦 本轮新评论 {len(candidates)} 条 | 计划回复 {len(items)} 条"
+              f" | 新入队 {len(added)} 条 | 待发送 {self.outbox.pending_count()}")
+        return len(added)
+
+    def _allocate_replies(self, grouped):
+        """
+        在笔记之间轮流分配回复额度，避免单个热门笔记占满账号额度
+        :param grouped: {(note_id, user_id): (优先级, 评论)}
+        :return: [(note_id, 评论, 优先级)]，每篇笔记内按优先级排列
+        """
+        queues = {}
+        for (note_id, _), (priority, comment) in grouped.items():
+            queues.setdefault(note_id, []).append((priority, comment))
+        queues = {
+            note_id: deque(sorted(queue, key=lambda entry: entry[0]))
+            for note_id, queue in queues.items()
+        }
+
+        planned = []
+        while queues:
+            for note_id in list(queues):
+                queue = queues[note_id]
+                if not queue:
+                    del queues[note_id]
+                    continue
+
+                priority, comment = queue.popleft()
+                blocked = self.budget.try_consume(note_id, comment.get("user_id"), self.account)
+                if blocked == "account":
+                    skipped = 1 + sum(len(remaining) for remaining in queues.values())
+                    print(f"⚠️ 账号回复额度已用完，本轮剩余 {skipped} 条评论不回复")
+                    return planned
+                if blocked == "note":
+                    del queues[note_id]
+                    continue
+                if blocked is None:
+                    planned.append((note_id, comment, priority))
+
+        return planned
+
+    def _record_sent_replies(self):
+        """
+        把已发送但尚未记录的回复批量写入客户跟踪（一次事务）
+        :return: 记录条数
+        """
+        items = self.outbox.unrecorded_sent()
+        if not items:
+            return 0
+
+        self.tracker.record_interactions([
+            {
+                "user_id": item["comment"].get("user_id"),
+                "user_name": item["comment"].get("user_name"),
+                "note_id": item["note_id"],
+                "comment": item["comment"].get("content"),
+                "reply": item["content"]
+            }
+            for item in items
+        ])
+        self.outbox.mark_recorded([item["id"] for item in items])
+        return len(items)
+
+    def _on_reply_sent(self, item):
+        """
+        回复发送成功后的记录（在发件箱线程中调用）
+        :param item: 发件箱条目
+        """
+        note_id = item["note_id"]
+        comment = item["comment"]
+        reply_text = item["content"]
+
+        # 记录互动（批量模式下在每轮检查开始时统一写入）
+        if not self.batch_mode:
             self.tracker.record_interaction(
-                user_id,
+                comment.get("user_id"),
                 comment.get("user_name"),
                 note_id,
                 comment.get("content"),
                 reply_text
             )
+            self.outbox.mark_recorded([item["id"]])
+
+        # 统计模板发送次数，用户之后再次评论时计入互动
+        self.strategy.template_index.record_sent(comment.get("category"), comment.get("template"), comment.get("user_id"))
 
-            # 记录日志
-            self._log_reply(note_id, comment, reply_text)
+        # 记录日志
+        self._log_reply(item)
 
-            # 更新统计
-            self._check_daily_reset()
-            self.reply_stats["total_replies"] += 1
-            self.reply_stats["today_replies"] += 1
+        # 更新统计
+        self._check_daily_reset()
+        self.reply_stats["total_replies"] += 1
+        self.reply_stats["today_replies"] += 1
 
-            print(f"📊 总回复: {self.reply_stats['total_replies']} | 今日: {self.reply_stats['today_replies']}")
+        print(f"📊 总回复: {self.reply_stats['total_replies']} | 今日: {self.reply_stats['today_replies']}"
+              f" | 待发送: {self.outbox.pending_count()}")
 
-    def run(self):
-        """运行自动回复系统"""
+    def _on_reply_failed(self, item):
+        """
+        回复最终发送失败（在发件箱线程中调用），归还额度
+        :param item: 发件箱条目
+        """
+        self.budget.refund(item["note_id"], item["comment"].get("user_id"), item["account"])
+        self.budget.flush()
+
+    def run(self, stop_event=None, close=True):
+        """
+        运行自动回复系统
+        :param stop_event: threading.Event，设置后停止（多账号运行时使用）
+        :param close: 停止后是否关闭数据库和连接池（多账号运行时由运行器统一关闭）
+        """
         print("=" * 50)
         print("小红书自动回复系统")
         print("=" * 50)
 
-        # 检查配置
-        if not self.config.get("xiaohongshu", {}).get("note_ids"):
+        # 检查配置（纯推送模式不需要配置笔记）
+        if self.ingest_mode != "push" and not self.config.get("xiaohongshu", {}).get("note_ids"):
             print("❌ 错误: 请在 config.json 中配置要监控的笔记ID")
             return
 
@@ -143,14 +386,110 @@ class AutoReplySystem:
             print("✅ 自动回复已启用")
             mode = "auto"
 
-        print(f"\n监控的笔记数量: {len(self.config['xiaohongshu']['note_ids'])}")
-        print(f"每日回复上限: {self.config['reply'].get('max_reply_per_note', 20)}")
-        print(f"回复延迟: {self.config['reply'].get('reply_delay', 5)} 秒")
+        print(f"\n监控的笔记数量: {len(self.config.get('xiaohongshu', {}).get('note_ids', []))}"
+              f" | 评论来源: {INGEST_MODE_NAMES.get(self.ingest_mode, self.ingest_mode)}")
+        print(f"每日回复上限: {self._daily_limit()} | 每篇笔记: {self.config['reply'].get('max_reply_per_note', 20)}"
+              f" | 每个用户: {self.config['reply'].get('max_reply_per_user', 3)}")
+        print(f"回复间隔: {self.config['reply'].get('reply_delay', 5)}"
+              f"~{self.config['reply'].get('reply_delay', 5) + self.config['reply'].get('reply_delay_jitter', 3)} 秒")
         print("\n系统运行中... (按 Ctrl+C 停止)")
         print("=" * 50 + "\n")
 
+        # 补记上次运行中已发送但未写入客户跟踪的回复
+        self._record_sent_replies()
+
         # 开始监控
-        self.monitor.start_monitoring(callback=self._process_comment)
+        self.outbox.start()
+        try:
+            if self.ingest_mode in ("push", "hybrid"):
+                self._run_ingest(stop_event)
+            elif self.batch_mode:
+                self.monitor.start_monitoring(
+                    before_sweep=self.strategy.begin_cycle,
+                    batch_callback=self.process_batch,
+                    stop_event=stop_event
+                )
+            else:
+                self.monitor.start_monitoring(
+                    callback=self._process_comment,
+                    before_sweep=self.strategy.begin_cycle,
+                    stop_event=stop_event
+                )
+        finally:
+            self.outbox.stop()
+            self._record_sent_replies()
+            # 退出时导出一份 JSON，兼容依赖 customers.json 的工具
+            self.tracker.export_json()
+            if close:
+                self.close()
+
+    def _run_ingest(self, stop_event=None):
+        """
+        推送接入：本地接口接收推送的评论，混合模式下轮询结果也写入同一队列，统一在当前线程处理
+        :param stop_event: threading.Event，设置后停止
+        """
+        ingest_config = self.config.get("ingest", {})
+        self.comment_queue = comment_queue = CommentQueue(
+            max_size=ingest_config.get("max_queue", 10000),
+            batch_window=ingest_config.get("batch_window", 0.2)
+        )
+        self.push_server = push_server = PushServer(
+            comment_queue,
+            dedup=self.monitor.processed_comments,
+            host=ingest_config.get("host", "127.0.0.1"),
+            port=ingest_config.get("port", 8765),
+            token=ingest_config.get("token", "")
+        )
+        push_server.start()
+
+        poll_stop = threading.Event()
+        poll_thread = None
+        if self.ingest_mode == "hybrid":
+            poll_thread = threading.Thread(
+                target=self.monitor.start_monitoring,
+                kwargs={"batch_callback": comment_queue.put_results, "stop_event": poll_stop},
+                name=f"xhs-poll-{self.account}",
+                daemon=True
+            )
+            poll_thread.start()
+
+        try:
+            comment_queue.consume(
+                self.process_batch if self.batch_mode else self._process_results,
+                before_batch=self.strategy.begin_cycle,
+                stop_event=stop_event
+            )
+        except KeyboardInterrupt:
+            print("\n监控已停止")
+        finally:
+            push_server.stop()
+            poll_stop.set()
+            # 消费者已停止，唤醒等待队列空间的轮询线程
+            comment_queue.close()
+            if poll_thread is not None:
+                poll_thread.join()
+            stats = comment_queue.stats()
+            print(f"📥 接入统计: {stats['received']} | 丢弃 {stats['dropped']}"
+                  f" | 平均延迟 {stats['avg_latency']} 秒 | P90 {stats['p90_latency']} 秒")
+
+    def _process_results(self, results):
+        """
+        逐条处理一批评论（非批量模式下的推送接入）
+        :param results: {note_id: 评论列表}
+        """
+        for note_id, comments in results.items():
+            for comment in comments:
+                self._process_comment(note_id, comment)
+
+    def close(self):
+        """关闭发件箱、额度、日志、客户数据和连接池"""
+        self.outbox.close()
+        self.budget.close()
+        self.reply_log.close()
+        self.strategy.template_index.save_stats()
+        self.tracker.close()
+        self.monitor.processed_comments.close()
+        self.monitor.client.close()
 
     def show_stats(self):
         """显示统计信息"""
@@ -170,6 +509,55 @@ class AutoReplySystem:
         print("=" * 50)
         print(f"总回复数: {self.reply_stats['total_replies']}")
         print(f"今日回复: {self.reply_stats['today_replies']}")
+        print(f"今日已发送: {self.outbox.sent_today(self.account)}")
+        print(f"待发送: {self.outbox.pending_count()}")
+
+        stats_file = Path(self.config.get("storage", {}).get(
+            "scheduler_stats", "./data/scheduler_stats.json"
+        ))
+        if stats_file.exists():
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                scheduler_stats = json.load(f)
+
+            print("\n" + "=" * 50)
+            print("⏱️ 轮询调度统计")
+            print("=" * 50)
+            print(f"监控笔记: {scheduler_stats['notes']}")
+            print(f"请求次数: {scheduler_stats['total_requests']} ({scheduler_stats['requests_per_hour']}/小时)")
+            print(f"每条新评论请求数: {scheduler_stats['requests_per_comment']}")
+            print(f"平均发现延迟: {scheduler_stats['avg_detection_latency']} 秒")
+            print(f"P90发现延迟: {scheduler_stats['p90_detection_latency']} 秒")
+            print(f"检查间隔: {scheduler_stats['min_interval']} ~ {scheduler_stats['max_interval']} 秒")
+            print(f"热门/冷门笔记: {scheduler_stats['hot_notes']} / {scheduler_stats['dormant_notes']}")
+
+            for endpoint, latency in scheduler_stats.get("latency", {}).items():
+                print(f"接口 {endpoint}: {latency['count']} 次 | 错误 {latency['errors']}"
+                      f" | P50 {latency['p50_ms']}ms | P90 {latency['p90_ms']}ms")
+
+    def show_budget(self):
+        """显示各账号、笔记、用户的剩余回复额度"""
+        period_hours = self.config.get("reply", {}).get("budget_period_hours", 24)
+
+        print("\n" + "=" * 50)
+        print(f"💰 回复额度（每 {period_hours} 小时补满）")
+        print("=" * 50)
+
+        def fmt(scope, key):
+            remaining = self.budget.remaining(scope, key)
+            if remaining is None:
+                return "不限制"
+            return f"{remaining:.1f} / {self.budget.limits[scope]['capacity']}"
+
+        print(f"账号 {self.account}: {fmt('account', self.account)}")
+
+        note_ids = list(self.config.get("xiaohongshu", {}).get("note_ids", []))
+        note_ids += [note_id for note_id in self.budget.snapshot("note") if note_id not in note_ids]
+        for note_id in note_ids:
+            print(f"笔记 {note_id}: {fmt('note', note_id)}")
+
+        users = self.budget.snapshot("user")
+        exhausted = sum(1 for remaining in users.values() if remaining < 1)
+        print(f"用户: {len(users)} 人额度未补满，其中 {exhausted} 人已用完")
 
     def show_customers(self, status=None):
         """显示客户列表"""
@@ -206,6 +594,9 @@ def main():
     parser = argparse.ArgumentParser(description="小红书自动回复系统")
     parser.add_argument("--stats", action="store_true", help="显示统计信息")
     parser.add_argument("--customers", nargs="?", const="all", help="显示客户列表 [all|vip|active|new]")
+    parser.add_argument("--budget", action="store_true", help="显示剩余回复额度")
+    parser.add_argument("--export-customers", nargs="?", const="", metavar="PATH",
+                        help="导出客户数据为 JSON（默认写入 storage.customer_db）")
 
     args = parser.parse_args()
 
@@ -213,8 +604,13 @@ def main():
 
     if args.stats:
         system.show_stats()
+    elif args.budget:
+        system.show_budget()
     elif args.customers:
         system.show_customers(status=args.customers)
+    elif args.export_customers is not None:
+        path = system.tracker.export_json(args.export_customers or None)
+        print(f"✅ 客户数据已导出: {path}")
     else:
         system.run()
 
@@ -0,0 +1,388 @@
+"""
+性能基准脚本
+对比关键路径优化前后的耗时
+"""
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from customer_store import CustomerStore
+from customer_tracker import CustomerTracker, status_for
+
+
+def _timeit(func, repeat=5):
+    """运行多次，返回最短耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _create_customers(store_file, count, notes_per_customer):
+    """写入 count 个客户：约 1% VIP、4% 活跃，其余为已接触"""
+    customers = {}
+    for index in range(count):
+        if index % 100 == 0:
+            interaction_count = 5
+        elif index % 20 == 0:
+            interaction_count = 3
+        else:
+            interaction_count = 1
+        customers[f"user_{index}"] = {
+            "user_name": f"用户{index}",
+            "first_contact": "2024-01-01 12:00:00",
+            "last_contact": "2024-01-02 12:00:00",
+            "interaction_count": interaction_count,
+            "notes": [{
+                "timestamp": 1704081600 + n,
+                "date": "2024-01-01 12:00:00",
+                "note_id": f"note_{n}",
+                "comment": f"这个产品怎么样？价格多少？想了解一下第{n}款",
+                "reply": "感谢关注！具体价格和优惠可以私信我详细了解哦"
+            } for n in range(notes_per_customer)],
+            "status": status_for(interaction_count)
+        }
+    store = CustomerStore(store_file)
+    store.import_customers(customers)
+    store.close()
+
+
+def bench_customer_status(count=100_000):
+    """客户状态查询：全表扫描 vs 状态索引（状态计数 _status_counts 和 status 列索引）"""
+    print("\n" + "=" * 60)
+    print(f"客户状态查询基准（{count} 个客户）")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_file = Path(tmp_dir) / "customers.db"
+        _create_customers(store_file, count, notes_per_customer=0)
+        tracker = CustomerTracker(db_file=Path(tmp_dir) / "customers.json", store_file=store_file)
+
+        # 同一个数据库，NOT INDEXED 强制逐行扫描，只比较有无索引
+        conn = sqlite3.connect(store_file)
+        conn.row_factory = sqlite3.Row
+
+        def scan_by_status(status):
+            rows = conn.execute("SELECT * FROM customers NOT INDEXED WHERE status = ?", (status,))
+            return {row["user_id"]: dict(row) for row in rows}
+
+        def scan_summary():
+            counts = {}
+            for row in conn.execute("SELECT status FROM customers NOT INDEXED"):
+                counts[row["status"]] = counts.get(row["status"], 0) + 1
+            total = sum(counts.values())
+            return total - counts.get("vip", 0) - counts.get("active", 0) - counts.get("new", 0)
+
+        assert scan_by_status("vip").keys() == tracker.get_vip_customers().keys()
+        assert scan_summary() == tracker.export_summary()["contacted_customers"]
+
+        results = [
+            ("export_summary", _timeit(scan_summary), _timeit(tracker.export_summary)),
+            ("--customers vip", _timeit(lambda: scan_by_status("vip")), _timeit(tracker.get_vip_customers)),
+        ]
+
+        print(f"\n  {'操作':20} {'全表扫描':>12} {'状态索引':>12} {'加速':>8}")
+        for name, scan_time, index_time in results:
+            speedup = scan_time / index_time if index_time else float("inf")
+            print(f"  {name:20} {scan_time * 1000:10.2f}ms {index_time * 1000:10.3f}ms {speedup:7.0f}x")
+
+        conn.close()
+        tracker.close()
+
+
+def bench_customer_tiered(count=100_000, notes_per_customer=5):
+    """客户数据：启动时全量加载到内存 vs 两级缓存（内存 LRU + 按需读取数据库）"""
+    print("\n" + "=" * 60)
+    print(f"客户数据基准（{count} 个客户，每人 {notes_per_customer} 条互动记录）")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_file = Path(tmp_dir) / "customers.db"
+        _create_customers(store_file, count, notes_per_customer)
+
+        def full_load():
+            """旧版：启动时把全部客户和互动记录读入内存，并建立状态索引"""
+            store = CustomerStore(store_file)
+            customers = store.load_all()
+            status_index = {}
+            for user_id, customer in customers.items():
+                status_index.setdefault(customer["status"], set()).add(user_id)
+            store.close()
+            return customers, status_index
+
+        def tiered_load():
+            return CustomerTracker(db_file=Path(tmp_dir) / "customers.json", store_file=store_file)
+
+        def measure(func):
+            """耗时（不开 tracemalloc，取两次中较快的一次）和常驻内存分开测量"""
+            elapsed = _timeit(func, repeat=2)
+            tracemalloc.start()
+            result = func()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return result, elapsed, memory
+
+        (customers, status_index), full_time, full_memory = measure(full_load)
+        tracker, tiered_time, tiered_memory = measure(tiered_load)
+
+        print(f"\n  {'启动':20} {'全量加载':>12} {'两级缓存':>12}")
+        print(f"  {'耗时':20} {full_time * 1000:10.0f}ms {tiered_time * 1000:10.1f}ms")
+        print(f"  {'常驻内存':20} {full_memory / 1e6:10.1f}MB {tiered_memory / 1e6:10.3f}MB")
+
+        # 处理评论时按用户读取历史：只用到互动次数，不读互动记录
+        user_ids = [f"user_{index}" for index in range(0, count, max(count // 1000, 1))]
+        assert all(
+            tracker.get_user_history(user_id)["interaction_count"] == customers[user_id]["interaction_count"]
+            for user_id in user_ids
+        )
+        assert tracker.get_user_history(user_ids[0])["notes"] == customers[user_ids[0]]["notes"]
+        assert len(tracker.get_vip_customers()) == len(status_index["vip"])
+        assert tracker.export_summary()["total_customers"] == len(customers)
+
+        results = [
+            ("get_user_history", _timeit(lambda: [customers.get(user_id) for user_id in user_ids]),
+             _timeit(lambda: [tracker.get_user_history(user_id) for user_id in user_ids])),
+            ("export_summary", _timeit(lambda: {s: len(ids) for s, ids in status_index.items()}),
+             _timeit(tracker.export_summary)),
+            ("--customers vip", _timeit(lambda: {u: customers[u] for u in status_index["vip"]}),
+             _timeit(tracker.get_vip_customers)),
+        ]
+        # 两级缓存用少量查询耗时换启动耗时和常驻内存，单次查询会比全量放在内存中慢
+        print(f"\n  {'操作':20} {'全量加载':>12} {'两级缓存':>12}")
+        for name, full, tiered in results:
+            print(f"  {name:20} {full * 1000:10.3f}ms {tiered * 1000:10.3f}ms")
+        print(f"\n  内存缓存客户: {tracker.cached_count()}（上限 {tracker.cache_size}）")
+
+        tracker.close()
+
+
+def _create_system(work_dir):
+    """在临时目录中创建自动回复系统（不发送真实请求）"""
+    from auto_reply import AutoReplySystem
+
+    config_file = Path(work_dir) / "config.json"
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "reply": {"max_reply_per_day": 100_000, "max_reply_per_note": 100_000, "max_reply_per_user": 100_000},
+            "storage": {
+                "customer_db": str(Path(work_dir) / "customers.json"),
+                "dedup_db": str(Path(work_dir) / "processed_comments.db"),
+                "outbox_db": str(Path(work_dir) / "outbox.db"),
+                "reply_budget_db": str(Path(work_dir) / "reply_budget.db"),
+                "reply_log": str(Path(work_dir) / "replies"),
+                "template_stats": str(Path(work_dir) / "template_stats.json")
+            }
+        }, f)
+    return AutoReplySystem(str(config_file))
+
+
+def bench_batch(count=500):
+    """一轮检查发现大量新评论：逐条处理 vs 批量处理"""
+    print("\n" + "=" * 60)
+    print(f"批量回复规划基准（{count} 条新评论）")
+    print("=" * 60)
+
+    samples = ["这个多少钱？", "好喜欢", "怎么买呀", "效果怎么样", "你好", "求链接", "已关注，想了解更多"]
+    results = {"note_hot": [], "note_001": [], "note_002": []}
+    for index in range(count):
+        # 热门笔记占九成；每条评论来自不同用户，批量处理的按用户合并不会减少工作量，两种方式处理同样多的回复
+        note_id = "note_hot" if index % 10 else f"note_00{index % 20 // 10 + 1}"
+        results[note_id].append({
+            "comment_id": f"c{index}",
+            "user_id": f"user_{index}",
+            "user_name": f"用户{index}",
+            "content": samples[index % len(samples)] + str(index % 13)
+        })
+
+    def per_comment(system):
+        system.strategy.begin_cycle()
+        for note_id, comments in results.items():
+            for comment in comments:
+                system._process_comment(note_id, comment)
+
+    def batch(system):
+        system.strategy.begin_cycle()
+        system.process_batch(results)
+
+    timings = {}
+    outputs = {}
+    for name, func in [("逐条处理", per_comment), ("批量处理", batch)]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            system = _create_system(tmp_dir)
+            start = time.perf_counter()
+            func(system)
+            timings[name] = time.perf_counter() - start
+            # 回复文案随机选模板，只比较入队的评论和优先级
+            outputs[name] = sorted(
+                tuple(row) for row in system.outbox._conn.execute(
+                    "SELECT note_id, comment_id, priority FROM outbox WHERE status = 'pending'"
+                )
+            )
+            system.close()
+        print(f"  {name}: {timings[name] * 1000:8.1f}ms | 每条 {timings[name] / count * 1e6:7.0f}µs"
+              f" | 入队 {len(outputs[name])} 条")
+
+    assert outputs["逐条处理"] == outputs["批量处理"], "两种处理方式入队的回复不一致"
+    print(f"\n  加速: {timings['逐条处理'] / timings['批量处理']:.1f}x")
+
+
+def bench_intent(count=2000):
+    """意图模型打分：逐条打分 vs 批量矩阵打分 vs 命中评论ID缓存"""
+    print("\n" + "=" * 60)
+    print(f"基准: 意图模型打分（{count} 条评论）")
+    print("=" * 60)
+
+    import intent_model
+
+    if intent_model.np is None:
+        print("  未安装 numpy，跳过")
+        return
+
+    samples = [
+        ("这个颜色的链接能发我一下吗我想下单", "price"),
+        ("链接在哪里呀想下单买一个回家", "price"),
+        ("用了一个月皮肤状态真的变化很大", "product"),
+        ("敏感肌用了一个月也没有过敏的情况", "product"),
+        ("今天刚看到这篇笔记收藏起来慢慢看", "default"),
+        ("蹲一个后续，博主更新了记得告诉我", "default"),
+    ]
+    model = intent_model.IntentModel(["price", "product", "default"])
+    model.fit([text for text, _ in samples], [label for _, label in samples])
+
+    texts = [f"{samples[index % len(samples)][0]}{index}" for index in range(count)]
+    comment_ids = [f"c{index}" for index in range(count)]
+
+    def per_comment():
+        for text in texts:
+            model.predict_proba([text])
+
+    def batch():
+        model.predict_proba(texts)
+
+    per_comment_time = _timeit(per_comment, repeat=3)
+    batch_time = _timeit(batch, repeat=3)
+    model.predict_many(texts, comment_ids)
+    cached_time = _timeit(lambda: model.predict_many(texts, comment_ids), repeat=3)
+
+    for name, elapsed in [("逐条打分", per_comment_time), ("批量打分", batch_time), ("命中缓存", cached_time)]:
+        print(f"  {name}: {elapsed * 1000:8.1f}ms | 每条 {elapsed / count * 1e6:7.1f}µs")
+    print(f"\n  批量加速: {per_comment_time / batch_time:.1f}x")
+
+
+def bench_ingest(count=30, duration=3.0, poll_interval=1.0):
+    """评论发现延迟：轮询 vs 推送（评论在 duration 秒内随机出现，轮询间隔按比例缩短）"""
+    print("\n" + "=" * 60)
+    print(f"基准: 评论接入延迟（{count} 条评论 / {duration} 秒，轮询间隔 {poll_interval} 秒）")
+    print("=" * 60)
+
+    import random
+    import threading
+
+    import requests
+
+    from ingest import CommentQueue, PushServer, push_comments
+
+    rng = random.Random(7)
+    offsets = sorted(rng.uniform(0, duration) for _ in range(count))
+
+    def make_comment(index, created_at):
+        return {"comment_id": f"c{index}", "user_id": f"u{index}", "content": "多少钱",
+                "create_time": int(created_at * 1000)}
+
+    def consume(comment_queue, expected):
+        received = 0
+        while received < expected:
+            received += sum(len(comments) for comments in comment_queue.get_batch(timeout=duration + poll_interval).values())
+
+    def run_poll():
+        comment_queue = CommentQueue(batch_window=0)
+        start = time.time()
+        created = []
+
+        def produce():
+            for index, offset in enumerate(offsets):
+                time.sleep(max(start + offset - time.time(), 0))
+                created.append(make_comment(index, time.time()))
+
+        def poll():
+            seen = 0
+            while seen < count:
+                time.sleep(poll_interval)
+                new = created[seen:]
+                seen += len(new)
+                comment_queue.put_results({"note": new})
+
+        threads = [threading.Thread(target=produce), threading.Thread(target=poll)]
+        for thread in threads:
+            thread.start()
+        consume(comment_queue, count)
+        for thread in threads:
+            thread.join()
+        return comment_queue.stats()
+
+    def run_push():
+        comment_queue = CommentQueue(batch_window=0)
+        server = PushServer(comment_queue, port=0)
+        server.start()
+        session = requests.Session()
+        start = time.time()
+
+        def produce():
+            for index, offset in enumerate(offsets):
+                time.sleep(max(start + offset - time.time(), 0))
+                push_comments(server.endpoint, "note", [make_comment(index, time.time())], session=session)
+
+        thread = threading.Thread(target=produce)
+        thread.start()
+        consume(comment_queue, count)
+        thread.join()
+        session.close()
+        server.stop()
+        return comment_queue.stats()
+
+    results = {"轮询": run_poll(), "推送": run_push()}
+    for name, stats in results.items():
+        print(f"  {name}: 平均 {stats['avg_latency'] * 1000:7.1f}ms | P50 {stats['p50_latency'] * 1000:7.1f}ms"
+              f" | P90 {stats['p90_latency'] * 1000:7.1f}ms")
+    print(f"\n  平均延迟降低: {results['轮询']['avg_latency'] / max(results['推送']['avg_latency'], 1e-6):.0f}x"
+          f"（实际轮询间隔为 30 秒以上，差距按比例放大）")
+
+
+def run_all_benchmarks():
+    """运行所有基准"""
+    bench_customer_status()
+    bench_customer_tiered()
+    bench_batch()
+    bench_intent()
+    bench_ingest()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        bench_name = sys.argv[1]
+
+        if bench_name == "customers":
+            bench_customer_status(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+        elif bench_name == "tiered":
+            bench_customer_tiered(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+        elif bench_name == "batch":
+            bench_batch(int(sys.argv[2]) if len(sys.argv) > 2 else 500)
+        elif bench_name == "intent":
+            bench_intent(int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
+        elif bench_name == "ingest":
+            bench_ingest()
+        else:
+            print(f"未知基准: {bench_name}")
+            print("可用基准: customers, tiered, batch, intent, ingest")
+    else:
+        run_all_benchmarks()
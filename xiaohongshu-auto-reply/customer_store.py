@@ -0,0 +1,278 @@
+"""
+客户数据存储
+SQLite（WAL 模式）按条写入互动记录，避免每次回复重写整个 JSON 文件
+客户摘要按主键/状态索引按需查询，互动记录只在需要时读取，不必整库加载到内存
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+# 每个客户保留的互动记录条数
+MAX_INTERACTIONS = 50
+
+
+class CustomerStore:
+    def __init__(self, db_file="./data/customers.db"):
+        """
+        :param db_file: SQLite 数据库文件
+        """
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS customers (
+                user_id TEXT PRIMARY KEY,
+                user_name TEXT,
+                first_contact TEXT,
+                last_contact TEXT,
+                interaction_count INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'new',
+                notes_manual TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                timestamp INTEGER,
+                date TEXT,
+                note_id TEXT,
+                comment TEXT,
+                reply TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_interactions_user ON interactions (user_id, id)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_customers_status ON customers (status)"
+        )
+        self._conn.commit()
+
+    def is_empty(self):
+        """数据库中是否还没有客户"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM customers LIMIT 1").fetchone() is None
+
+    def load_all(self):
+        """
+        加载全部客户（结构与旧版 customers.json 相同）
+        :return: {user_id: customer}
+        """
+        with self._lock:
+            customers = {}
+            for row in self._conn.execute("SELECT * FROM customers"):
+                customers[row["user_id"]] = self._row_to_customer(row)
+
+            for row in self._conn.execute(
+                "SELECT user_id, timestamp, date, note_id, comment, reply FROM interactions ORDER BY id"
+            ):
+                customer = customers.get(row["user_id"])
+                if customer is not None:
+                    customer["notes"].append(self._row_to_interaction(row))
+        return customers
+
+    def iter_customers(self, page_size=1000):
+        """
+        按用户ID顺序分页读取全部客户及互动记录（导出用，内存只占一页）
+        :param page_size: 每页客户数
+        :return: 生成 (user_id, customer)
+        """
+        last_user_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM customers WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last_user_id, page_size)
+                ).fetchall()
+                if not rows:
+                    return
+                page = {row["user_id"]: self._row_to_customer(row) for row in rows}
+                for row in self._conn.execute(
+                    "SELECT user_id, timestamp, date, note_id, comment, reply FROM interactions "
+                    "WHERE user_id >= ? AND user_id <= ? ORDER BY id",
+                    (rows[0]["user_id"], rows[-1]["user_id"])
+                ):
+                    customer = page.get(row["user_id"])
+                    if customer is not None:
+                        customer["notes"].append(self._row_to_interaction(row))
+            last_user_id = rows[-1]["user_id"]
+            yield from page.items()
+
+    def load_customer(self, user_id):
+        """
+        读取一个客户的基本信息（不含互动记录）
+        :param user_id: 用户ID
+        :return: 客户数据，不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM customers WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        customer = self._row_to_customer(row)
+        del customer["notes"]
+        return customer
+
+    def load_interactions(self, user_id):
+        """
+        读取一个客户最近的互动记录
+        :param user_id: 用户ID
+        :return: 互动记录列表（按时间先后）
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, date, note_id, comment, reply FROM interactions "
+                "WHERE user_id = ? ORDER BY id",
+                (user_id,)
+            ).fetchall()
+        return [self._row_to_interaction(row) for row in rows]
+
+    def load_by_status(self, status):
+        """
+        按状态读取客户基本信息（走状态索引，不含互动记录）
+        :param status: 客户状态
+        :return: {user_id: customer}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM customers WHERE status = ?", (status,)).fetchall()
+        customers = {}
+        for row in rows:
+            customer = customers[row["user_id"]] = self._row_to_customer(row)
+            del customer["notes"]
+        return customers
+
+    def count_by_status(self):
+        """
+        各状态的客户数量
+        :return: {status: count}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM customers GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def save_customer(self, user_id, customer):
+        """
+        写入客户基本信息（不含互动记录）
+        :param user_id: 用户ID
+        :param customer: 客户数据
+        """
+        with self._lock:
+            self._upsert_customer(user_id, customer)
+            self._conn.commit()
+
+    def save_interaction(self, user_id, customer, interaction):
+        """
+        记录一次互动：更新客户信息并追加一条互动记录，一次事务完成
+        :param user_id: 用户ID
+        :param customer: 更新后的客户数据
+        :param interaction: 互动详情
+        """
+        with self._lock:
+            self._upsert_customer(user_id, customer)
+            self._insert_interaction(user_id, interaction)
+            self._conn.commit()
+
+    def save_interactions(self, records):
+        """
+        批量记录互动，一次事务完成
+        :param records: [(user_id, customer, interaction), ...]
+        """
+        with self._lock:
+            for user_id, customer, interaction in records:
+                self._upsert_customer(user_id, customer)
+                self._insert_interaction(user_id, interaction)
+            self._conn.commit()
+
+    def import_customers(self, customers):
+        """
+        批量导入客户（用于从 customers.json 迁移），一次事务完成
+        :param customers: {user_id: customer}
+        """
+        with self._lock:
+            for user_id, customer in customers.items():
+                self._upsert_customer(user_id, customer)
+                for interaction in customer.get("notes", [])[-MAX_INTERACTIONS:]:
+                    self._conn.execute(
+                        "INSERT INTO interactions (user_id, timestamp, date, note_id, comment, reply) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        self._interaction_values(user_id, interaction)
+                    )
+            self._conn.commit()
+
+    def _upsert_customer(self, user_id, customer):
+        self._conn.execute(
+            "INSERT INTO customers "
+            "(user_id, user_name, first_contact, last_contact, interaction_count, status, notes_manual) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET "
+            "user_name = excluded.user_name, first_contact = excluded.first_contact, "
+            "last_contact = excluded.last_contact, interaction_count = excluded.interaction_count, "
+            "status = excluded.status, notes_manual = excluded.notes_manual",
+            (
+                user_id,
+                customer.get("user_name"),
+                customer.get("first_contact"),
+                customer.get("last_contact"),
+                customer.get("interaction_count", 0),
+                customer.get("status", "new"),
+                json.dumps(customer["notes_manual"], ensure_ascii=False)
+                if "notes_manual" in customer else None
+            )
+        )
+
+    def _insert_interaction(self, user_id, interaction):
+        self._conn.execute(
+            "INSERT INTO interactions (user_id, timestamp, date, note_id, comment, reply) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            self._interaction_values(user_id, interaction)
+        )
+        # 只保留最近的互动记录
+        self._conn.execute(
+            "DELETE FROM interactions WHERE user_id = ? AND id NOT IN "
+            "(SELECT id FROM interactions WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+            (user_id, user_id, MAX_INTERACTIONS)
+        )
+
+    def _interaction_values(self, user_id, interaction):
+        return (
+            user_id,
+            interaction.get("timestamp"),
+            interaction.get("date"),
+            interaction.get("note_id"),
+            interaction.get("comment"),
+            interaction.get("reply")
+        )
+
+    def _row_to_customer(self, row):
+        customer = {
+            "user_name": row["user_name"],
+            "first_contact": row["first_contact"],
+            "last_contact": row["last_contact"],
+            "interaction_count": row["interaction_count"],
+            "notes": [],
+            "status": row["status"]
+        }
+        if row["notes_manual"] is not None:
+            customer["notes_manual"] = json.loads(row["notes_manual"])
+        return customer
+
+    def _row_to_interaction(self, row):
+        return {
+            "timestamp": row["timestamp"],
+            "date": row["date"],
+            "note_id": row["note_id"],
+            "comment": row["comment"],
+            "reply": row["reply"]
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
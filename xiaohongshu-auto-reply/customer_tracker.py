@@ -1,30 +1,185 @@
 """
 客户跟进记录模块
 记录用户互动历史，支持客户分级管理
+内存中只保留最近活跃客户的精简记录（LRU），完整互动记录在 SQLite 中，需要时才读取
 """
 import json
+import os
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 
+from customer_store import CustomerStore
+
+
+# 内存中缓存的客户数量
+DEFAULT_CACHE_SIZE = 10000
+
+
+def status_for(interaction_count):
+    """
+    根据互动次数得出客户状态
+    :param interaction_count: 互动次数
+    :return: 客户状态
+    """
+    if interaction_count >= 5:
+        return "vip"
+    elif interaction_count >= 3:
+        return "active"
+    elif interaction_count >= 1:
+        return "contacted"
+    else:
+        return "new"
+
+
+class CustomerRecord:
+    """内存中的客户记录：只有摘要字段，不含互动记录"""
+    __slots__ = ("user_name", "first_contact", "last_contact", "interaction_count", "status", "notes_manual")
+
+    def __init__(self, user_name=None, first_contact=None, last_contact=None,
+                 interaction_count=0, status="new", notes_manual=None):
+        self.user_name = user_name
+        self.first_contact = first_contact
+        self.last_contact = last_contact
+        self.interaction_count = interaction_count
+        self.status = status
+        self.notes_manual = notes_manual
+
+    @classmethod
+    def from_dict(cls, customer):
+        return cls(
+            customer.get("user_name"),
+            customer.get("first_contact"),
+            customer.get("last_contact"),
+            customer.get("interaction_count", 0),
+            customer.get("status", "new"),
+            customer.get("notes_manual")
+        )
+
+    def to_dict(self):
+        """转换为旧版客户结构（不含 notes）"""
+        customer = {
+            "user_name": self.user_name,
+            "first_contact": self.first_contact,
+            "last_contact": self.last_contact,
+            "interaction_count": self.interaction_count,
+            "status": self.status
+        }
+        if self.notes_manual is not None:
+            customer["notes_manual"] = self.notes_manual
+        return customer
+
+
+class CustomerHistory(dict):
+    """
+    客户信息字典（结构与旧版相同）
+    互动记录 "notes" 在第一次读取时才从数据库加载，只看互动次数、状态时不查互动表
+    """
+    __slots__ = ("_store", "_user_id")
+
+    def __init__(self, customer, store, user_id):
+        super().__init__(customer)
+        self._store = store
+        self._user_id = user_id
+
+    def __missing__(self, key):
+        if key != "notes":
+            raise KeyError(key)
+        notes = self["notes"] = self._store.load_interactions(self._user_id)
+        return notes
+
+    def get(self, key, default=None):
+        if key == "notes":
+            return self["notes"]
+        return super().get(key, default)
+
 
 class CustomerTracker:
-    def __init__(self, db_file="./data/customers.json"):
+    def __init__(self, db_file="./data/customers.json", store_file=None, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param db_file: JSON 导出文件（兼容旧版，首次启动时从这里迁移）
+        :param store_file: SQLite 数据库文件，默认与 db_file 同名、后缀为 .db
+        :param cache_size: 内存中缓存的客户数量
+        """
         self.db_file = Path(db_file)
         self.db_file.parent.mkdir(parents=True, exist_ok=True)
-        self.customers = self._load_database()
+        self.store = CustomerStore(store_file or self.db_file.with_suffix(".db"))
+        self.cache_size = cache_size
+        self._migrate_json()
+
+        # 启动时只读取各状态的客户数，客户记录在用到时才加载
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._status_counts = self.store.count_by_status()
 
-    def _load_database(self):
-        """加载客户数据库"""
-        if not self.db_file.exists():
-            return {}
+    def _migrate_json(self):
+        """一次性把旧版 customers.json 导入 SQLite"""
+        if not self.db_file.exists() or not self.store.is_empty():
+            return
         with open(self.db_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            customers = json.load(f)
+        if customers:
+            self.store.import_customers(customers)
+            print(f"📦 已从 {self.db_file} 迁移 {len(customers)} 个客户")
+
+    def _get_record(self, user_id):
+        """
+        读取客户记录：先查内存缓存，未命中时从数据库加载并放入缓存
+        :param user_id: 用户ID
+        :return: CustomerRecord，客户不存在时返回 None
+        """
+        with self._lock:
+            record = self._cache.get(user_id)
+            if record is not None:
+                self._cache.move_to_end(user_id)
+                return record
 
-    def _save_database(self):
-        """保存客户数据库"""
-        with open(self.db_file, 'w', encoding='utf-8') as f:
-            json.dump(self.customers, f, ensure_ascii=False, indent=2)
+        customer = self.store.load_customer(user_id)
+        if customer is None:
+            return None
+        record = CustomerRecord.from_dict(customer)
+        self._remember(user_id, record)
+        return record
+
+    def _remember(self, user_id, record):
+        """放入缓存，超出容量时淘汰最久未用的客户（数据已在数据库中，直接丢弃）"""
+        with self._lock:
+            self._cache[user_id] = record
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _history(self, user_id, record):
+        return CustomerHistory(record.to_dict(), self.store, user_id)
+
+    def cached_count(self):
+        """内存中缓存的客户数"""
+        with self._lock:
+            return len(self._cache)
+
+    def export_json(self, path=None):
+        """
+        导出为旧版 customers.json 格式（先写临时文件再替换，避免写一半损坏）
+        从数据库分页读取、逐个客户写入，不把全部客户加载到内存
+        :param path: 导出路径，默认为 db_file
+        :return: 导出文件路径
+        """
+        path = Path(path) if path else self.db_file
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("{")
+            for index, (user_id, customer) in enumerate(self.store.iter_customers()):
+                f.write(",\n  " if index else "\n  ")
+                f.write(f"{json.dumps(user_id, ensure_ascii=False)}: {json.dumps(customer, ensure_ascii=False)}")
+            f.write("\n}\n")
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        """关闭数据库"""
+        self.store.close()
 
     def record_interaction(self, user_id, user_name, note_id, comment_text, reply_text):
         """
@@ -35,24 +190,55 @@ class CustomerTracker:
         :param comment_text: 评论内容
         :param reply_text: 回复内容
         """
+        record, interaction = self._apply_interaction(user_id, user_name, note_id, comment_text, reply_text)
+
+        # 只写入本次变化：客户信息 + 一条互动记录
+        self.store.save_interaction(user_id, record.to_dict(), interaction)
+        return self._history(user_id, record)
+
+    def record_interactions(self, interactions):
+        """
+        批量记录互动，所有变化在一次事务中写入
+        :param interactions: [{"user_id", "user_name", "note_id", "comment", "reply"}, ...]
+        :return: 记录条数
+        """
+        records = []
+        # 本批修改过的客户：写入数据库前即使被挤出缓存，同一用户的后续互动也在同一条记录上累加
+        touched = {}
+        for item in interactions:
+            user_id = item.get("user_id")
+            record, interaction = self._apply_interaction(
+                user_id, item.get("user_name"), item.get("note_id"), item.get("comment"), item.get("reply"),
+                touched
+            )
+            touched[user_id] = record
+            records.append((user_id, record.to_dict(), interaction))
+
+        if records:
+            self.store.save_interactions(records)
+        return len(records)
+
+    def _apply_interaction(self, user_id, user_name, note_id, comment_text, reply_text, touched=None):
+        """
+        更新内存中的客户记录，生成互动详情（互动详情只写入数据库，不留在内存）
+        :param touched: 本批已修改的客户记录 {user_id: CustomerRecord}
+        :return: (客户记录, 互动详情)
+        """
         timestamp = int(time.time())
         date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        if user_id not in self.customers:
-            self.customers[user_id] = {
-                "user_name": user_name,
-                "first_contact": date_str,
-                "last_contact": date_str,
-                "interaction_count": 0,
-                "notes": [],
-                "status": "new"
-            }
+        record = touched.get(user_id) if touched else None
+        if record is None:
+            record = self._get_record(user_id)
+        if record is None:
+            record = CustomerRecord(user_name, date_str, date_str)
+            self._status_counts["new"] = self._status_counts.get("new", 0) + 1
 
         # 更新用户信息
-        customer = self.customers[user_id]
-        customer["last_contact"] = date_str
-        customer["interaction_count"] += 1
-        customer["status"] = self._update_status(customer["interaction_count"])
+        record.last_contact = date_str
+        record.interaction_count += 1
+        self._set_status(record, self._update_status(record.interaction_count))
+        self._remember(user_id, record)
 
         # 记录互动详情
         interaction = {
@@ -62,22 +248,25 @@ class CustomerTracker:
             "comment": comment_text,
             "reply": reply_text
         }
-        customer["notes"].append(interaction)
+        return record, interaction
 
-        # 只保留最近50条记录
-        if len(customer["notes"]) > 50:
-            customer["notes"] = customer["notes"][-50:]
-
-        self._save_database()
-        return customer
+    def _set_status(self, record, status):
+        """修改客户状态，同时维护各状态的客户数"""
+        if record.status == status:
+            return
+        self._status_counts[record.status] = self._status_counts.get(record.status, 0) - 1
+        self._status_counts[status] = self._status_counts.get(status, 0) + 1
+        record.status = status
 
     def get_user_history(self, user_id):
         """
         获取用户互动历史
+        互动次数、状态等来自内存缓存；互动记录 notes 在第一次访问时才从数据库读取
         :param user_id: 用户ID
-        :return: 用户历史记录
+        :return: 用户历史记录，客户不存在时返回 None
         """
-        return self.customers.get(user_id, None)
+        record = self._get_record(user_id)
+        return self._history(user_id, record) if record is not None else None
 
     def _update_status(self, interaction_count):
         """
@@ -85,14 +274,7 @@ class CustomerTracker:
         :param interaction_count: 互动次数
         :return: 客户状态
         """
-        if interaction_count >= 5:
-            return "vip"
-        elif interaction_count >= 3:
-            return "active"
-        elif interaction_count >= 1:
-            return "contacted"
-        else:
-            return "new"
+        return status_for(interaction_count)
 
     def get_customers_by_status(self, status):
         """
@@ -100,11 +282,18 @@ class CustomerTracker:
         :param status: 客户状态
         :return: 客户列表
         """
-        result = {}
-        for user_id, customer in self.customers.items():
-            if customer.get("status") == status:
-                result[user_id] = customer
-        return result
+        return {
+            user_id: CustomerHistory(customer, self.store, user_id)
+            for user_id, customer in self.store.load_by_status(status).items()
+        }
+
+    def count_by_status(self, status):
+        """
+        按状态统计客户数量
+        :param status: 客户状态
+        :return: 客户数量
+        """
+        return self._status_counts.get(status, 0)
 
     def get_vip_customers(self):
         """获取VIP客户"""
@@ -119,8 +308,8 @@ class CustomerTracker:
         return self.get_customers_by_status("new")
 
     def get_all_customers(self):
-        """获取所有客户"""
-        return self.customers
+        """获取所有客户（含互动记录，从数据库完整读取）"""
+        return self.store.load_all()
 
     def add_note(self, user_id, note):
         """
@@ -128,26 +317,27 @@ class CustomerTracker:
         :param user_id: 用户ID
         :param note: 备注内容
         """
-        if user_id in self.customers:
-            if "notes_manual" not in self.customers[user_id]:
-                self.customers[user_id]["notes_manual"] = []
+        record = self._get_record(user_id)
+        if record is not None:
+            if record.notes_manual is None:
+                record.notes_manual = []
 
             date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.customers[user_id]["notes_manual"].append({
+            record.notes_manual.append({
                 "date": date_str,
                 "note": note
             })
-            self._save_database()
+            self.store.save_customer(user_id, record.to_dict())
 
     def export_summary(self):
         """
         导出客户统计摘要
         :return: 统计摘要
         """
-        total = len(self.customers)
-        vip = len(self.get_vip_customers())
-        active = len(self.get_active_customers())
-        new = len(self.get_new_customers())
+        total = sum(self._status_counts.values())
+        vip = self.count_by_status("vip")
+        active = self.count_by_status("active")
+        new = self.count_by_status("new")
 
         return {
             "total_customers": total,
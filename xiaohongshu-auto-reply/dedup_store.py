@@ -0,0 +1,191 @@
+"""
+已处理评论去重存储
+SQLite 持久化 + 内存索引，重启后不会重复处理旧评论
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class DedupStore:
+    def __init__(self, db_file="./data/processed_comments.db", max_per_note=5000, ttl_days=30):
+        """
+        :param db_file: SQLite 数据库文件
+        :param max_per_note: 每个笔记最多保留的评论ID数量（0 表示不限）
+        :param ttl_days: 评论ID保留天数（0 表示不过期）
+        """
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.max_per_note = max_per_note
+        self.ttl_seconds = ttl_days * 86400
+
+        # comment_id -> note_id，用于 O(1) 判重
+        self._index = {}
+        # note_id -> OrderedDict(comment_id -> seen_at)，按写入顺序淘汰
+        self._by_note = {}
+        # note_id -> 已见评论的最大 create_time（高水位线）
+        self._watermarks = {}
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_comments (
+                comment_id TEXT PRIMARY KEY,
+                note_id TEXT NOT NULL,
+                seen_at INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_processed_note ON processed_comments (note_id, seen_at)"
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_watermarks (
+                note_id TEXT PRIMARY KEY,
+                last_create_time INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._warm_load()
+
+    def _warm_load(self):
+        """启动时一次性加载索引，并清理过期记录"""
+        if self.ttl_seconds:
+            cutoff = int(time.time()) - self.ttl_seconds
+            self._conn.execute("DELETE FROM processed_comments WHERE seen_at < ?", (cutoff,))
+            self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT comment_id, note_id, seen_at FROM processed_comments ORDER BY seen_at"
+        )
+        for comment_id, note_id, seen_at in rows:
+            self._index[comment_id] = note_id
+            self._by_note.setdefault(note_id, OrderedDict())[comment_id] = seen_at
+
+        for note_id, last_create_time in self._conn.execute(
+            "SELECT note_id, last_create_time FROM note_watermarks"
+        ):
+            self._watermarks[note_id] = last_create_time
+
+        evicted = []
+        for note_id in list(self._by_note):
+            evicted.extend(self._trim_note(note_id))
+        self._delete(evicted)
+
+    def __contains__(self, comment_id):
+        return comment_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, note_id, comment_id):
+        """
+        记录单条已处理评论
+        :param note_id: 笔记ID
+        :param comment_id: 评论ID
+        """
+        self.add_many(note_id, [comment_id])
+
+    def get_watermark(self, note_id):
+        """
+        获取笔记的高水位线
+        :param note_id: 笔记ID
+        :return: 已见评论的最大 create_time，没有记录时为 0
+        """
+        return self._watermarks.get(note_id, 0)
+
+    def add_many(self, note_id, comment_ids, watermark=None):
+        """
+        批量记录已处理评论，一次事务写入
+        :param note_id: 笔记ID
+        :param comment_ids: 评论ID列表
+        :param watermark: 新的高水位线（只会前移）
+        :return: 本次新记录的评论ID（之前未处理过的）
+        """
+        now = int(time.time())
+        with self._lock:
+            watermark_moved = bool(watermark) and watermark > self._watermarks.get(note_id, 0)
+            if watermark_moved:
+                self._watermarks[note_id] = watermark
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO note_watermarks (note_id, last_create_time, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (note_id, watermark, now)
+                )
+
+            rows = []
+            seen = self._by_note.setdefault(note_id, OrderedDict())
+            for comment_id in comment_ids:
+                if comment_id is None or comment_id in self._index:
+                    continue
+                self._index[comment_id] = note_id
+                seen[comment_id] = now
+                rows.append((comment_id, note_id, now))
+
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO processed_comments (comment_id, note_id, seen_at) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._delete(self._trim_note(note_id), commit=False)
+
+            if rows or watermark_moved:
+                self._conn.commit()
+        return [row[0] for row in rows]
+
+    def evict_expired(self):
+        """
+        淘汰超过保留天数的评论ID
+        :return: 淘汰数量
+        """
+        if not self.ttl_seconds:
+            return 0
+
+        cutoff = int(time.time()) - self.ttl_seconds
+        with self._lock:
+            evicted = []
+            for note_id, seen in list(self._by_note.items()):
+                while seen:
+                    comment_id, seen_at = next(iter(seen.items()))
+                    if seen_at >= cutoff:
+                        break
+                    seen.popitem(last=False)
+                    self._index.pop(comment_id, None)
+                    evicted.append(comment_id)
+                if not seen:
+                    del self._by_note[note_id]
+            self._delete(evicted)
+        return len(evicted)
+
+    def _trim_note(self, note_id):
+        """按数量上限淘汰笔记最早的评论ID，返回被淘汰的ID"""
+        seen = self._by_note.get(note_id)
+        if not self.max_per_note or not seen:
+            return []
+
+        evicted = []
+        while len(seen) > self.max_per_note:
+            comment_id, _ = seen.popitem(last=False)
+            self._index.pop(comment_id, None)
+            evicted.append(comment_id)
+        return evicted
+
+    def _delete(self, comment_ids, commit=True):
+        """从数据库删除淘汰的评论ID"""
+        if not comment_ids:
+            return
+        self._conn.executemany(
+            "DELETE FROM processed_comments WHERE comment_id = ?",
+            [(comment_id,) for comment_id in comment_ids]
+        )
+        if commit:
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,379 @@
+"""
+评论接入模块
+轮询和推送两种来源统一写入评论队列，由单个消费者按批取出交给自动回复系统处理
+推送来源是本地 HTTP 接口：浏览器插件或爬虫发现新评论后 POST 过来，回复延迟降到秒级，不需要加快轮询
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from monitor import format_comment
+
+
+# 队列层去重记住的评论ID数量（轮询和推送同时发现同一条评论时只处理一次）
+MAX_RECENT_IDS = 50000
+
+# 延迟统计保留的样本数
+MAX_LATENCY_SAMPLES = 1000
+
+# 推送请求体大小上限（字节）
+MAX_PUSH_BYTES = 1024 * 1024
+
+# 轮询结果等待队列腾出空间时的检查间隔（秒）
+PUT_WAIT_INTERVAL = 0.05
+
+
+def normalize_comment(comment):
+    """
+    推送的评论转换为回调使用的评论结构
+    已经是回调结构（带 comment_id）的原样保留，接口原始结构（带 id）按轮询时的格式转换
+    :param comment: 评论字典
+    :return: 评论字典
+    """
+    if "comment_id" in comment:
+        return dict(comment)
+    return format_comment(comment, comment.get("parent_comment_id"))
+
+
+class CommentQueue:
+    def __init__(self, max_size=10000, batch_window=0.2, max_batch=500, clock=time.time):
+        """
+        :param max_size: 队列容量，满时拒绝新的推送
+        :param batch_window: 收到第一条评论后再等待多久合并成一批（秒）
+        :param max_batch: 每批最多评论数
+        :param clock: 时钟函数
+        """
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.clock = clock
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._recent_ids = OrderedDict()
+        self._received = {}
+        self._dropped = 0
+        self._latencies = deque(maxlen=MAX_LATENCY_SAMPLES)
+
+    def put(self, note_id, comments, source="push"):
+        """
+        写入一个笔记的新评论（跳过最近已入队的评论）
+        :param note_id: 笔记ID
+        :param comments: 评论列表
+        :param source: 来源（poll / push）
+        :return: 实际入队数量；放不下整批时抛出 queue.Full
+        """
+        return self.put_many([(note_id, comments)], source=source)
+
+    def put_many(self, batches, source="push", admit=None):
+        """
+        写入多个笔记的新评论（跳过最近已入队的评论）
+        写入方都持有同一把锁，容量检查和入队之间队列只会变短，所有批次要么全部入队要么全部拒绝
+        :param batches: [(笔记ID, 评论列表)]
+        :param source: 来源（poll / push）
+        :param admit: 确认容量后、入队前以 (笔记ID, 评论列表) 调用，返回要入队的评论（用于写去重库）
+        :return: 实际入队数量；放不下全部批次时抛出 queue.Full，此时不会调用 admit
+        """
+        accepted = 0
+        now = self.clock()
+        with self._lock:
+            total = sum(len(comments) for _, comments in batches)
+            if not self.has_room(total):
+                self._dropped += total
+                raise queue.Full
+            for note_id, comments in batches:
+                if admit is not None:
+                    comments = admit(note_id, comments)
+                accepted += self._enqueue(note_id, comments, now)
+            self._received[source] = self._received.get(source, 0) + accepted
+        return accepted
+
+    def _enqueue(self, note_id, comments, now):
+        """入队（调用方持有锁且已确认容量），返回实际入队数量"""
+        accepted = 0
+        for comment in comments:
+            comment_id = comment.get("comment_id")
+            if comment_id is not None:
+                if comment_id in self._recent_ids:
+                    continue
+                self._recent_ids[comment_id] = None
+                if len(self._recent_ids) > MAX_RECENT_IDS:
+                    self._recent_ids.popitem(last=False)
+            self._queue.put_nowait((note_id, comment, now))
+            accepted += 1
+        return accepted
+
+    def _room(self):
+        """队列剩余容量，不限容量时为 None"""
+        if not self._queue.maxsize:
+            return None
+        return max(self._queue.maxsize - self._queue.qsize(), 0)
+
+    def has_room(self, count):
+        """队列是否还能放下 count 条评论"""
+        room = self._room()
+        return room is None or room >= count
+
+    def put_results(self, results):
+        """
+        写入一轮轮询结果（作为 XHSMonitor 的 batch_callback）
+        轮询返回前评论已写入去重库，丢弃就不会再被处理，所以队列满时分段写入并等待消费者腾出空间，轮询线程随之暂停
+        :param results: {note_id: 新评论列表}
+        :return: 是否全部入队；队列关闭后不再等待，未入队的评论计入丢弃数
+        """
+        pending = [(note_id, list(comments)) for note_id, comments in results.items() if comments]
+        while pending:
+            note_id, comments = pending[0]
+            with self._lock:
+                room = self._room()
+                if room is None or room > 0:
+                    chunk = comments if room is None else comments[:room]
+                    accepted = self._enqueue(note_id, chunk, self.clock())
+                    self._received["poll"] = self._received.get("poll", 0) + accepted
+                    pending[0] = (note_id, comments[len(chunk):])
+                    if not pending[0][1]:
+                        pending.pop(0)
+                    continue
+            if self._closed.wait(PUT_WAIT_INTERVAL):
+                with self._lock:
+                    self._dropped += sum(len(comments) for _, comments in pending)
+                print(f"⚠️ 评论队列已关闭，{len(pending)} 个笔记的轮询结果未入队")
+                return False
+        return True
+
+    def close(self):
+        """停止等待：唤醒阻塞在 put_results 中的轮询线程（消费者停止后调用）"""
+        self._closed.set()
+
+    def get_batch(self, timeout=1.0):
+        """
+        取出一批评论：等待第一条最多 timeout 秒，之后在 batch_window 内继续合并
+        :param timeout: 等待第一条评论的秒数
+        :return: {note_id: 评论列表}，没有评论时为空字典
+        """
+        try:
+            entries = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return {}
+
+        deadline = time.monotonic() + self.batch_window
+        while len(entries) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entries.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        now = self.clock()
+        results = {}
+        with self._lock:
+            for note_id, comment, _ in entries:
+                results.setdefault(note_id, []).append(comment)
+                create_time = comment.get("create_time")
+                if create_time:
+                    # 小红书接口返回毫秒时间戳
+                    if create_time > 1e12:
+                        create_time = create_time / 1000
+                    self._latencies.append(max(now - create_time, 0))
+        return results
+
+    def consume(self, batch_callback, before_batch=None, stop_event=None, timeout=1.0):
+        """
+        循环取出评论批次并处理，直到 stop_event 被设置
+        :param batch_callback: 以 {note_id: 评论列表} 调用
+        :param before_batch: 每批处理前调用（用于重置按周期缓存的数据）
+        :param stop_event: threading.Event
+        :param timeout: 每次等待评论的秒数（也是检查停止信号的间隔）
+        """
+        while not (stop_event and stop_event.is_set()):
+            results = self.get_batch(timeout)
+            if not results:
+                continue
+            try:
+                if before_batch:
+                    before_batch()
+                batch_callback(results)
+            except Exception as e:
+                print(f"处理评论批次异常: {e}")
+
+    def pending(self):
+        """队列中待处理的评论数"""
+        return self._queue.qsize()
+
+    def stats(self):
+        """
+        接入统计
+        :return: 各来源评论数、丢弃数、从评论发布到被取出处理的延迟
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            received = dict(self._received)
+            dropped = self._dropped
+
+        def percentile(ratio):
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * ratio), len(latencies) - 1)], 3)
+
+        return {
+            "received": received,
+            "dropped": dropped,
+            "pending": self.pending(),
+            "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50_latency": percentile(0.5),
+            "p90_latency": percentile(0.9)
+        }
+
+
+class PushServer:
+    def __init__(self, comment_queue, dedup=None, host="127.0.0.1", port=8765, token=""):
+        """
+        本地推送接口
+        POST /comments  {"note_id": "...", "comments": [...]}（也可以是这种对象的列表）
+        GET  /stats     接入统计
+        :param comment_queue: CommentQueue
+        :param dedup: DedupStore，推送的评论写入去重库，之后轮询不会重复处理
+        :param host: 监听地址，默认只接受本机请求
+        :param port: 监听端口，0 表示随机端口
+        :param token: 非空时要求请求头 X-Ingest-Token 一致
+        """
+        self.comment_queue = comment_queue
+        self.dedup = dedup
+        self.token = token
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """实际监听的 (地址, 端口)"""
+        return self._server.server_address[:2]
+
+    @property
+    def endpoint(self):
+        """推送地址"""
+        host, port = self.address
+        return f"http://{host}:{port}/comments"
+
+    def _handler_class(self):
+        push_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/comments":
+                    return self._reply(404, {"error": "not found"})
+                if push_server.token and self.headers.get("X-Ingest-Token") != push_server.token:
+                    return self._reply(403, {"error": "invalid token"})
+
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    if length < 0:
+                        raise ValueError("negative Content-Length")
+                    if length > MAX_PUSH_BYTES:
+                        return self._reply(413, {"error": "payload too large"})
+                    payload = json.loads(self.rfile.read(length) or b"null")
+                    batches = payload if isinstance(payload, list) else [payload]
+                    accepted = push_server.accept([(batch["note_id"], batch["comments"]) for batch in batches])
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    return self._reply(400, {"error": "invalid payload"})
+                except queue.Full:
+                    return self._reply(503, {"error": "queue full"})
+                self._reply(200, {"accepted": accepted})
+
+            def do_GET(self):
+                if self.path != "/stats":
+                    return self._reply(404, {"error": "not found"})
+                self._reply(200, push_server.comment_queue.stats())
+
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def accept(self, batches):
+        """
+        接收一次推送的评论：先转换全部批次的格式，再一次检查容量、去重后入队，不会只入队其中一部分
+        :param batches: [(笔记ID, 评论列表)]
+        :return: 入队数量
+        """
+        batches = [(note_id, [normalize_comment(comment) for comment in comments]) for note_id, comments in batches]
+        admit = None
+        if self.dedup is not None:
+            # 由队列在确认容量后调用，避免评论被记为已处理却没能入队
+            def admit(note_id, batch):
+                # 推送的评论可能乱序，不移动高水位线，避免轮询跳过尚未推送的旧评论
+                new_ids = set(self.dedup.add_many(note_id, [c.get("comment_id") for c in batch]))
+                return [c for c in batch if c.get("comment_id") in new_ids]
+        return self.comment_queue.put_many(batches, source="push", admit=admit)
+
+    def start(self):
+        """在后台线程中开始监听"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="xhs-push-server", daemon=True)
+        self._thread.start()
+        print(f"📥 推送接口已启动: {self.endpoint}")
+
+    def stop(self):
+        """停止监听"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+def push_comments(endpoint, note_id, comments, token="", timeout=5, session=None):
+    """
+    推送评论到本地接口（供爬虫、浏览器插件桥接脚本和测试使用）
+    :param endpoint: 推送地址，如 http://127.0.0.1:8765/comments
+    :param note_id: 笔记ID
+    :param comments: 评论列表（回调结构或接口原始结构）
+    :param token: 接口令牌
+    :param timeout: 超时秒数
+    :param session: 复用连接的 requests.Session
+    :return: 入队数量
+    """
+    headers = {"X-Ingest-Token": token} if token else {}
+    response = (session or requests).post(
+        endpoint, json={"note_id": note_id, "comments": comments}, headers=headers, timeout=timeout
+    )
+    response.raise_for_status()
+    return response.json()["accepted"]
+
+
+def main():
+    """命令行推送一条评论（手动测试推送接口）"""
+    parser = argparse.ArgumentParser(description="推送评论到本地接入接口")
+    parser.add_argument("--endpoint", default="http://127.0.0.1:8765/comments", help="推送地址")
+    parser.add_argument("--token", default="", help="接口令牌")
+    parser.add_argument("--note", required=True, help="笔记ID")
+    parser.add_argument("--comment-id", required=True, help="评论ID")
+    parser.add_argument("--user", default="manual", help="用户ID")
+    parser.add_argument("--content", required=True, help="评论内容")
+    args = parser.parse_args()
+
+    accepted = push_comments(args.endpoint, args.note, [{
+        "comment_id": args.comment_id,
+        "user_id": args.user,
+        "user_name": args.user,
+        "content": args.content,
+        "create_time": int(time.time() * 1000)
+    }], token=args.token)
+    print(f"✅ 已推送，入队 {accepted} 条")
+
+
+if __name__ == "__main__":
+    main()
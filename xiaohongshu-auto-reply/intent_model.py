@@ -0,0 +1,308 @@
+"""
+评论意图打分模型
+字符 n-gram 哈希特征 + 线性 softmax 分类器，纯 NumPy 实现，只用 CPU
+批量打分时整批评论一次完成 n-gram 哈希、取权重和按评论汇总，得到所有评论的类别分数
+"""
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+DEFAULT_MODEL_FILE = Path(__file__).parent / "templates" / "intent_model.npz"
+
+# 特征哈希空间大小（最后一行额外作为偏置特征）
+NUM_FEATURES = 1 << 14
+NGRAM_RANGE = (1, 3)
+
+# 按评论ID缓存的打分结果上限
+MAX_SCORE_CACHE = 50000
+
+
+# n-gram 哈希用的乘数（64 位无符号整数运算，溢出回绕）
+_HASH_BASE = 1000003
+_HASH_MIX = 0x9E3779B97F4A7C15
+
+
+def hash_ngrams(texts, num_features=NUM_FEATURES, ngram_range=NGRAM_RANGE):
+    """
+    整批文本的字符 n-gram 哈希特征（拼成一个码点数组后向量化计算，不逐个 n-gram 循环）
+    每条文本末尾固定带一个偏置特征（ID 为 num_features），特征值按特征数归一化
+    :param texts: 文本列表
+    :return: (每个特征所属的文本序号, 特征ID, 特征值)
+    """
+    lowered = [text.lower() for text in texts]
+    lengths = np.array([len(text) for text in lowered], dtype=np.int64)
+    codes = np.frombuffer("".join(lowered).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    text_rows = np.repeat(np.arange(len(texts)), lengths)
+    text_ends = np.repeat(np.cumsum(lengths), lengths)
+    positions = np.arange(len(codes))
+
+    rows = []
+    ids = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        # 只保留不跨越文本边界的 n-gram
+        valid = positions[positions + n <= text_ends]
+        hashes = np.full(len(valid), n, dtype=np.uint64)
+        for k in range(n):
+            hashes = hashes * np.uint64(_HASH_BASE) + codes[valid + k]
+        hashes = (hashes * np.uint64(_HASH_MIX)) >> np.uint64(32)
+        rows.append(text_rows[valid])
+        ids.append((hashes % np.uint64(num_features)).astype(np.int64))
+
+    rows.append(np.arange(len(texts)))
+    ids.append(np.full(len(texts), num_features, dtype=np.int64))
+    rows = np.concatenate(rows)
+    ids = np.concatenate(ids)
+    counts = np.bincount(rows, minlength=len(texts))
+    return rows, ids, (1.0 / counts[rows]).astype(np.float32)
+
+
+class IntentModel:
+    def __init__(self, labels, weights=None, num_features=NUM_FEATURES, ngram_range=NGRAM_RANGE):
+        """
+        :param labels: 类别列表
+        :param weights: 权重矩阵 (num_features + 1, 类别数)，默认全零
+        :param num_features: 特征哈希空间大小
+        :param ngram_range: n-gram 长度范围
+        """
+        if np is None:
+            raise ImportError("意图模型需要 numpy：pip install numpy")
+
+        self.labels = list(labels)
+        self.num_features = num_features
+        self.ngram_range = tuple(ngram_range)
+        self.weights = (
+            weights.astype(np.float32) if weights is not None
+            else np.zeros((num_features + 1, len(self.labels)), dtype=np.float32)
+        )
+        # 评论ID -> (类别, 置信度)，多账号共用一个模型，缓存读写加锁
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_FILE):
+        """从 .npz 文件加载模型"""
+        if np is None:
+            raise ImportError("意图模型需要 numpy：pip install numpy")
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                labels=[str(label) for label in data["labels"]],
+                weights=data["weights"],
+                num_features=int(data["num_features"]),
+                ngram_range=tuple(int(n) for n in data["ngram_range"])
+            )
+
+    def save(self, path=DEFAULT_MODEL_FILE):
+        """保存为 .npz 文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            weights=self.weights,
+            num_features=np.array(self.num_features),
+            ngram_range=np.array(self.ngram_range)
+        )
+        return path
+
+    def _logits(self, rows, ids, values, count):
+        """按文本汇总特征权重，得到 (文本数, 类别数) 的分数矩阵"""
+        weighted = self.weights[ids] * values[:, None]
+        return np.stack([
+            np.bincount(rows, weights=weighted[:, column], minlength=count)
+            for column in range(len(self.labels))
+        ], axis=1)
+
+    def predict_proba(self, texts):
+        """
+        批量计算类别概率
+        :param texts: 文本列表
+        :return: 概率矩阵 (文本数, 类别数)
+        """
+        if not texts:
+            return np.zeros((0, len(self.labels)))
+        rows, ids, values = hash_ngrams(texts, self.num_features, self.ngram_range)
+        return _softmax(self._logits(rows, ids, values, len(texts)))
+
+    def predict_many(self, texts, comment_ids=None):
+        """
+        批量预测类别，有评论ID的结果会被缓存
+        :param texts: 文本列表
+        :param comment_ids: 与 texts 对应的评论ID列表（可选）
+        :return: [(类别, 置信度)]
+        """
+        comment_ids = comment_ids or [None] * len(texts)
+        results = [None] * len(texts)
+        pending = []
+        with self._lock:
+            for index, comment_id in enumerate(comment_ids):
+                cached = self._cache.get(comment_id) if comment_id is not None else None
+                if cached is not None:
+                    results[index] = cached
+                else:
+                    pending.append(index)
+
+        if pending:
+            probs = self.predict_proba([texts[index] for index in pending])
+            best = probs.argmax(axis=1)
+            with self._lock:
+                for row, index in enumerate(pending):
+                    result = (self.labels[best[row]], float(probs[row, best[row]]))
+                    results[index] = result
+                    if comment_ids[index] is not None:
+                        self._cache[comment_ids[index]] = result
+
+                while len(self._cache) > MAX_SCORE_CACHE:
+                    self._cache.popitem(last=False)
+        return results
+
+    def cached_count(self):
+        """已缓存打分结果的评论数"""
+        with self._lock:
+            return len(self._cache)
+
+    def fit(self, texts, labels, epochs=200, learning_rate=5.0, l2=1e-5):
+        """
+        用梯度下降训练 softmax 回归
+        :param texts: 训练文本
+        :param labels: 对应类别
+        :param epochs: 迭代轮数
+        :param learning_rate: 学习率
+        :param l2: L2 正则系数
+        :return: 训练集准确率
+        """
+        label_index = {label: index for index, label in enumerate(self.labels)}
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+        rows, ids, values = hash_ngrams(texts, self.num_features, self.ngram_range)
+        onehot = np.eye(len(self.labels))[targets]
+
+        for _ in range(epochs):
+            probs = _softmax(self._logits(rows, ids, values, len(texts)))
+            error = (probs - onehot) / len(texts)
+            gradient = np.zeros_like(self.weights)
+            np.add.at(gradient, ids, (error[rows] * values[:, None]).astype(np.float32))
+            self.weights -= learning_rate * (gradient + l2 * self.weights)
+
+        with self._lock:
+            self._cache.clear()
+        predicted = self.predict_proba(texts).argmax(axis=1)
+        return float((predicted == targets).mean())
+
+
+def _softmax(logits):
+    """按行 softmax"""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def load_intent_model(path=DEFAULT_MODEL_FILE):
+    """
+    加载意图模型，缺少 numpy 或模型文件时返回 None（回退到纯关键词分类）
+    :param path: 模型文件
+    :return: IntentModel 或 None
+    """
+    if np is None:
+        print("⚠️ 未安装 numpy，意图模型未启用，使用关键词分类")
+        return None
+    if not Path(path).exists():
+        print(f"⚠️ 意图模型文件不存在: {path}，使用关键词分类（需用人工标注的样本训练，见 README「意图模型」）")
+        return None
+    model = IntentModel.load(path)
+    print(f"🧠 已加载意图模型: {path} | 类别 {model.labels}")
+    return model
+
+
+def _iter_log_records(log_dir):
+    """逐条读取回复日志"""
+    for path in sorted(Path(log_dir).glob("replies-*.jsonl")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_samples(log_dir=None, samples_file=None):
+    """
+    读取训练样本（只使用人工标注的类别）
+    回复日志中的 category 来自关键词规则，用它训练只能学会关键词规则本身，因此不作为样本；
+    日志记录带有人工标注的 label 字段时才使用
+    :param log_dir: 回复日志目录
+    :param samples_file: JSONL 样本文件，每行 {"text": ..., "label": ...}，label 为空的行跳过
+    :return: (文本列表, 类别列表)
+    """
+    texts, labels = [], []
+    if samples_file:
+        with open(samples_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    sample = json.loads(line)
+                    if sample.get("text") and sample.get("label"):
+                        texts.append(sample["text"])
+                        labels.append(sample["label"])
+    if log_dir:
+        for record in _iter_log_records(log_dir):
+            if record.get("comment") and record.get("label"):
+                texts.append(record["comment"])
+                labels.append(record["label"])
+    return texts, labels
+
+
+def export_unlabelled(log_dir, output, min_length=12):
+    """
+    导出关键词未能分类的长评论（模型要处理的正是这类评论），供人工填写 label 后作为 --samples 训练
+    :param log_dir: 回复日志目录
+    :param output: 输出 JSONL 文件，每行 {"text": ..., "label": ""}
+    :param min_length: 只导出长于此长度的评论（与 short_comment_length 一致）
+    :return: 导出条数
+    """
+    seen = set()
+    with open(output, 'w', encoding='utf-8') as f:
+        for record in _iter_log_records(log_dir):
+            text = record.get("comment") or ""
+            if record.get("category") != "default" or len(text) <= min_length or text in seen:
+                continue
+            seen.add(text)
+            f.write(json.dumps({"text": text, "label": ""}, ensure_ascii=False) + "\n")
+    return len(seen)
+
+
+def main():
+    """命令行训练"""
+    parser = argparse.ArgumentParser(description="训练评论意图模型")
+    parser.add_argument("--log-dir", help="回复日志目录（使用其中人工标注了 label 的记录）")
+    parser.add_argument("--samples", help="JSONL 样本文件，每行 {\"text\", \"label\"}")
+    parser.add_argument("--export-unlabelled", metavar="PATH",
+                        help="从 --log-dir 导出关键词未分类的长评论到 PATH，人工标注后用 --samples 训练")
+    parser.add_argument("--output", default=str(DEFAULT_MODEL_FILE), help="模型输出路径")
+    parser.add_argument("--epochs", type=int, default=200, help="迭代轮数")
+    args = parser.parse_args()
+
+    if args.export_unlabelled:
+        if not args.log_dir:
+            print("❌ 导出需要指定 --log-dir")
+            return
+        count = export_unlabelled(args.log_dir, args.export_unlabelled)
+        print(f"✅ 已导出 {count} 条待标注评论: {args.export_unlabelled}")
+        return
+
+    texts, labels = load_samples(args.log_dir, args.samples)
+    if not texts:
+        print("❌ 没有人工标注的训练样本，请先用 --export-unlabelled 导出评论并填写 label")
+        return
+
+    model = IntentModel(sorted(set(labels)))
+    accuracy = model.fit(texts, labels, epochs=args.epochs)
+    path = model.save(args.output)
+    print(f"✅ 模型已保存: {path} | 样本 {len(texts)} 条 | 类别 {model.labels} | 训练集准确率 {accuracy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
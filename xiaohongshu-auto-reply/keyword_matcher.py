@@ -0,0 +1,119 @@
+"""
+多模式关键词匹配
+基于 Aho-Corasick 自动机，一次扫描找出评论中所有类别的关键词及位置
+"""
+import bisect
+from collections import deque
+
+
+class KeywordMatcher:
+    def __init__(self, keyword_table, ignore_case=True):
+        """
+        :param keyword_table: {类别: [关键词, ...]}，类别顺序即优先级
+        :param ignore_case: 是否忽略大小写
+        """
+        self.ignore_case = ignore_case
+        self.categories = list(keyword_table.keys())
+
+        # 每个节点：转移表、失败指针、输出 [(关键词, 类别元组)]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        keyword_categories = {}
+        for category, keywords in keyword_table.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                key = keyword.lower() if ignore_case else keyword
+                keyword_categories.setdefault(key, []).append(category)
+
+        for keyword, categories in keyword_categories.items():
+            self._add(keyword, tuple(categories))
+        self._build()
+
+    def _add(self, keyword, categories):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((keyword, categories))
+
+    def _build(self):
+        """广度优先构建失败指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """
+        找出文本中所有关键词
+        :param text: 文本
+        :return: [(起始位置, 关键词, 类别元组)]，按结束位置排序
+        """
+        if self.ignore_case:
+            text = text.lower()
+        return self._scan(text)
+
+    def _scan(self, text):
+        """在已按大小写规则处理过的文本上运行自动机"""
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for keyword, categories in self._output[node]:
+                matches.append((index - len(keyword) + 1, keyword, categories))
+        return matches
+
+    def match(self, text):
+        """
+        按类别汇总匹配结果
+        :param text: 文本
+        :return: {类别: [(起始位置, 关键词), ...]}，类别按优先级排列
+        """
+        by_category = {}
+        for start, keyword, categories in self.find_all(text):
+            for category in categories:
+                by_category.setdefault(category, []).append((start, keyword))
+        return {category: by_category[category] for category in self.categories if category in by_category}
+
+    def match_many(self, texts, separator="\x00"):
+        """
+        批量匹配：把文本用分隔符拼接后只扫描一次
+        :param texts: 文本列表
+        :param separator: 分隔符，不能出现在关键词中
+        :return: 与 texts 一一对应的 match 结果
+        """
+        # 逐条转小写后再拼接：lower() 可能改变长度（如 'İ'），偏移必须按转换后的文本计算
+        texts = [text.lower() for text in texts] if self.ignore_case else list(texts)
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(separator)
+
+        by_text = [{} for _ in texts]
+        for start, keyword, categories in self._scan(separator.join(texts)):
+            index = bisect.bisect_right(starts, start) - 1
+            for category in categories:
+                by_text[index].setdefault(category, []).append((start - starts[index], keyword))
+
+        return [
+            {category: matches[category] for category in self.categories if category in matches}
+            for matches in by_text
+        ]
@@ -0,0 +1,401 @@
+"""
+压测工具
+回放录制或合成的评论流（1 万 ~ 100 万条评论，大量用户和笔记），经过
+XHSMonitor（模拟 edith 接口）→ ReplyStrategy → 发件箱 → CustomerTracker 完整链路
+输出每秒处理评论数、端到端延迟 P50/P99 和峰值内存，可与基线对比发现性能回退
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from auto_reply import AutoReplySystem
+from poller import ConcurrentPoller
+
+
+# 合成评论的内容池（覆盖各个评论类别）
+SAMPLE_CONTENTS = [
+    "这个产品怎么样？", "价格多少？", "多少钱呀", "你好呀", "很好用，很喜欢", "怎么购买？",
+    "谢谢分享", "想了解更多", "效果好吗", "太棒了！", "蹲一个链接", "已收藏，慢慢看",
+    "敏感肌可以用吗", "求推荐同款", "哈喽~", "学到了"
+]
+
+# 与基线对比时允许的性能波动
+DEFAULT_TOLERANCE = 0.2
+
+
+def synthetic_stream(count, notes=100, users=None, duration=3600, seed=42):
+    """
+    生成合成评论流
+    :param count: 评论数
+    :param notes: 笔记数（评论按幂律分布集中在少数热门笔记）
+    :param users: 用户数，默认为评论数的一半
+    :param duration: 评论分布的时间跨度（秒）
+    :param seed: 随机种子
+    :return: [{"offset": 秒, "note_id", "comment": 接口原始结构}]，按 offset 排序
+    """
+    rng = random.Random(seed)
+    users = users or max(count // 2, 1)
+    note_weights = [1.0 / (rank + 1) for rank in range(notes)]
+    note_ids = rng.choices([f"note_{index:05d}" for index in range(notes)], weights=note_weights, k=count)
+    offsets = sorted(rng.uniform(0, duration) for _ in range(count))
+
+    events = []
+    for index, (offset, note_id) in enumerate(zip(offsets, note_ids)):
+        user_id = f"user_{rng.randrange(users):07d}"
+        events.append({
+            "offset": round(offset, 3),
+            "note_id": note_id,
+            "comment": {
+                "id": f"cmt_{index:08d}",
+                "user": {"user_id": user_id, "nickname": user_id},
+                "content": rng.choice(SAMPLE_CONTENTS),
+                "like_count": 0,
+                "sub_comment_count": 0
+            }
+        })
+    return events
+
+
+def save_fixture(events, path):
+    """保存评论流为 JSONL（每行一条事件）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def load_fixture(path):
+    """读取 JSONL 评论流"""
+    with open(path, 'r', encoding='utf-8') as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    events.sort(key=lambda event: event["offset"])
+    return events
+
+
+class MockEdithServer:
+    def __init__(self, page_size=20):
+        """
+        模拟小红书 edith 评论接口：评论分页（最新在前）、子评论分页、发布回复
+        :param page_size: 每页评论数
+        """
+        self.page_size = page_size
+        # note_id -> 评论列表（按发布顺序，最新在末尾）
+        self.notes = {}
+        self.replies = 0
+        self._lock = threading.Lock()
+        self._last_create_time = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def publish(self, note_id, comments):
+        """
+        发布评论，create_time 取当前毫秒时间戳（严格递增）
+        :return: 发布时间
+        """
+        now = time.time()
+        with self._lock:
+            bucket = self.notes.setdefault(note_id, [])
+            for comment in comments:
+                self._last_create_time = max(int(now * 1000), self._last_create_time + 1)
+                bucket.append(dict(comment, create_time=self._last_create_time))
+        return now
+
+    def _comment_page(self, params):
+        note_id = params.get("note_id", [""])[0]
+        cursor = params.get("cursor", [""])[0]
+        start = int(cursor) if cursor else 0
+        with self._lock:
+            bucket = self.notes.get(note_id, [])
+            end = len(bucket) - start
+            comments = bucket[max(end - self.page_size, 0):max(end, 0)][::-1]
+            has_more = end - self.page_size > 0
+        return {
+            "comments": comments,
+            "cursor": str(start + self.page_size) if has_more else "",
+            "has_more": has_more
+        }
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，keep-alive 下需关闭 Nagle 算法，否则每个请求多等约 40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/api/sns/web/v1/comment/page":
+                    data = mock._comment_page(parse_qs(url.query, keep_blank_values=True))
+                elif url.path == "/api/sns/web/v2/comment/sub/page":
+                    data = {"comments": [], "cursor": "", "has_more": False}
+                else:
+                    return self._reply(404, {"success": False, "msg": "not found"})
+                self._reply(200, {"success": True, "data": data})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                if urlparse(self.path).path != "/api/sns/web/v1/comment/post":
+                    return self._reply(404, {"success": False, "msg": "not found"})
+                with mock._lock:
+                    mock.replies += 1
+                self._reply(200, {"success": True, "data": {}})
+
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-edith", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(values, ratio):
+    if not values:
+        return None
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+
+def _build_config(work_dir, base_url, note_ids, concurrency):
+    """压测配置：数据写入临时目录，额度不限制，接口指向模拟服务器"""
+    return {
+        "xiaohongshu": {
+            "note_ids": note_ids,
+            "poll_concurrency": concurrency,
+            "rate_limit_per_second": 0,
+            "max_comment_pages": 1000,
+            "dedup_max_per_note": 0
+        },
+        "http": {"api_base": base_url, "http2": False, "retries": 0, "pool_size": concurrency},
+        "reply": {
+            "reply_delay": 0,
+            "reply_delay_jitter": 0,
+            "max_reply_per_day": 0,
+            "max_reply_per_note": 0,
+            "max_reply_per_user": 0
+        },
+        "reply_log": {"flush_interval": 0},
+        "storage": {
+            "customer_db": str(Path(work_dir) / "customers.json"),
+            "customer_store": str(Path(work_dir) / "customers.db"),
+            "dedup_db": str(Path(work_dir) / "processed_comments.db"),
+            "outbox_db": str(Path(work_dir) / "outbox.db"),
+            "reply_budget_db": str(Path(work_dir) / "reply_budget.db"),
+            "reply_log": str(Path(work_dir) / "replies"),
+            "template_stats": str(Path(work_dir) / "template_stats.json")
+        }
+    }
+
+
+def run_load(events, round_seconds=30, concurrency=8, send=False, quiet=True):
+    """
+    回放评论流：按 round_seconds 把事件分成若干轮，每轮先发布到模拟服务器，
+    再执行一次完整的检查 → 分类规划入队 → 发送 → 写入客户跟踪
+    :param events: 评论流事件
+    :param round_seconds: 每轮覆盖的评论流时间跨度（相当于轮询间隔）
+    :param concurrency: 轮询并发数
+    :param send: 是否通过模拟接口发送回复（否则直接标记为已发送）
+    :param quiet: 屏蔽各模块的逐条输出
+    :return: 统计结果
+    """
+    rounds = {}
+    for event in events:
+        rounds.setdefault(int(event["offset"] // round_seconds), []).append(event)
+    note_ids = sorted({event["note_id"] for event in events})
+
+    server = MockEdithServer()
+    server.start()
+    latencies = []
+    stage_seconds = {"poll": 0.0, "plan": 0.0, "send": 0.0, "record": 0.0}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        output = open(os.devnull, 'w') if quiet else sys.stdout
+        try:
+            with contextlib.redirect_stdout(output):
+                system = AutoReplySystem(config=_build_config(work_dir, server.base_url, note_ids, concurrency))
+                if not send:
+                    system.outbox.send_func = lambda note_id, comment_id, content: True
+                poller = ConcurrentPoller(system.monitor, max_workers=concurrency)
+
+                start = time.perf_counter()
+                for round_index in sorted(rounds):
+                    by_note = {}
+                    for event in rounds[round_index]:
+                        by_note.setdefault(event["note_id"], []).append(event["comment"])
+                    published_at = {
+                        note_id: server.publish(note_id, comments) for note_id, comments in by_note.items()
+                    }
+
+                    stage_start = time.perf_counter()
+                    system.strategy.begin_cycle()
+                    results = poller.poll_once(note_ids)
+                    stage_seconds["poll"] += time.perf_counter() - stage_start
+
+                    stage_start = time.perf_counter()
+                    system.process_batch(results)
+                    stage_seconds["plan"] += time.perf_counter() - stage_start
+
+                    stage_start = time.perf_counter()
+                    while system.outbox.pending_count():
+                        system.outbox.process_next()
+                    stage_seconds["send"] += time.perf_counter() - stage_start
+
+                    stage_start = time.perf_counter()
+                    system._record_sent_replies()
+                    finished = time.time()
+                    stage_seconds["record"] += time.perf_counter() - stage_start
+
+                    for note_id, comments in results.items():
+                        if note_id in published_at:
+                            latencies.extend([finished - published_at[note_id]] * len(comments))
+
+                elapsed = time.perf_counter() - start
+                poller.shutdown()
+                stats = {
+                    "comments": len(events),
+                    "processed": system.comments_processed,
+                    "replies": system.reply_stats["total_replies"],
+                    "customers": system.tracker.export_summary()["total_customers"],
+                    "requests": system.monitor.request_count
+                }
+                system.close()
+        finally:
+            if quiet:
+                output.close()
+            server.stop()
+
+    latencies.sort()
+    stats.update({
+        "rounds": len(rounds),
+        "notes": len(note_ids),
+        "seconds": round(elapsed, 3),
+        "comments_per_second": round(len(events) / elapsed, 1) if elapsed else None,
+        "p50_latency_ms": round(_percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p99_latency_ms": round(_percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+        "peak_rss_mb": peak_rss_mb()
+    })
+    return stats
+
+
+def compare_with_baseline(stats, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    与基线结果对比
+    :return: 性能回退说明列表，为空表示没有回退
+    """
+    regressions = []
+    if baseline.get("comments_per_second") and \
+            stats["comments_per_second"] < baseline["comments_per_second"] * (1 - tolerance):
+        regressions.append(f"吞吐量 {stats['comments_per_second']}/秒 < 基线 {baseline['comments_per_second']}/秒")
+    for key, name in (("p50_latency_ms", "P50 延迟"), ("p99_latency_ms", "P99 延迟"), ("peak_rss_mb", "峰值内存")):
+        if baseline.get(key) and stats.get(key) and stats[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{name} {stats[key]} > 基线 {baseline[key]}")
+    return regressions
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="小红书自动回复系统压测")
+    parser.add_argument("--count", type=int, default=10000, help="合成评论数")
+    parser.add_argument("--notes", type=int, default=100, help="合成笔记数")
+    parser.add_argument("--users", type=int, help="合成用户数（默认为评论数的一半）")
+    parser.add_argument("--duration", type=float, default=3600, help="合成评论流的时间跨度（秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--fixture", help="回放已录制的 JSONL 评论流（忽略合成参数）")
+    parser.add_argument("--save-fixture", help="把合成评论流保存为 JSONL，便于之后回放")
+    parser.add_argument("--round-seconds", type=float, default=30, help="每轮检查覆盖的评论流时间跨度")
+    parser.add_argument("--concurrency", type=int, default=8, help="轮询并发数")
+    parser.add_argument("--send", action="store_true", help="通过模拟接口发送回复")
+    parser.add_argument("--output", help="结果写入 JSON 文件（可作为之后的基线）")
+    parser.add_argument("--baseline", help="与基线 JSON 对比，性能回退时返回非零退出码")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="允许的性能波动比例")
+    args = parser.parse_args()
+
+    if args.fixture:
+        events = load_fixture(args.fixture)
+    else:
+        events = synthetic_stream(args.count, notes=args.notes, users=args.users,
+                                  duration=args.duration, seed=args.seed)
+        if args.save_fixture:
+            save_fixture(events, args.save_fixture)
+            print(f"💾 评论流已保存: {args.save_fixture}")
+
+    print(f"🚀 回放 {len(events)} 条评论...")
+    stats = run_load(events, round_seconds=args.round_seconds, concurrency=args.concurrency, send=args.send)
+
+    print("\n" + "=" * 50)
+    print("📊 压测结果")
+    print("=" * 50)
+    print(f"评论: {stats['comments']} | 笔记: {stats['notes']} | 轮次: {stats['rounds']}"
+          f" | 回复: {stats['replies']} | 客户: {stats['customers']} | 请求: {stats['requests']}")
+    print(f"吞吐量: {stats['comments_per_second']} 条/秒（总耗时 {stats['seconds']} 秒）")
+    print(f"端到端延迟: P50 {stats['p50_latency_ms']}ms | P99 {stats['p99_latency_ms']}ms")
+    print(f"各阶段耗时: {stats['stage_seconds']}")
+    print(f"峰值内存: {stats['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(stats, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ 性能回退:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\n✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
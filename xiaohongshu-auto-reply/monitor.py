@@ -4,21 +4,71 @@
 """
 import json
 import time
-import requests
 from pathlib import Path
-from datetime import datetime
+
+from dedup_store import DedupStore
+from poller import ConcurrentPoller
+from scheduler import AdaptiveScheduler
+from xhs_client import API_BASE, XHSClient
+
+
+def format_comment(comment, parent_comment_id=None):
+    """
+    接口返回的评论转换为回调使用的评论结构
+    :param comment: 接口返回的评论
+    :param parent_comment_id: 子评论所属的一级评论ID
+    :return: 评论字典
+    """
+    formatted = {
+        "comment_id": comment.get("id"),
+        "user_id": comment.get("user", {}).get("user_id"),
+        "user_name": comment.get("user", {}).get("nickname"),
+        "content": comment.get("content", ""),
+        "create_time": comment.get("create_time"),
+        "like_count": comment.get("like_count", 0)
+    }
+    if parent_comment_id is not None:
+        formatted["is_sub_comment"] = True
+        formatted["parent_comment_id"] = parent_comment_id
+    return formatted
 
 
 class XHSMonitor:
-    def __init__(self, config_file="./config.json"):
-        self.config = self._load_config(config_file)
+    def __init__(self, config_file="./config.json", config=None):
+        """
+        :param config_file: 配置文件
+        :param config: 已加载的配置（多账号运行时注入），提供时忽略 config_file
+        """
+        self.config = config if config is not None else self._load_config(config_file)
         self.cookies = self.config.get("xiaohongshu", {}).get("cookies", "")
         self.user_agent = self.config.get("xiaohongshu", {}).get("user_agent", "")
         self.check_interval = self.config.get("xiaohongshu", {}).get("monitor_interval", 300)
-
-        # 存储已处理的评论ID
-        self.processed_comments = set()
+        self.poll_concurrency = self.config.get("xiaohongshu", {}).get("poll_concurrency", 8)
+        self.max_comment_pages = self.config.get("xiaohongshu", {}).get("max_comment_pages", 10)
+
+        # 共享的 API 客户端（连接池、重试、限速），所有轮询线程共用
+        http_config = self.config.get("http", {})
+        self.client = XHSClient(
+            cookies=self.cookies,
+            user_agent=self.user_agent,
+            timeout=http_config.get("timeout", 10),
+            retries=http_config.get("retries", 2),
+            backoff_factor=http_config.get("backoff_factor", 0.5),
+            pool_size=max(self.poll_concurrency, http_config.get("pool_size", 8)),
+            rate_limit=self.config.get("xiaohongshu", {}).get("rate_limit_per_second", 5),
+            http2=http_config.get("http2", True),
+            api_base=http_config.get("api_base", API_BASE)
+        )
+
+        # 存储已处理的评论ID（持久化，重启后不重复处理）
+        self.processed_comments = DedupStore(
+            db_file=self.config.get("storage", {}).get("dedup_db", "./data/processed_comments.db"),
+            max_per_note=self.config.get("xiaohongshu", {}).get("dedup_max_per_note", 5000),
+            ttl_days=self.config.get("xiaohongshu", {}).get("dedup_ttl_days", 30)
+        )
         self.comments_cache = {}
+        # 运行中的轮询调度器（供统计使用）
+        self.scheduler = None
 
     def _load_config(self, config_file):
         """加载配置文件"""
@@ -28,13 +78,10 @@ class XHSMonitor:
         with open(config_path, 'r', encoding='utf-8') as f:
             return json.load(f)
 
-    def _get_headers(self):
-        """获取请求头"""
-        return {
-            "User-Agent": self.user_agent,
-            "Cookie": self.cookies,
-            "Content-Type": "application/json"
-        }
+    @property
+    def request_count(self):
+        """实际发出的请求数（用于统计请求花费）"""
+        return self.client.request_count
 
     def get_note_comments(self, note_id, page=1, page_size=20):
         """
@@ -44,87 +91,162 @@ class XHSMonitor:
         :param page_size: 每页数量
         :return: 评论列表
         """
-        url = "https://edith.xiaohongshu.com/api/sns/web/v1/comment/page"
+        comments, _, _ = self.get_comment_page(note_id, cursor=str((page - 1) * page_size))
+        return comments
+
+    def get_comment_page(self, note_id, cursor=""):
+        """
+        按游标获取一页评论
+        :param note_id: 笔记ID
+        :param cursor: 上一页返回的游标，首页为空
+        :return: (评论列表, 下一页游标, 是否还有更多)
+        """
+        url = "/api/sns/web/v1/comment/page"
 
         params = {
             "note_id": note_id,
-            "cursor": str((page - 1) * page_size),
+            "cursor": cursor,
             "top_comment_id": "",
             "image_scenes": ""
         }
 
+        return self._get_page(url, params, note_id)
+
+    def get_sub_comment_page(self, note_id, root_comment_id, cursor="", num=10):
+        """
+        按游标获取一页子评论
+        :param note_id: 笔记ID
+        :param root_comment_id: 一级评论ID
+        :param cursor: 游标
+        :param num: 每页数量
+        :return: (子评论列表, 下一页游标, 是否还有更多)
+        """
+        url = "/api/sns/web/v2/comment/sub/page"
+
+        params = {
+            "note_id": note_id,
+            "root_comment_id": root_comment_id,
+            "num": num,
+            "cursor": cursor,
+            "image_scenes": ""
+        }
+
+        return self._get_page(url, params, note_id)
+
+    def _get_page(self, url, params, note_id):
+        """请求分页接口，返回 (评论列表, 下一页游标, 是否还有更多)"""
         try:
-            response = requests.get(url, headers=self._get_headers(), params=params, timeout=10)
+            response = self.client.get(url, params=params)
 
             if response.status_code == 200:
-                data = response.json()
-                comments = data.get("data", {}).get("comments", [])
-                return comments
+                data = response.json().get("data", {}) or {}
+                return (
+                    data.get("comments", []),
+                    data.get("cursor", ""),
+                    bool(data.get("has_more", False))
+                )
             else:
                 print(f"获取评论失败: {note_id}, 状态码: {response.status_code}")
-                return []
+                return [], "", False
 
         except Exception as e:
             print(f"请求异常: {e}")
-            return []
+            return [], "", False
+
+    def _is_seen(self, comment, watermark, new_ids):
+        """评论是否已处理过（已在去重库中，或不晚于高水位线）"""
+        comment_id = comment.get("id")
+        if comment_id in self.processed_comments or comment_id in new_ids:
+            return True
+        create_time = comment.get("create_time") or 0
+        return bool(watermark) and create_time <= watermark
+
+    def _format_comment(self, comment, parent_comment_id=None):
+        """转换为回调使用的评论结构"""
+        return format_comment(comment, parent_comment_id)
+
+    def _collect_sub_comments(self, note_id, comment, watermark, new_ids):
+        """
+        收集一级评论下的新子评论
+        接口随一级评论附带的子评论直接检查；只有子评论数变化且还有更多时才翻页拉取
+        """
+        parent_id = comment.get("id")
+        sub_comment_count = comment.get("sub_comment_count")
+        known_count = self.comments_cache[note_id].get(parent_id)
+        self.comments_cache[note_id][parent_id] = sub_comment_count
+
+        sub_comments = comment.get("sub_comments", [])
+        cursor = comment.get("sub_comment_cursor", "")
+        has_more = bool(comment.get("sub_comment_has_more", False))
+        fetch_more = has_more and sub_comment_count != known_count
+
+        new_subs = []
+        for _ in range(self.max_comment_pages):
+            for sub_comment in sub_comments:
+                if self._is_seen(sub_comment, watermark, new_ids):
+                    continue
+                new_ids.add(sub_comment.get("id"))
+                new_subs.append(self._format_comment(sub_comment, parent_comment_id=parent_id))
+
+            if not fetch_more or not has_more or not cursor:
+                break
+            sub_comments, cursor, has_more = self.get_sub_comment_page(note_id, parent_id, cursor)
+
+        return new_subs
 
     def check_new_comments(self, note_id):
         """
         检查新评论
+        从首页向后翻页，遇到已处理的评论（或早于高水位线）即停止
         :param note_id: 笔记ID
         :return: 新评论列表
         """
         if note_id not in self.comments_cache:
             self.comments_cache[note_id] = {}
 
-        comments = self.get_note_comments(note_id, page=1, page_size=50)
+        watermark = self.processed_comments.get_watermark(note_id)
         new_comments = []
+        new_sub_comments = []
+        new_ids = set()
+        latest_time = watermark
 
-        for comment in comments:
-            comment_id = comment.get("id")
-
-            # 跳过已处理的评论
-            if comment_id in self.processed_comments:
-                continue
-
-            # 记录新评论
-            self.processed_comments.add(comment_id)
-            new_comments.append({
-                "comment_id": comment_id,
-                "user_id": comment.get("user", {}).get("user_id"),
-                "user_name": comment.get("user", {}).get("nickname"),
-                "content": comment.get("content", ""),
-                "create_time": comment.get("create_time"),
-                "like_count": comment.get("like_count", 0)
-            })
-
-        # 检查子评论
-        for comment in comments:
-            sub_comments = comment.get("sub_comments", [])
-            for sub_comment in sub_comments:
-                sub_comment_id = sub_comment.get("id")
+        cursor = ""
+        for _ in range(self.max_comment_pages):
+            comments, cursor, has_more = self.get_comment_page(note_id, cursor)
+            reached_seen = False
 
-                if sub_comment_id in self.processed_comments:
-                    continue
+            for comment in comments:
+                latest_time = max(latest_time, comment.get("create_time") or 0)
 
-                self.processed_comments.add(sub_comment_id)
-                new_comments.append({
-                    "comment_id": sub_comment_id,
-                    "user_id": sub_comment.get("user", {}).get("user_id"),
-                    "user_name": sub_comment.get("user", {}).get("nickname"),
-                    "content": sub_comment.get("content", ""),
-                    "create_time": sub_comment.get("create_time"),
-                    "like_count": sub_comment.get("like_count", 0),
-                    "is_sub_comment": True,
-                    "parent_comment_id": comment.get("id")
-                })
+                # 跳过已处理的评论
+                if self._is_seen(comment, watermark, new_ids):
+                    reached_seen = True
+                else:
+                    # 记录新评论
+                    new_ids.add(comment.get("id"))
+                    new_comments.append(self._format_comment(comment))
+
+                # 检查子评论（已处理的一级评论下也可能有新回复）
+                new_sub_comments.extend(
+                    self._collect_sub_comments(note_id, comment, watermark, new_ids)
+                )
 
-        return new_comments
+            if reached_seen or not has_more or not cursor:
+                break
 
-    def start_monitoring(self, callback=None):
+        new_ids.discard(None)
+        # 一次事务写入本轮新评论ID和高水位线
+        self.processed_comments.add_many(note_id, new_ids, watermark=latest_time)
+
+        return new_comments + new_sub_comments
+
+    def start_monitoring(self, callback=None, before_sweep=None, batch_callback=None, stop_event=None):
         """
         开始监控笔记评论
-        :param callback: 新评论回调函数
+        :param callback: 新评论回调函数 callback(note_id, comment)
+        :param before_sweep: 每轮检查开始前调用（用于重置按周期缓存的数据）
+        :param batch_callback: 每轮检查结束后以 {note_id: 新评论列表} 调用一次（批量处理）
+        :param stop_event: threading.Event，设置后退出监控（在线程中运行时使用）
         """
         note_ids = self.config.get("xiaohongshu", {}).get("note_ids", [])
 
@@ -132,31 +254,94 @@ class XHSMonitor:
             print("没有配置要监控的笔记ID")
             return
 
-        print(f"开始监控 {len(note_ids)} 个笔记的评论...")
-        print(f"检查间隔: {self.check_interval} 秒")
-
-        while True:
-            try:
-                for note_id in note_ids:
-                    new_comments = self.check_new_comments(note_id)
+        scheduler = self._create_scheduler(note_ids)
+        self.scheduler = scheduler
 
-                    if new_comments:
-                        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-                              f"笔记 {note_id} 发现 {len(new_comments)} 条新评论")
+        print(f"开始监控 {len(note_ids)} 个笔记的评论...")
+        print(f"检查间隔: {scheduler.min_interval}-{scheduler.max_interval} 秒（自适应）"
+              f" | 并发数: {self.poll_concurrency}")
 
-                        # 调用回调函数
-                        if callback:
-                            for comment in new_comments:
-                                callback(note_id, comment)
+        poller = ConcurrentPoller(self, max_workers=self.poll_concurrency)
+        stats_interval = self.config.get("scheduler", {}).get("stats_interval", 600)
+        last_stats = time.time()
 
-            except KeyboardInterrupt:
-                print("\n监控已停止")
-                break
-            except Exception as e:
-                print(f"监控异常: {e}")
-
-            # 等待下一次检查
-            time.sleep(self.check_interval)
+        try:
+            while not (stop_event and stop_event.is_set()):
+                try:
+                    due_notes = scheduler.pop_due()
+                    if due_notes:
+                        requests_before = self.request_count
+                        results = {}
+                        try:
+                            if before_sweep:
+                                before_sweep()
+                            results = poller.poll_once(due_notes, callback)
+                            if batch_callback and any(results.values()):
+                                batch_callback(results)
+                        finally:
+                            # 已从堆中取出的笔记无论处理是否出错都要重新排期，否则会从监控中丢失
+                            for note_id in due_notes:
+                                scheduler.record_poll(note_id, results.get(note_id, []))
+                            scheduler.record_requests(self.request_count - requests_before)
+                        self.processed_comments.evict_expired()
+
+                    if time.time() - last_stats >= stats_interval:
+                        self._report_scheduler_stats(scheduler)
+                        last_stats = time.time()
+                except Exception as e:
+                    print(f"监控异常: {e}")
+
+                # 睡到下一个笔记到期
+                wait = max(scheduler.seconds_until_next(), 0.5)
+                if stop_event:
+                    stop_event.wait(wait)
+                else:
+                    time.sleep(wait)
+        except KeyboardInterrupt:
+            print("\n监控已停止")
+        finally:
+            self._report_scheduler_stats(scheduler)
+            poller.shutdown()
+            self.processed_comments.close()
+
+    def _create_scheduler(self, note_ids):
+        """
+        根据配置创建轮询调度器
+        关闭自适应时所有笔记固定使用 monitor_interval
+        """
+        scheduler_config = self.config.get("scheduler", {})
+        if not scheduler_config.get("adaptive", True):
+            return AdaptiveScheduler(
+                note_ids,
+                base_interval=self.check_interval,
+                min_interval=self.check_interval,
+                max_interval=self.check_interval
+            )
+
+        return AdaptiveScheduler(
+            note_ids,
+            base_interval=self.check_interval,
+            min_interval=scheduler_config.get("min_interval", 30),
+            max_interval=scheduler_config.get("max_interval", 3600),
+            target_comments_per_poll=scheduler_config.get("target_comments_per_poll", 1),
+            backoff_factor=scheduler_config.get("backoff_factor", 1.5)
+        )
+
+    def _report_scheduler_stats(self, scheduler):
+        """打印调度统计，并写入文件供 --stats 查看"""
+        stats = scheduler.stats()
+        stats["latency"] = self.client.latency_stats()
+        print(f"\n📈 调度统计: 请求 {stats['total_requests']} 次"
+              f" ({stats['requests_per_hour']}/小时) | 新评论 {stats['total_comments']} 条"
+              f" | 平均发现延迟 {stats['avg_detection_latency']} 秒"
+              f" | 热门/冷门笔记 {stats['hot_notes']}/{stats['dormant_notes']}")
+
+        stats_file = Path(self.config.get("storage", {}).get(
+            "scheduler_stats", "./data/scheduler_stats.json"
+        ))
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
 
     def post_reply(self, note_id, comment_id, content):
         """
@@ -166,7 +351,7 @@ class XHSMonitor:
         :param content: 回复内容
         :return: 是否成功
         """
-        url = "https://edith.xiaohongshu.com/api/sns/web/v1/comment/post"
+        url = "/api/sns/web/v1/comment/post"
 
         data = {
             "note_id": note_id,
@@ -176,7 +361,7 @@ class XHSMonitor:
         }
 
         try:
-            response = requests.post(url, headers=self._get_headers(), json=data, timeout=10)
+            response = self.client.post(url, json=data)
 
             if response.status_code == 200:
                 result = response.json()
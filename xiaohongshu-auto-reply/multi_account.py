@@ -0,0 +1,228 @@
+"""
+多账号运行器
+一个进程内运行多个账号：回复模板和关键词自动机只加载一份，各账号只读共享
+每个账号在独立线程中监控自己的笔记，拥有独立的连接池、发件箱、额度和数据文件
+"""
+import copy
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from auto_reply import AutoReplySystem
+from reply_strategy import ReplyStrategy
+
+
+# 各账号需要隔离的数据文件（未配置时的默认路径）
+STORAGE_DEFAULTS = {
+    "customer_db": "./data/customers.json",
+    "dedup_db": "./data/processed_comments.db",
+    "scheduler_stats": "./data/scheduler_stats.json",
+    "outbox_db": "./data/outbox.db",
+    "reply_budget_db": "./data/reply_budget.db",
+    "reply_log": "./logs/replies",
+    "template_stats": "./data/template_stats.json",
+    "accounts_stats": "./data/accounts_stats.json"
+}
+
+
+def shard_notes(note_ids, accounts):
+    """
+    把未指定账号的笔记按笔记ID哈希分配给各账号（重启后分配不变）
+    :param note_ids: 笔记ID列表
+    :param accounts: 账号名称列表
+    :return: {账号: [笔记ID]}
+    """
+    shards = {name: [] for name in accounts}
+    for note_id in note_ids:
+        shards[accounts[zlib.crc32(note_id.encode("utf-8")) % len(accounts)]].append(note_id)
+    return shards
+
+
+def build_account_config(base_config, account, note_ids):
+    """
+    生成单个账号的配置：继承公共配置，覆盖 Cookie、笔记和回复设置，数据文件放到账号子目录
+    :param base_config: 公共配置
+    :param account: 账号配置 {"name", "cookies", "user_agent", "note_ids", "reply", "ingest"}
+    :param note_ids: 该账号负责的笔记
+    :return: 配置字典
+    """
+    config = copy.deepcopy(base_config)
+    config.pop("accounts", None)
+    name = account["name"]
+
+    xhs_config = config.setdefault("xiaohongshu", {})
+    for key in ("cookies", "user_agent"):
+        if key in account:
+            xhs_config[key] = account[key]
+    xhs_config["note_ids"] = list(note_ids)
+    config.setdefault("reply", {}).update(account.get("reply", {}))
+    # 推送接入时各账号需要不同的端口
+    config.setdefault("ingest", {}).update(account.get("ingest", {}))
+
+    storage = config.setdefault("storage", {})
+    for key, default in STORAGE_DEFAULTS.items():
+        path = Path(storage.get(key, default))
+        storage[key] = str(path.parent / name / path.name)
+    if "customer_store" in storage:
+        path = Path(storage["customer_store"])
+        storage["customer_store"] = str(path.parent / name / path.name)
+    return config
+
+
+class MultiAccountRunner:
+    def __init__(self, config_file="./config.json"):
+        """
+        :param config_file: 配置文件，accounts 列出各账号；xiaohongshu.note_ids 中的笔记按哈希分配给各账号
+        """
+        self.config = self._load_config(config_file)
+        accounts = self.config.get("accounts") or [{"name": "default"}]
+        names = [account["name"] for account in accounts]
+        shards = shard_notes(self.config.get("xiaohongshu", {}).get("note_ids", []), names)
+
+        self.report_interval = self.config.get("multi_account", {}).get("report_interval", 300)
+
+        # 只加载一次模板、关键词自动机和意图模型，各账号使用共享只读数据的副本
+        self.strategy = ReplyStrategy.from_config(self.config)
+
+        self.systems = {}
+        for account in accounts:
+            name = account["name"]
+            note_ids = list(dict.fromkeys(list(account.get("note_ids", [])) + shards[name]))
+            config = build_account_config(self.config, account, note_ids)
+            self.systems[name] = AutoReplySystem(
+                config=config,
+                strategy=self.strategy.fork(config["storage"]["template_stats"]),
+                account=name
+            )
+
+        self._stop = threading.Event()
+        self._threads = []
+        # 上次统计时的时间和各账号累计数（评论数, 回复数）
+        self._last_report = (time.time(), {
+            name: (system.comments_processed, system.reply_stats["total_replies"])
+            for name, system in self.systems.items()
+        })
+
+    def _load_config(self, config_file):
+        """加载配置文件"""
+        config_path = Path(config_file)
+        if not config_path.exists():
+            print(f"配置文件不存在: {config_file}")
+            return {}
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def collect_stats(self, now=None):
+        """
+        各账号自上次统计以来的吞吐量和延迟
+        :return: {账号: 统计}
+        """
+        now = now if now is not None else time.time()
+        last_time, last_counts = self._last_report
+        elapsed_minutes = max(now - last_time, 1e-6) / 60
+
+        stats = {}
+        counts = {}
+        for name, system in self.systems.items():
+            comments = system.comments_processed
+            replies = system.reply_stats["total_replies"]
+            last_comments, last_replies = last_counts.get(name, (0, 0))
+            counts[name] = (comments, replies)
+
+            scheduler = system.monitor.scheduler
+            scheduler_stats = scheduler.stats() if scheduler else {}
+            stats[name] = {
+                "notes": len(system.config.get("xiaohongshu", {}).get("note_ids", [])),
+                "comments_per_minute": round((comments - last_comments) / elapsed_minutes, 2),
+                "replies_per_minute": round((replies - last_replies) / elapsed_minutes, 2),
+                "total_comments": comments,
+                "total_replies": replies,
+                "requests": system.monitor.request_count,
+                "detection_latency": scheduler_stats.get("avg_detection_latency"),
+                "reply_lag": round(system.outbox.oldest_pending_age(now), 1),
+                "pending": system.outbox.pending_count()
+            }
+
+        self._last_report = (now, counts)
+        return stats
+
+    def report(self):
+        """打印各账号统计，并写入文件"""
+        stats = self.collect_stats()
+        print("\n" + "=" * 50)
+        print("👥 多账号运行统计")
+        print("=" * 50)
+        for name, account_stats in stats.items():
+            print(f"{name}: 笔记 {account_stats['notes']}"
+                  f" | 评论 {account_stats['comments_per_minute']}/分钟"
+                  f" | 回复 {account_stats['replies_per_minute']}/分钟"
+                  f" | 发现延迟 {account_stats['detection_latency']} 秒"
+                  f" | 发送延迟 {account_stats['reply_lag']} 秒"
+                  f" | 待发送 {account_stats['pending']}")
+
+        stats_file = Path(self.config.get("storage", {}).get("accounts_stats", "./data/accounts_stats.json"))
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        return stats
+
+    def run(self):
+        """每个账号一个线程运行，主线程定期汇报统计，Ctrl+C 停止全部账号"""
+        for name, system in self.systems.items():
+            thread = threading.Thread(
+                target=system.run,
+                kwargs={"stop_event": self._stop, "close": False},
+                name=f"xhs-account-{name}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        next_report = time.time() + self.report_interval
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                self._stop.wait(1)
+                if time.time() >= next_report:
+                    self.report()
+                    next_report += self.report_interval
+        except KeyboardInterrupt:
+            print("\n正在停止所有账号...")
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self.report()
+            self.close()
+
+    def stop(self):
+        """通知所有账号停止"""
+        self._stop.set()
+
+    def close(self):
+        """关闭所有账号的数据库和连接池"""
+        for system in self.systems.values():
+            system.close()
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小红书自动回复系统（多账号）")
+    parser.add_argument("--config", default="./config.json", help="配置文件")
+    parser.add_argument("--shards", action="store_true", help="只显示各账号负责的笔记")
+    args = parser.parse_args()
+
+    runner = MultiAccountRunner(args.config)
+    if args.shards:
+        for name, system in runner.systems.items():
+            print(f"{name}: {', '.join(system.config['xiaohongshu']['note_ids']) or '-'}")
+        runner.close()
+    else:
+        runner.run()
+
+
+if __name__ == "__main__":
+    main()
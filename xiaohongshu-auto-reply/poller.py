@@ -0,0 +1,63 @@
+"""
+并发评论轮询模块
+使用有界线程池同时拉取多个笔记的评论
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+
+class ConcurrentPoller:
+    def __init__(self, monitor, max_workers=8):
+        """
+        :param monitor: XHSMonitor 实例，提供 check_new_comments
+        :param max_workers: 最大并发请求数
+        """
+        self.monitor = monitor
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="xhs-poller"
+        )
+
+    def poll_once(self, note_ids, callback=None):
+        """
+        并发检查一轮笔记的新评论
+        回调在调用线程中串行执行，保持 callback(note_id, comment) 约定不变
+        :param note_ids: 笔记ID列表
+        :param callback: 新评论回调函数
+        :return: {note_id: 新评论列表}
+        """
+        futures = {
+            self._executor.submit(self.monitor.check_new_comments, note_id): note_id
+            for note_id in note_ids
+        }
+
+        results = {}
+        for future in as_completed(futures):
+            note_id = futures[future]
+            try:
+                new_comments = future.result()
+            except Exception as e:
+                print(f"检查笔记 {note_id} 异常: {e}")
+                new_comments = []
+
+            results[note_id] = new_comments
+            if not new_comments:
+                continue
+
+            print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                  f"笔记 {note_id} 发现 {len(new_comments)} 条新评论")
+
+            if callback:
+                for comment in new_comments:
+                    # 单条评论处理失败不影响同一轮的其他评论
+                    try:
+                        callback(note_id, comment)
+                    except Exception as e:
+                        print(f"处理笔记 {note_id} 的评论异常: {e}")
+
+        return results
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,98 @@
+"""
+限速模块
+令牌桶限速器，用于控制对小红书接口的请求频率
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, tokens=None, updated_at=None, clock=time.monotonic):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量（允许的突发请求数），默认等于 rate
+        :param tokens: 初始令牌数（从持久化状态恢复时使用），默认装满
+        :param updated_at: tokens 对应的时间点，默认当前时间
+        :param clock: 时钟函数，需要持久化时使用 time.time
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.clock = clock
+        self.tokens = min(self.capacity, float(tokens)) if tokens is not None else self.capacity
+        self.updated_at = updated_at if updated_at is not None else clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """按流逝时间补充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """
+        尝试取走令牌，不阻塞
+        :param tokens: 需要的令牌数
+        :return: 是否成功
+        """
+        with self._lock:
+            self._refill(self.clock())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def available(self):
+        """当前可用令牌数"""
+        with self._lock:
+            self._refill(self.clock())
+            return self.tokens
+
+    def refund(self, tokens=1):
+        """归还令牌（不超过容量）"""
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def acquire(self, tokens=1):
+        """
+        取走令牌，令牌不足时阻塞等待
+        :param tokens: 需要的令牌数
+        """
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """按域名分别限速，每个域名一个令牌桶"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """
+        请求前调用，超出该域名的速率时阻塞
+        :param url: 请求地址
+        """
+        if not self.rate or self.rate <= 0:
+            return
+        self._bucket(urlparse(url).netloc).acquire()
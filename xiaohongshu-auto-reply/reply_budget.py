@@ -0,0 +1,182 @@
+"""
+回复额度模块
+按账号、笔记、用户分别维护令牌桶，令牌在配置的周期内匀速补满
+令牌桶状态持久化在 SQLite 中，重启后额度不会重置；检查和扣减都是 O(1)
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from rate_limit import TokenBucket
+
+
+# 额度范围，按此顺序检查
+SCOPES = ("account", "note", "user")
+
+# 默认额度：period 秒内最多 capacity 次回复，capacity 为 0 表示不限制
+DEFAULT_LIMITS = {
+    "account": {"capacity": 20, "period": 86400},
+    "note": {"capacity": 20, "period": 86400},
+    "user": {"capacity": 3, "period": 86400}
+}
+
+# 清理已补满令牌桶的间隔（秒）
+PRUNE_INTERVAL = 3600
+
+
+class ReplyBudget:
+    def __init__(self, db_file="./data/reply_budget.db", limits=None, clock=time.time):
+        """
+        :param db_file: SQLite 数据库文件
+        :param limits: {范围: {"capacity": 周期内上限, "period": 周期秒数}}，未配置的使用 DEFAULT_LIMITS
+        :param clock: 时钟函数
+        """
+        limits = limits or {}
+        self.limits = {scope: dict(DEFAULT_LIMITS[scope], **limits.get(scope, {})) for scope in SCOPES}
+        self.clock = clock
+
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+        """)
+        self._conn.commit()
+
+        self._lock = threading.Lock()
+        # (范围, 键) -> TokenBucket，首次访问时从数据库恢复
+        self._buckets = {}
+        self._dirty = set()
+        self._last_prune = clock()
+
+    def _bucket(self, scope, key):
+        """获取令牌桶，不存在时从数据库恢复或新建（装满）"""
+        bucket = self._buckets.get((scope, key))
+        if bucket is None:
+            limit = self.limits[scope]
+            row = self._conn.execute(
+                "SELECT tokens, updated_at FROM buckets WHERE scope = ? AND key = ?",
+                (scope, key)
+            ).fetchone()
+            bucket = TokenBucket(
+                rate=limit["capacity"] / limit["period"],
+                capacity=limit["capacity"],
+                tokens=row[0] if row else None,
+                updated_at=row[1] if row else None,
+                clock=self.clock
+            )
+            self._buckets[(scope, key)] = bucket
+        return bucket
+
+    def _scoped_buckets(self, note_id, user_id, account):
+        """本次回复涉及的令牌桶（跳过不限制的范围）"""
+        keys = {"account": account, "note": note_id, "user": user_id or ""}
+        return [
+            (scope, keys[scope], self._bucket(scope, keys[scope]))
+            for scope in SCOPES
+            if self.limits[scope]["capacity"]
+        ]
+
+    def try_consume(self, note_id, user_id, account="default"):
+        """
+        检查并扣减一次回复额度，所有范围都有余量时才扣减
+        :param note_id: 笔记ID
+        :param user_id: 用户ID
+        :param account: 回复账号
+        :return: None 表示成功，否则返回额度不足的范围（account / note / user）
+        """
+        with self._lock:
+            buckets = self._scoped_buckets(note_id, user_id, account)
+            for scope, _, bucket in buckets:
+                if bucket.available() < 1:
+                    return scope
+            for scope, key, bucket in buckets:
+                bucket.try_acquire()
+                self._dirty.add((scope, key))
+        return None
+
+    def refund(self, note_id, user_id, account="default"):
+        """归还一次回复额度（回复未入队或最终发送失败时调用）"""
+        with self._lock:
+            for scope, key, bucket in self._scoped_buckets(note_id, user_id, account):
+                bucket.refund()
+                self._dirty.add((scope, key))
+
+    def remaining(self, scope, key):
+        """
+        剩余额度
+        :param scope: 范围（account / note / user）
+        :param key: 账号 / 笔记ID / 用户ID
+        :return: 剩余次数，不限制时返回 None
+        """
+        if not self.limits[scope]["capacity"]:
+            return None
+        with self._lock:
+            return self._bucket(scope, key).available()
+
+    def snapshot(self, scope):
+        """
+        某个范围内所有未补满的额度
+        :param scope: 范围（account / note / user）
+        :return: {键: 剩余次数}
+        """
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM buckets WHERE scope = ?", (scope,)
+            )]
+            keys.extend(key for bucket_scope, key in self._buckets if bucket_scope == scope)
+            result = {}
+            for key in dict.fromkeys(keys):
+                available = self._bucket(scope, key).available()
+                if available < self.limits[scope]["capacity"]:
+                    result[key] = available
+        return result
+
+    def flush(self):
+        """把变化过的令牌桶一次事务写入数据库"""
+        with self._lock:
+            if self._dirty:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (scope, key, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                    [
+                        (scope, key, self._buckets[(scope, key)].tokens, self._buckets[(scope, key)].updated_at)
+                        for scope, key in self._dirty
+                    ]
+                )
+                self._conn.commit()
+                self._dirty.clear()
+
+            if self.clock() - self._last_prune >= PRUNE_INTERVAL:
+                self._prune()
+
+    def _prune(self):
+        """删除已经补满的令牌桶，补满的桶与不存在的桶等价"""
+        now = self.clock()
+        for (scope, key), bucket in list(self._buckets.items()):
+            if (scope, key) not in self._dirty and bucket.available() >= bucket.capacity:
+                del self._buckets[(scope, key)]
+
+        for scope in SCOPES:
+            limit = self.limits[scope]
+            if not limit["capacity"]:
+                continue
+            self._conn.execute(
+                "DELETE FROM buckets WHERE scope = ? AND tokens + (? - updated_at) * ? >= ?",
+                (scope, now, limit["capacity"] / limit["period"], limit["capacity"])
+            )
+        self._conn.commit()
+        self._last_prune = now
+
+    def close(self):
+        """写入未保存的变化并关闭数据库"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
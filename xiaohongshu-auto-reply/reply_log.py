@@ -0,0 +1,281 @@
+"""
+结构化回复日志
+回复记录先写入内存缓冲，达到条数或时间阈值后批量追加到 JSONL 文件
+文件按天切分，单个文件超过大小上限时继续写入下一个分片
+SQLite 索引记录每条日志所在的文件和偏移，按笔记、用户、类别、日期查询时不需要扫描文件
+"""
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+# 日志文件名：replies-2024-01-01.jsonl / replies-2024-01-01.1.jsonl
+LOG_FILE_PATTERN = re.compile(r"^replies-(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.jsonl$")
+
+
+class ReplyLog:
+    def __init__(self, log_dir="./logs/replies", index_db=None, flush_records=100,
+                 flush_interval=5, max_file_bytes=10 * 1024 * 1024):
+        """
+        :param log_dir: 日志目录
+        :param index_db: SQLite 索引文件，默认为 log_dir/index.db
+        :param flush_records: 缓冲达到多少条时写入文件
+        :param flush_interval: 缓冲最多停留的秒数
+        :param max_file_bytes: 单个日志文件大小上限
+        """
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+
+        self._conn = sqlite3.connect(str(index_db or self.log_dir / "index.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                note_id TEXT,
+                user_id TEXT,
+                category TEXT,
+                file TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries (ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_note ON entries (note_id, ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_user ON entries (user_id, ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_category ON entries (category, ts)")
+        self._conn.commit()
+
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._timer = None
+        # 日期 -> 当前写入的分片序号
+        self._parts = {}
+
+    def write(self, record):
+        """
+        写入一条回复记录（进入缓冲，不立即落盘）
+        :param record: 记录字典，ts 缺省为当前时间
+        """
+        record = dict(record)
+        record.setdefault("ts", time.time())
+        record.setdefault("time", datetime.fromtimestamp(record["ts"]).strftime("%Y-%m-%d %H:%M:%S"))
+
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_records:
+                self.flush()
+            elif self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """把缓冲写入文件，并在一次事务中更新索引"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+
+            entries = []
+            by_date = {}
+            for record in records:
+                date = datetime.fromtimestamp(record["ts"]).strftime("%Y-%m-%d")
+                by_date.setdefault(date, []).append(record)
+
+            for date, day_records in by_date.items():
+                entries.extend(self._append(date, day_records))
+
+            self._conn.executemany(
+                "INSERT INTO entries (ts, note_id, user_id, category, file, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                entries
+            )
+            self._conn.commit()
+
+    def _append(self, date, records):
+        """追加到当天的日志文件，超过大小上限时切换到下一个分片"""
+        entries = []
+        path = self._current_file(date)
+        handle = open(path, "ab")
+        try:
+            offset = handle.tell()
+            for record in records:
+                if offset >= self.max_file_bytes:
+                    handle.close()
+                    self._parts[date] += 1
+                    path = self._file_path(date, self._parts[date])
+                    handle = open(path, "ab")
+                    offset = handle.tell()
+
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                handle.write(line)
+                entries.append((record["ts"], record.get("note_id"), record.get("user_id"),
+                                record.get("category"), path.name, offset, len(line)))
+                offset += len(line)
+        finally:
+            handle.close()
+        return entries
+
+    def _file_path(self, date, part):
+        name = f"replies-{date}.jsonl" if part == 0 else f"replies-{date}.{part}.jsonl"
+        return self.log_dir / name
+
+    def _current_file(self, date):
+        """当天正在写入的文件（首次使用时找到已有的最后一个分片）"""
+        if date not in self._parts:
+            parts = [0]
+            for path in self.log_dir.glob(f"replies-{date}*.jsonl"):
+                match = LOG_FILE_PATTERN.match(path.name)
+                if match and match.group(1) == date:
+                    parts.append(int(match.group(2) or 0))
+            self._parts[date] = max(parts)
+        return self._file_path(date, self._parts[date])
+
+    def query(self, note_id=None, user_id=None, category=None, since=None, until=None, limit=100):
+        """
+        通过索引查询回复记录
+        :param note_id: 笔记ID
+        :param user_id: 用户ID
+        :param category: 评论类别
+        :param since: 起始时间（时间戳或 YYYY-MM-DD）
+        :param until: 截止时间（时间戳或 YYYY-MM-DD，包含当天）
+        :param limit: 最多返回条数，按时间倒序
+        :return: 记录列表
+        """
+        self.flush()
+
+        conditions = []
+        params = []
+        for column, value in (("note_id", note_id), ("user_id", user_id), ("category", category)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("ts >= ?")
+            params.append(_to_timestamp(since))
+        if until is not None:
+            conditions.append("ts < ?")
+            params.append(_to_timestamp(until, end_of_day=True))
+
+        sql = "SELECT file, offset, length FROM entries"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        records = []
+        handles = {}
+        try:
+            for row in rows:
+                handle = handles.get(row["file"])
+                if handle is None:
+                    handle = open(self.log_dir / row["file"], "rb")
+                    handles[row["file"]] = handle
+                handle.seek(row["offset"])
+                records.append(json.loads(handle.read(row["length"])))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return records
+
+    def rebuild_index(self):
+        """
+        扫描全部日志文件重建索引（索引损坏或缺失时使用）
+        :return: 索引条数
+        """
+        with self._lock:
+            self.flush()
+            entries = []
+            for path in sorted(self.log_dir.glob("replies-*.jsonl")):
+                if not LOG_FILE_PATTERN.match(path.name):
+                    continue
+                offset = 0
+                with open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            offset += len(line)
+                            continue
+                        entries.append((record.get("ts", 0), record.get("note_id"), record.get("user_id"),
+                                        record.get("category"), path.name, offset, len(line)))
+                        offset += len(line)
+
+            self._conn.execute("DELETE FROM entries")
+            self._conn.executemany(
+                "INSERT INTO entries (ts, note_id, user_id, category, file, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                entries
+            )
+            self._conn.commit()
+        return len(entries)
+
+    def close(self):
+        """写入缓冲并关闭索引"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def _to_timestamp(value, end_of_day=False):
+    """时间戳或 YYYY-MM-DD 转换为时间戳"""
+    if isinstance(value, (int, float)):
+        return value
+    timestamp = datetime.strptime(value, "%Y-%m-%d").timestamp()
+    return timestamp + 86400 if end_of_day else timestamp
+
+
+def main():
+    """命令行查询"""
+    parser = argparse.ArgumentParser(description="查询回复日志")
+    parser.add_argument("--log-dir", default="./logs/replies", help="日志目录")
+    parser.add_argument("--note", help="笔记ID")
+    parser.add_argument("--user", help="用户ID")
+    parser.add_argument("--category", help="评论类别")
+    parser.add_argument("--since", help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--until", help="截止日期 YYYY-MM-DD（包含当天）")
+    parser.add_argument("--limit", type=int, default=20, help="最多显示条数")
+    parser.add_argument("--rebuild-index", action="store_true", help="扫描日志文件重建索引")
+    args = parser.parse_args()
+
+    reply_log = ReplyLog(args.log_dir)
+    try:
+        if args.rebuild_index:
+            print(f"✅ 索引已重建: {reply_log.rebuild_index()} 条")
+            return
+
+        records = reply_log.query(
+            note_id=args.note,
+            user_id=args.user,
+            category=args.category,
+            since=args.since,
+            until=args.until,
+            limit=args.limit
+        )
+        for record in records:
+            print(f"[{record.get('time')}] 笔记:{record.get('note_id')} | 用户:{record.get('user_name')}"
+                  f" | 类别:{record.get('category')} | 评论:{(record.get('comment') or '')[:30]}"
+                  f" | 回复:{(record.get('reply') or '')[:30]}")
+        print(f"\n共 {len(records)} 条")
+    finally:
+        reply_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+回复发件箱模块
+监控线程只负责入队，后台线程按模拟真人的节奏发送回复
+待发送回复持久化在 SQLite 中，重启后继续发送，失败自动退避重试
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class ReplyOutbox:
+    def __init__(self, send_func, db_file="./data/outbox.db", on_sent=None, on_failed=None,
+                 reply_delay=5, reply_delay_jitter=3, daily_cap=20,
+                 max_attempts=5, retry_base_delay=30, reply_ttl_hours=24):
+        """
+        :param send_func: 发送函数 send_func(note_id, comment_id, content) -> 是否成功
+        :param db_file: SQLite 数据库文件
+        :param on_sent: 发送成功回调 on_sent(item)
+        :param on_failed: 最终失败回调 on_failed(item)
+        :param reply_delay: 同一账号两次回复的最小间隔（秒）
+        :param reply_delay_jitter: 间隔上额外随机增加的秒数
+        :param daily_cap: 每个账号每日回复上限
+        :param max_attempts: 最大尝试次数
+        :param retry_base_delay: 首次重试等待秒数，之后指数翻倍
+        :param reply_ttl_hours: 回复在队列中的最长等待时间，超时不再发送
+        """
+        self.send_func = send_func
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.reply_delay = reply_delay
+        self.reply_delay_jitter = reply_delay_jitter
+        self.daily_cap = daily_cap
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.reply_ttl = reply_ttl_hours * 3600
+
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                note_id TEXT NOT NULL,
+                comment_id TEXT NOT NULL UNIQUE,
+                content TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                last_error TEXT,
+                recorded INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        if "recorded" not in columns:
+            # 旧版数据库：已有记录都已在发送时写入客户跟踪
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN recorded INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE outbox SET recorded = 1")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, priority, next_attempt_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_sent ON outbox (account, status, sent_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_unrecorded ON outbox (recorded, status)"
+        )
+        self._conn.commit()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+        # 账号 -> 下次允许发送的时间
+        self._next_send_at = {}
+        # (账号, 日期) -> 当日已发送数量
+        self._sent_today = {}
+
+    def enqueue(self, note_id, comment, content, priority=1, account="default"):
+        """
+        加入待发送回复，立即返回
+        :param note_id: 笔记ID
+        :param comment: 评论数据
+        :param content: 回复内容
+        :param priority: 优先级，数值越小越先发送
+        :param account: 发送账号
+        :return: 是否新加入队列（同一评论只会入队一次）
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox "
+                "(account, priority, note_id, comment_id, content, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account, priority, note_id, comment.get("comment_id"), content,
+                 json.dumps(comment, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+        self._wakeup.set()
+        return cursor.rowcount > 0
+
+    def enqueue_many(self, items, account="default"):
+        """
+        批量加入待发送回复，一次事务完成
+        :param items: [(note_id, comment, content, priority), ...]
+        :param account: 发送账号
+        :return: 新加入队列的评论ID列表
+        """
+        now = time.time()
+        added = []
+        with self._lock:
+            for note_id, comment, content, priority in items:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO outbox "
+                    "(account, priority, note_id, comment_id, content, payload, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (account, priority, note_id, comment.get("comment_id"), content,
+                     json.dumps(comment, ensure_ascii=False), now, now)
+                )
+                if cursor.rowcount > 0:
+                    added.append(comment.get("comment_id"))
+            self._conn.commit()
+        if added:
+            self._wakeup.set()
+        return added
+
+    def sent_count(self, account=None):
+        """累计已发送数量"""
+        with self._lock:
+            if account is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'sent'").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status = 'sent' AND account = ?",
+                    (account,)
+                ).fetchone()
+        return row[0]
+
+    def unrecorded_sent(self, limit=1000):
+        """
+        已发送但还没写入客户跟踪的回复
+        :param limit: 最多返回条数
+        :return: 发件箱条目列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox WHERE recorded = 0 AND status = 'sent' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._row_to_item(row) for row in rows]
+
+    def mark_recorded(self, ids):
+        """
+        标记回复已写入客户跟踪
+        :param ids: 发件箱条目ID列表
+        """
+        with self._lock:
+            self._conn.executemany("UPDATE outbox SET recorded = 1 WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def pending_count(self, account=None):
+        """待发送数量"""
+        with self._lock:
+            if account is None:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND account = ?",
+                    (account,)
+                ).fetchone()
+        return row[0]
+
+    def oldest_pending_age(self, now=None):
+        """
+        最早一条待发送回复已等待的秒数（衡量发送延迟）
+        :return: 秒数，没有待发送回复时返回 0
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+        return max(0.0, now - oldest) if oldest is not None else 0.0
+
+    def sent_today(self, account="default"):
+        """账号今日已发送数量"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        key = (account, today)
+        if key not in self._sent_today:
+            day_start = datetime.strptime(today, "%Y-%m-%d").timestamp()
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE account = ? AND status = 'sent' AND sent_at >= ?",
+                    (account, day_start)
+                ).fetchone()
+            # 只保留当天的计数
+            self._sent_today = {k: v for k, v in self._sent_today.items() if k[1] == today}
+            self._sent_today[key] = row[0]
+        return self._sent_today[key]
+
+    def start(self):
+        """启动后台发送线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="xhs-reply-outbox", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=10):
+        """停止后台发送线程"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker:
+            self._worker.join(timeout=timeout)
+            self._worker = None
+
+    def close(self):
+        """停止发送并关闭数据库"""
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+    def _run(self):
+        """后台发送循环"""
+        while not self._stop.is_set():
+            try:
+                wait = self.process_next()
+            except Exception as e:
+                print(f"❌ 发件箱异常: {e}")
+                wait = self.retry_base_delay
+
+            if wait > 0:
+                self._wakeup.wait(timeout=wait)
+                self._wakeup.clear()
+
+    def process_next(self, now=None):
+        """
+        发送下一条到期回复
+        :return: 距离下一次可发送的秒数，0 表示可以立即继续
+        """
+        now = now if now is not None else time.time()
+        self._expire_stale(now)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY priority, id LIMIT 50",
+                (now,)
+            ).fetchall()
+            if not rows:
+                next_attempt_at = self._conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+                ).fetchone()[0]
+
+        if not rows:
+            if next_attempt_at is None:
+                return 60
+            return min(60, max(next_attempt_at - now, 0.1))
+
+        wait = 60
+        for row in rows:
+            account = row["account"]
+            ready_at = self._next_send_at.get(account, 0)
+
+            if self.daily_cap and self.sent_today(account) >= self.daily_cap:
+                # 今日额度用完，等到明天
+                ready_at = max(ready_at, self._tomorrow_start())
+
+            if ready_at > now:
+                wait = min(wait, ready_at - now)
+                continue
+
+            self._send(row, now)
+            return 0
+
+        return wait
+
+    def _send(self, row, now):
+        """发送一条回复并更新状态"""
+        account = row["account"]
+        item = self._row_to_item(row)
+
+        try:
+            success = self.send_func(row["note_id"], row["comment_id"], row["content"])
+            error = None if success else "发送失败"
+        except Exception as e:
+            success = False
+            error = str(e)
+
+        # 无论成功与否都按真人节奏隔开下一次发送
+        self._next_send_at[account] = time.time() + self.reply_delay + random.uniform(0, self.reply_delay_jitter)
+
+        attempts = row["attempts"] + 1
+        with self._lock:
+            if success:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ? WHERE id = ?",
+                    (attempts, time.time(), row["id"])
+                )
+            elif attempts >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, row["id"])
+                )
+            else:
+                backoff = self.retry_base_delay * (2 ** (attempts - 1)) * random.uniform(1.0, 1.5)
+                self._conn.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + backoff, error, row["id"])
+                )
+            self._conn.commit()
+
+        if success:
+            key = (account, datetime.now().strftime("%Y-%m-%d"))
+            self._sent_today[key] = self.sent_today(account) + 1
+            if self.on_sent:
+                self.on_sent(item)
+        elif attempts >= self.max_attempts:
+            print(f"❌ 回复多次失败，已放弃: {row['comment_id']} ({error})")
+            if self.on_failed:
+                self.on_failed(item)
+        else:
+            print(f"⚠️ 回复失败，第 {attempts} 次，稍后重试: {row['comment_id']} ({error})")
+
+    def _tomorrow_start(self):
+        """明天零点的时间戳"""
+        today = datetime.strptime(datetime.now().strftime("%Y-%m-%d"), "%Y-%m-%d")
+        return today.timestamp() + 86400
+
+    def _expire_stale(self, now):
+        """放弃排队过久的回复，避免隔天才回复旧评论（与最终发送失败一样调用 on_failed 归还额度）"""
+        if not self.reply_ttl:
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND created_at < ?",
+                (now - self.reply_ttl,)
+            ).fetchall()
+            if not rows:
+                return
+            self._conn.executemany(
+                "UPDATE outbox SET status = 'expired' WHERE id = ?",
+                [(row["id"],) for row in rows]
+            )
+            self._conn.commit()
+
+        print(f"⏭️ {len(rows)} 条回复排队超过 {self.reply_ttl / 3600:g} 小时，不再发送")
+        if self.on_failed:
+            for row in rows:
+                self.on_failed(self._row_to_item(row))
+
+    def _row_to_item(self, row):
+        """数据库行转换为回调参数"""
+        return {
+            "id": row["id"],
+            "account": row["account"],
+            "note_id": row["note_id"],
+            "comment_id": row["comment_id"],
+            "content": row["content"],
+            "comment": json.loads(row["payload"]),
+            "attempts": row["attempts"]
+        }
@@ -2,24 +2,79 @@
 智能回复策略模块
 根据评论内容和上下文选择合适的回复模板
 """
-import json
+import copy
 import random
-import jieba
-from pathlib import Path
+
+from intent_model import load_intent_model
+from keyword_matcher import KeywordMatcher
+from template_index import TemplateIndex
+
+
+# 转化关键词（匹配结果中的特殊类别）
+CONVERSION_CATEGORY = "_conversion"
+CONVERSION_KEYWORDS = ["想了解更多", "感兴趣", "咨询", "了解"]
+
+# 每个处理周期最多缓存的分类结果
+MAX_CYCLE_CACHE = 10000
+
+# 不超过此长度的评论只用关键词分类，不调用意图模型
+SHORT_COMMENT_LENGTH = 12
 
 
 class ReplyStrategy:
-    def __init__(self, template_file="./templates/reply_templates.json"):
-        self.template_file = Path(template_file)
-        self.templates = self._load_templates()
+    def __init__(self, template_file="./templates/reply_templates.json", conversion_keywords=None,
+                 intent_model=None, model_threshold=0.6, short_comment_length=SHORT_COMMENT_LENGTH,
+                 template_stats=None, recent_templates=3):
+        """
+        :param template_file: 回复模板文件（修改后在下一个处理周期开始时自动重新加载）
+        :param conversion_keywords: 转化关键词，默认使用 CONVERSION_KEYWORDS
+        :param intent_model: 意图模型（IntentModel），关键词未命中的长评论由模型分类
+        :param model_threshold: 模型置信度不低于此值时才采用模型类别
+        :param short_comment_length: 不超过此长度的评论只用关键词分类
+        :param template_stats: 模板效果统计文件，为 None 时不持久化
+        :param recent_templates: 每个用户避开最近使用的几个模板
+        """
+        self.template_index = TemplateIndex(template_file, stats_file=template_stats, recent_size=recent_templates)
+        self.conversion_keywords = conversion_keywords or CONVERSION_KEYWORDS
+        self.intent_model = intent_model
+        self.model_threshold = model_threshold
+        self.short_comment_length = short_comment_length
+        # 关键词自动机，按模板版本构建，各副本共享
+        self._shared = {}
         self._init_keywords()
+        self._init_matcher()
+        self._cycle_cache = {}
 
-    def _load_templates(self):
-        """加载回复模板"""
-        if not self.template_file.exists():
-            return {}
-        with open(self.template_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+    @classmethod
+    def from_config(cls, config):
+        """
+        按配置创建回复策略，strategy.sentiment_analysis 开启时加载意图模型
+        :param config: 完整配置字典
+        :return: ReplyStrategy
+        """
+        strategy_config = config.get("strategy", {})
+        intent_model = None
+        if strategy_config.get("sentiment_analysis", False):
+            intent_model = load_intent_model(strategy_config.get("intent_model", "./templates/intent_model.npz"))
+
+        return cls(
+            conversion_keywords=config.get("conversion", {}).get("cta_phrases"),
+            intent_model=intent_model,
+            model_threshold=strategy_config.get("model_threshold", 0.6),
+            short_comment_length=strategy_config.get("short_comment_length", SHORT_COMMENT_LENGTH),
+            template_stats=config.get("storage", {}).get("template_stats", "./data/template_stats.json"),
+            recent_templates=strategy_config.get("recent_templates", 3)
+        )
+
+    @property
+    def templates(self):
+        """当前加载的回复模板"""
+        return self.template_index.templates
+
+    @property
+    def matcher(self):
+        """当前模板版本的关键词自动机"""
+        return self._shared["matcher"]
 
     def _init_keywords(self):
         """初始化关键词映射"""
@@ -31,47 +86,144 @@ class ReplyStrategy:
             "greeting": ["你好", "哈喽", "Hi", "hello", "早上好", "晚上好"]
         }
 
-    def classify_comment(self, comment):
+    def _init_matcher(self):
         """
-        分类评论
+        用关键词表构建一次匹配自动机
+        模板文件中某个类别带有 keywords 字段时，追加到该类别的关键词中
+        """
+        keyword_table = {category: list(keywords) for category, keywords in self.keywords.items()}
+        for category, data in self.templates.items():
+            extra_keywords = data.get("keywords", []) if isinstance(data, dict) else []
+            if extra_keywords:
+                keyword_table.setdefault(category, []).extend(extra_keywords)
+        keyword_table[CONVERSION_CATEGORY] = list(self.conversion_keywords)
+
+        self._shared["matcher"] = KeywordMatcher(keyword_table)
+        self._shared["version"] = self.template_index.version
+
+    def fork(self, template_stats=None):
+        """
+        创建共享模板和匹配自动机、但有独立周期缓存和模板统计的副本（多账号共用一份只读数据）
+        :param template_stats: 副本的模板效果统计文件，为 None 时不持久化
+        :return: ReplyStrategy
+        """
+        strategy = copy.copy(self)
+        strategy.template_index = self.template_index.fork(template_stats)
+        strategy._cycle_cache = {}
+        return strategy
+
+    def begin_cycle(self):
+        """开始新的处理周期：检查模板是否修改、更新模板权重，清空上一轮的分类缓存"""
+        self.template_index.refresh()
+        if self._shared.get("version") != self.template_index.version:
+            self._init_matcher()
+        self._cycle_cache.clear()
+
+    def analyze_comment(self, comment):
+        """
+        一次扫描分析评论，结果在本处理周期内缓存
         :param comment: 评论内容
-        :return: 评论类别
+        :return: {"category": 主类别, "matches": {类别: [(位置, 关键词)]}, "conversion": 是否含转化关键词}
+        """
+        cached = self._cycle_cache.get(comment)
+        if cached is not None:
+            return cached
+
+        result = self._cache_analysis(comment, self.matcher.match(comment))
+        self._apply_intent_model([comment], [result])
+        return result
+
+    def analyze_many(self, comments, comment_ids=None):
         """
-        comment_lower = comment.lower()
-        words = list(jieba.cut(comment))
+        批量分析评论，未缓存的评论拼接后一次扫描完成，需要模型分类的评论一次批量打分
+        :param comments: 评论内容列表
+        :param comment_ids: 与 comments 对应的评论ID（模型打分按评论ID缓存）
+        :return: 与 comments 一一对应的分析结果
+        """
+        ids = dict(zip(comments, comment_ids or []))
+        pending = list(dict.fromkeys(c for c in comments if c not in self._cycle_cache))
+        if pending:
+            results = [
+                self._cache_analysis(comment, matches)
+                for comment, matches in zip(pending, self.matcher.match_many(pending))
+            ]
+            self._apply_intent_model(pending, results, [ids.get(c) for c in pending])
+        return [self._cycle_cache.get(c) or self.analyze_comment(c) for c in comments]
+
+    def _apply_intent_model(self, comments, results, comment_ids=None):
+        """
+        关键词未命中的长评论交给意图模型，置信度足够时替换默认类别
+        :param comments: 评论内容列表
+        :param results: 对应的关键词分析结果（原地更新）
+        :param comment_ids: 对应的评论ID
+        """
+        if self.intent_model is None:
+            return
+        comment_ids = comment_ids or [None] * len(comments)
+        indexes = [
+            index for index, (comment, result) in enumerate(zip(comments, results))
+            if result["category"] == "default" and len(comment) > self.short_comment_length
+        ]
+        if not indexes:
+            return
+
+        predictions = self.intent_model.predict_many(
+            [comments[index] for index in indexes],
+            [comment_ids[index] for index in indexes]
+        )
+        for index, (label, confidence) in zip(indexes, predictions):
+            results[index]["intent"] = (label, confidence)
+            if confidence >= self.model_threshold and label in self.templates:
+                results[index]["category"] = label
+
+    def _cache_analysis(self, comment, matches):
+        """根据匹配结果确定主类别，并写入周期缓存"""
+        conversion = CONVERSION_CATEGORY in matches
+        matches.pop(CONVERSION_CATEGORY, None)
 
-        # 检查关键词
-        for category, keywords in self.keywords.items():
-            for keyword in keywords:
-                if keyword.lower() in comment_lower:
-                    return category
+        if matches:
+            # 按关键词表顺序取优先级最高的类别
+            category = next(iter(matches))
+        elif comment.count('?') + comment.count('？') >= 2:
+            # 如果包含多个问号，归类为问题
+            category = "question"
+        else:
+            # 默认返回default
+            category = "default"
 
-        # 如果包含多个问号，归类为问题
-        if comment.count('?') + comment.count('？') >= 2:
-            return "question"
+        result = {"category": category, "matches": matches, "conversion": conversion}
+        if len(self._cycle_cache) >= MAX_CYCLE_CACHE:
+            self._cycle_cache.clear()
+        self._cycle_cache[comment] = result
+        return result
 
-        # 默认返回default
-        return "default"
+    def classify_comment(self, comment):
+        """
+        分类评论
+        :param comment: 评论内容
+        :return: 评论类别
+        """
+        return self.analyze_comment(comment)["category"]
 
-    def select_reply(self, comment, user_history=None):
+    def select_reply(self, comment, user_history=None, user_id=None):
         """
         根据评论选择合适的回复
         :param comment: 评论内容
         :param user_history: 用户历史记录（用于个性化回复）
+        :param user_id: 用户ID（避开该用户最近收到过的模板）
         :return: 选中的回复文本
         """
-        category = self.classify_comment(comment)
-
-        # 获取该类别的模板
-        templates = self.templates.get(category, self.templates.get("default", {}))
+        return self._select_template(comment, user_history, user_id)[0]
 
-        if not templates:
-            return "感谢评论！欢迎私信交流~"
-
-        # 随机选择一个模板
-        replies = templates.get("templates", [])
-        if not replies:
-            return "感谢评论！欢迎私信交流~"
+    def _select_template(self, comment, user_history, user_id):
+        """
+        按模板权重加权抽取回复，该类别没有模板时使用 default
+        :return: (回复文本, 模板文本)，没有可用模板时模板文本为 None
+        """
+        category = self.classify_comment(comment)
+        template = self.template_index.choose(category, user_id)
+        if template is None:
+            return "感谢评论！欢迎私信交流~", None
 
         # 简单个性化：根据用户历史记录添加前缀
         prefix = ""
@@ -79,8 +231,7 @@ class ReplyStrategy:
             if user_history.get("interaction_count", 0) > 3:
                 prefix = f"老朋友，"
 
-        reply = random.choice(replies)
-        return prefix + reply
+        return prefix + template, template
 
     def should_follow_up(self, comment, user_history=None):
         """
@@ -89,16 +240,15 @@ class ReplyStrategy:
         :param user_history: 用户历史记录
         :return: 是否需要引导转化
         """
+        analysis = self.analyze_comment(comment)
+
         # 检查是否包含转化关键词
-        conversion_keywords = ["想了解更多", "感兴趣", "咨询", "了解"]
-        for keyword in conversion_keywords:
-            if keyword in comment:
-                return True
+        if analysis["conversion"]:
+            return True
 
         # 如果是首次互动且有疑问，引导私信
         if user_history and user_history.get("interaction_count", 0) == 0:
-            category = self.classify_comment(comment)
-            if category in ["question", "price", "product"]:
+            if analysis["category"] in ["question", "price", "product"]:
                 return True
 
         return False
@@ -117,17 +267,28 @@ class ReplyStrategy:
         ]
         return random.choice(messages)
 
-    def get_reply_with_conversion(self, comment, user_history=None):
+    def get_reply_with_conversion(self, comment, user_history=None, user_id=None):
         """
         获取包含转化引导的完整回复
         :param comment: 评论内容
         :param user_history: 用户历史记录
+        :param user_id: 用户ID
         :return: 完整回复文本
         """
-        base_reply = self.select_reply(comment, user_history)
+        return self.compose_reply(comment, user_history, user_id)[0]
+
+    def compose_reply(self, comment, user_history=None, user_id=None):
+        """
+        生成完整回复，同时返回选用的模板（发送后用于统计模板效果）
+        :param comment: 评论内容
+        :param user_history: 用户历史记录
+        :param user_id: 用户ID
+        :return: (完整回复文本, 模板文本)
+        """
+        base_reply, template = self._select_template(comment, user_history, user_id)
 
         if self.should_follow_up(comment, user_history):
             conversion_msg = self.get_conversion_message()
-            return f"{base_reply}\n{conversion_msg}"
+            return f"{base_reply}\n{conversion_msg}", template
 
-        return base_reply
+        return base_reply, template
@@ -0,0 +1,185 @@
+"""
+自适应轮询调度模块
+按每个笔记的评论到达速度决定下次检查时间：热门笔记频繁检查，冷门笔记逐步退避
+"""
+import heapq
+import time
+from collections import deque
+
+
+class NoteSchedule:
+    __slots__ = ("note_id", "interval", "next_due", "last_poll", "rate", "polls", "comments")
+
+    def __init__(self, note_id, interval, next_due):
+        self.note_id = note_id
+        self.interval = interval
+        self.next_due = next_due
+        self.last_poll = None
+        # 评论到达速度（条/秒，指数滑动平均）
+        self.rate = 0.0
+        self.polls = 0
+        self.comments = 0
+
+
+class AdaptiveScheduler:
+    def __init__(self, note_ids, base_interval=300, min_interval=30, max_interval=3600,
+                 target_comments_per_poll=1.0, backoff_factor=1.5, smoothing=0.3):
+        """
+        :param note_ids: 笔记ID列表
+        :param base_interval: 初始检查间隔（秒）
+        :param min_interval: 最短检查间隔（秒）
+        :param max_interval: 最长检查间隔（秒）
+        :param target_comments_per_poll: 期望每次检查发现的新评论数
+        :param backoff_factor: 没有新评论时间隔的放大倍数
+        :param smoothing: 到达速度的滑动平均系数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = self._clamp(base_interval)
+        self.target_comments_per_poll = target_comments_per_poll
+        self.backoff_factor = backoff_factor
+        self.smoothing = smoothing
+
+        self.notes = {}
+        self._heap = []
+        now = time.time()
+        for note_id in note_ids:
+            self.add_note(note_id, now=now)
+
+        # 统计
+        self.started_at = now
+        self.total_polls = 0
+        self.total_requests = 0
+        self.total_comments = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.recent_latencies = deque(maxlen=1000)
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def add_note(self, note_id, now=None):
+        """
+        加入新笔记，立即参与下一轮检查
+        :param note_id: 笔记ID
+        """
+        if note_id in self.notes:
+            return
+        now = now if now is not None else time.time()
+        schedule = NoteSchedule(note_id, self.base_interval, now)
+        self.notes[note_id] = schedule
+        heapq.heappush(self._heap, (schedule.next_due, note_id))
+
+    def pop_due(self, now=None):
+        """
+        取出所有已到检查时间的笔记
+        :return: 笔记ID列表
+        """
+        now = now if now is not None else time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_due, note_id = heapq.heappop(self._heap)
+            schedule = self.notes.get(note_id)
+            # 跳过已被重新调度的旧条目
+            if schedule is None or schedule.next_due != next_due:
+                continue
+            due.append(note_id)
+        return due
+
+    def seconds_until_next(self, now=None):
+        """距离下一个笔记到期的秒数"""
+        if not self._heap:
+            return self.base_interval
+        now = now if now is not None else time.time()
+        return max(0.0, self._heap[0][0] - now)
+
+    def record_poll(self, note_id, new_comments, now=None):
+        """
+        记录一次检查结果并安排下次检查
+        :param note_id: 笔记ID
+        :param new_comments: 本次发现的新评论列表
+        :return: 新的检查间隔（秒）
+        """
+        now = now if now is not None else time.time()
+        schedule = self.notes[note_id]
+        count = len(new_comments)
+
+        if schedule.last_poll is not None:
+            elapsed = max(1.0, now - schedule.last_poll)
+            observed = count / elapsed
+            schedule.rate = self.smoothing * observed + (1 - self.smoothing) * schedule.rate
+        elif count:
+            schedule.rate = count / schedule.interval
+
+        if count and schedule.rate > 0:
+            # 有新评论：按到达速度收紧间隔
+            schedule.interval = self._clamp(self.target_comments_per_poll / schedule.rate)
+        else:
+            # 没有新评论：指数退避
+            schedule.interval = self._clamp(schedule.interval * self.backoff_factor)
+
+        schedule.last_poll = now
+        schedule.polls += 1
+        schedule.comments += count
+        schedule.next_due = now + schedule.interval
+        heapq.heappush(self._heap, (schedule.next_due, note_id))
+
+        self.total_polls += 1
+        self.total_comments += count
+        for comment in new_comments:
+            self._record_latency(comment, now)
+
+        return schedule.interval
+
+    def record_requests(self, count):
+        """累计实际发出的请求数（翻页、子评论页都会计入）"""
+        self.total_requests += count
+
+    def _record_latency(self, comment, now):
+        """记录评论从发布到被发现的延迟"""
+        create_time = comment.get("create_time")
+        if not create_time:
+            return
+        # 小红书接口返回毫秒时间戳
+        if create_time > 1e12:
+            create_time = create_time / 1000
+        latency = now - create_time
+        if latency < 0:
+            return
+        self.latency_sum += latency
+        self.latency_count += 1
+        self.recent_latencies.append(latency)
+
+    def stats(self, now=None):
+        """
+        调度统计：请求花费与发现延迟
+        :return: 统计字典
+        """
+        now = now if now is not None else time.time()
+        hours = max((now - self.started_at) / 3600, 1e-9)
+        intervals = sorted(schedule.interval for schedule in self.notes.values())
+        recent = sorted(self.recent_latencies)
+
+        def percentile(values, ratio):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(len(values) * ratio))], 1)
+
+        return {
+            "notes": len(self.notes),
+            "total_polls": self.total_polls,
+            "total_requests": self.total_requests,
+            "total_comments": self.total_comments,
+            "requests_per_hour": round(self.total_requests / hours, 1),
+            "requests_per_comment": round(self.total_requests / self.total_comments, 2)
+            if self.total_comments else None,
+            "avg_detection_latency": round(self.latency_sum / self.latency_count, 1)
+            if self.latency_count else None,
+            "p50_detection_latency": percentile(recent, 0.5),
+            "p90_detection_latency": percentile(recent, 0.9),
+            "min_interval": intervals[0] if intervals else None,
+            "median_interval": percentile(intervals, 0.5),
+            "max_interval": intervals[-1] if intervals else None,
+            "hot_notes": sum(1 for value in intervals if value <= self.min_interval),
+            "dormant_notes": sum(1 for value in intervals if value >= self.max_interval)
+        }
@@ -0,0 +1,288 @@
+"""
+回复模板索引
+模板文件只加载一次，文件修改时间变化时在处理周期开始时重新加载
+每个模板按互动效果（回复后用户是否再次互动）学习权重，用别名表 O(1) 加权抽样
+每个用户记录最近使用的模板，抽样时避开，避免连续发送相同回复
+"""
+import copy
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+
+# 模板权重的先验（相当于每个模板预先有 1 次互动、1 次无互动）
+PRIOR_ENGAGED = 1.0
+PRIOR_IGNORED = 1.0
+
+# 权重下限（相对最大权重），效果差的模板仍保留少量曝光
+MIN_WEIGHT_RATIO = 0.05
+
+# 回复后多久内用户再次评论算作互动（秒）
+ENGAGEMENT_WINDOW = 72 * 3600
+
+# 最多记录多少个用户的最近模板
+MAX_TRACKED_USERS = 100000
+
+# 抽到最近用过的模板时的重抽次数
+MAX_RESAMPLE = 8
+
+
+class AliasTable:
+    def __init__(self, weights, rng=random):
+        """
+        Vose 别名表，构建 O(n)，抽样 O(1)
+        :param weights: 非负权重列表
+        :param rng: 随机数生成器
+        """
+        self.rng = rng
+        count = len(weights)
+        total = float(sum(weights))
+        scaled = [w * count / total for w in weights] if total > 0 else [1.0] * count
+
+        self.prob = [0.0] * count
+        self.alias = [0] * count
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        for index in small + large:
+            self.prob[index] = 1.0
+
+    def sample(self):
+        """抽取一个下标"""
+        column = self.rng.randrange(len(self.prob))
+        return column if self.rng.random() < self.prob[column] else self.alias[column]
+
+
+class TemplateIndex:
+    def __init__(self, template_file="./templates/reply_templates.json", stats_file=None,
+                 recent_size=3, engagement_window=ENGAGEMENT_WINDOW, clock=time.time, rng=random):
+        """
+        :param template_file: 回复模板文件
+        :param stats_file: 模板效果统计文件（JSON），为 None 时不持久化
+        :param recent_size: 每个用户避开最近使用的几个模板
+        :param engagement_window: 回复后多久内用户再次评论算作互动（秒）
+        :param clock: 时钟函数
+        :param rng: 随机数生成器
+        """
+        self.template_file = Path(template_file)
+        self.stats_file = Path(stats_file) if stats_file else None
+        self.recent_size = recent_size
+        self.engagement_window = engagement_window
+        self.clock = clock
+        self.rng = rng
+
+        self._lock = threading.Lock()
+        self.templates = {}
+        self.version = 0
+        # 已加载的模板文件内容，fork() 出的副本共用，文件修改后只读取一次
+        self._source = {"templates": {}, "mtime": None, "version": 0, "lock": threading.Lock()}
+        # 类别 -> (模板列表, 别名表)
+        self._tables = {}
+        self._dirty_categories = set()
+        # 类别 -> {模板文本: [发送次数, 互动次数]}
+        self._stats = self._load_stats()
+        self._stats_dirty = False
+        # 用户ID -> 最近选用的模板文本
+        self._recent = OrderedDict()
+        # 用户ID -> (类别, 模板文本, 发送时间)，等待用户再次互动
+        self._awaiting = OrderedDict()
+
+        self.reload_if_changed()
+
+    def _load_stats(self):
+        """加载模板效果统计"""
+        if not self.stats_file or not self.stats_file.exists():
+            return {}
+        with open(self.stats_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def fork(self, stats_file=None):
+        """
+        创建共享已加载模板、但有独立效果统计、别名表和用户最近模板的副本（多账号各自学习权重）
+        :param stats_file: 副本的模板效果统计文件，为 None 时不持久化
+        :return: TemplateIndex
+        """
+        with self._lock:
+            index = copy.copy(self)
+        index.stats_file = Path(stats_file) if stats_file else None
+        index._lock = threading.Lock()
+        index._stats = index._load_stats()
+        index._stats_dirty = False
+        index._dirty_categories = set()
+        index._recent = OrderedDict()
+        index._awaiting = OrderedDict()
+        index._tables = {}
+        for category in index.templates:
+            index._build_table(category)
+        return index
+
+    def reload_if_changed(self):
+        """
+        模板文件修改时间变化时重新加载并重建全部别名表
+        :return: 是否重新加载
+        """
+        try:
+            mtime = self.template_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        source = self._source
+        with source["lock"]:
+            if mtime != source["mtime"] or not source["version"]:
+                templates = {}
+                if mtime is not None:
+                    with open(self.template_file, 'r', encoding='utf-8') as f:
+                        templates = json.load(f)
+                source.update(templates=templates, mtime=mtime, version=source["version"] + 1)
+            templates, version = source["templates"], source["version"]
+
+        with self._lock:
+            if version == self.version:
+                return False
+            self.templates = templates
+            self._tables = {}
+            for category in templates:
+                self._build_table(category)
+            self._dirty_categories.clear()
+            self.version = version
+        return True
+
+    def _weight(self, category, template):
+        """模板权重：平滑后的互动率"""
+        sent, engaged = self._stats.get(category, {}).get(template, (0, 0))
+        return (engaged + PRIOR_ENGAGED) / (sent + PRIOR_ENGAGED + PRIOR_IGNORED)
+
+    def _build_table(self, category):
+        """重建某个类别的别名表"""
+        data = self.templates.get(category)
+        replies = data.get("templates", []) if isinstance(data, dict) else []
+        if not replies:
+            self._tables.pop(category, None)
+            return
+        weights = [self._weight(category, template) for template in replies]
+        floor = max(weights) * MIN_WEIGHT_RATIO
+        self._tables[category] = (replies, AliasTable([max(w, floor) for w in weights], self.rng))
+
+    def refresh(self):
+        """
+        处理周期开始时调用：检查模板文件是否修改，重建权重变化的别名表，保存统计
+        :return: 模板是否重新加载
+        """
+        reloaded = self.reload_if_changed()
+        with self._lock:
+            for category in self._dirty_categories:
+                self._build_table(category)
+            self._dirty_categories.clear()
+        self.save_stats()
+        return reloaded
+
+    def has_category(self, category):
+        """类别是否有可用模板"""
+        return category in self._tables
+
+    def choose(self, category, user_id=None):
+        """
+        加权抽取一个模板，避开该用户最近使用过的模板
+        :param category: 评论类别，没有模板时使用 default
+        :param user_id: 用户ID
+        :return: 模板文本，没有可用模板时返回 None
+        """
+        with self._lock:
+            table = self._tables.get(category) or self._tables.get("default")
+            if table is None:
+                return None
+            replies, alias = table
+
+            recent = self._recent.get(user_id, ()) if user_id is not None else ()
+            template = replies[alias.sample()]
+            attempts = 0
+            while template in recent and attempts < MAX_RESAMPLE:
+                template = replies[alias.sample()]
+                attempts += 1
+            if template in recent:
+                # 重抽仍然重复时，取第一个最近没用过的模板
+                template = next((reply for reply in replies if reply not in recent), template)
+
+            if user_id is not None:
+                history = self._recent.get(user_id)
+                if history is None:
+                    history = self._recent[user_id] = deque(maxlen=self.recent_size)
+                else:
+                    self._recent.move_to_end(user_id)
+                history.append(template)
+                if len(self._recent) > MAX_TRACKED_USERS:
+                    self._recent.popitem(last=False)
+            return template
+
+    def record_sent(self, category, template, user_id, sent_at=None):
+        """
+        记录模板已发送给用户
+        :param category: 评论类别
+        :param template: 模板文本
+        :param user_id: 用户ID
+        :param sent_at: 发送时间
+        """
+        if not template:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(category, {}).setdefault(template, [0, 0])
+            stats[0] += 1
+            self._dirty_categories.add(category)
+            self._stats_dirty = True
+            if user_id is not None:
+                self._awaiting[user_id] = (category, template, sent_at if sent_at is not None else self.clock())
+                self._awaiting.move_to_end(user_id)
+                if len(self._awaiting) > MAX_TRACKED_USERS:
+                    self._awaiting.popitem(last=False)
+
+    def record_engagement(self, user_id, now=None):
+        """
+        用户再次评论时调用：在互动窗口内则计入上次发送模板的互动次数
+        :param user_id: 用户ID
+        :param now: 当前时间
+        :return: 是否计入
+        """
+        with self._lock:
+            pending = self._awaiting.pop(user_id, None)
+            if pending is None:
+                return False
+            category, template, sent_at = pending
+            if (now if now is not None else self.clock()) - sent_at > self.engagement_window:
+                return False
+            self._stats.setdefault(category, {}).setdefault(template, [0, 0])[1] += 1
+            self._dirty_categories.add(category)
+            self._stats_dirty = True
+        return True
+
+    def weights(self, category):
+        """
+        某个类别各模板当前的权重
+        :return: {模板文本: 权重}
+        """
+        with self._lock:
+            data = self.templates.get(category)
+            replies = data.get("templates", []) if isinstance(data, dict) else []
+            return {template: round(self._weight(category, template), 4) for template in replies}
+
+    def save_stats(self):
+        """统计有变化时写入文件（先写临时文件再替换）"""
+        if not self.stats_file:
+            return
+        with self._lock:
+            if not self._stats_dirty:
+                return
+            self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.stats_file.with_name(self.stats_file.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_file)
+            self._stats_dirty = False
@@ -9,8 +9,23 @@ from pathlib import Path
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
+from auto_reply import AutoReplySystem
 from reply_strategy import ReplyStrategy
 from customer_tracker import CustomerTracker
+from dedup_store import DedupStore
+import intent_model
+from ingest import CommentQueue, PushServer, push_comments
+import load_harness
+from monitor import XHSMonitor
+from multi_account import STORAGE_DEFAULTS, MultiAccountRunner
+from poller import ConcurrentPoller
+from rate_limit import TokenBucket
+from reply_budget import ReplyBudget
+from reply_log import ReplyLog
+from reply_outbox import ReplyOutbox
+from scheduler import AdaptiveScheduler
+from template_index import AliasTable, TemplateIndex
+from xhs_client import LatencyHistogram, XHSClient
 
 
 def test_reply_strategy():
@@ -37,6 +52,29 @@ def test_reply_strategy():
         reply = strategy.select_reply(comment)
         print(f"  评论: {comment:20} | 类别: {category:10} | 回复: {reply[:40]}...")
 
+    # 一次扫描返回所有类别及位置
+    analysis = strategy.analyze_comment("你好，这个产品多少钱？想了解更多")
+    assert analysis["category"] == "price"
+    assert list(analysis["matches"]) == ["price", "product", "praise", "greeting"]
+    assert analysis["matches"]["greeting"] == [(0, "你好")]
+    assert analysis["conversion"]
+    assert strategy.analyze_comment("你好，这个产品多少钱？想了解更多") is analysis
+    strategy.begin_cycle()
+    assert strategy.analyze_comment("你好，这个产品多少钱？想了解更多") is not analysis
+    assert strategy.classify_comment("Hello 呀") == "greeting"
+    assert strategy.classify_comment("真的假的??") == "question"
+    print(f"\n🔎 多类别匹配: {analysis['matches']}")
+
+    # 批量分析与逐条分析结果一致
+    strategy.begin_cycle()
+    batch = strategy.analyze_many(test_comments + ["你好，这个产品多少钱？想了解更多"])
+    assert [a["category"] for a in batch[:-1]] == [strategy.classify_comment(c) for c in test_comments]
+    assert batch[-1]["matches"] == analysis["matches"] and batch[-1]["conversion"]
+
+    # 转小写会改变长度的字符（'İ' → 2 个码位）不能让匹配错位到其他评论
+    tricky = ["İİİİ多", "少钱吗", "多少钱"]
+    assert strategy.matcher.match_many(tricky) == [strategy.matcher.match(text) for text in tricky]
+
     # 测试转化引导
     print("\n🎯 转化引导测试:")
     conversion_test = ["我想了解更多", "这个产品如何购买？", "不错"]
@@ -99,18 +137,1002 @@ def test_customer_tracker():
     print(f"  新客户: {len(new_customers)}")
     print(f"  活跃客户: {len(active_customers)}")
 
+    # 状态索引与全表扫描结果一致
+    for _ in range(3):
+        tracker.record_interaction("user_001", "张三", "note_003", "还有吗", "有的")
+    for status in ["new", "contacted", "active", "vip"]:
+        expected = {uid for uid, c in tracker.get_all_customers().items() if c["status"] == status}
+        assert set(tracker.get_customers_by_status(status)) == expected
+    assert tracker.count_by_status("vip") == 1
+    print(f"  VIP客户: {tracker.count_by_status('vip')}")
+
     # 测试统计
     print("\n📊 统计摘要测试:")
     summary = tracker.export_summary()
     for key, value in summary.items():
         print(f"  {key}: {value}")
 
+    # 互动记录在访问 notes 时才从数据库读取
+    history = tracker.get_user_history("user_001")
+    assert dict.get(history, "notes") is None
+    assert [n["note_id"] for n in history["notes"]] == ["note_001", "note_002", "note_003", "note_003", "note_003"]
+    assert tracker.get_user_history("unknown") is None
+
+    # 导出 JSON 并从 JSON 迁移到新的数据库
+    export_file = tracker.export_json()
+    migrated = CustomerTracker(db_file=export_file, store_file="./data/test_customers_migrated.db", cache_size=1)
+    assert migrated.get_all_customers() == tracker.get_all_customers()
+    print(f"\n📦 导出并迁移客户: {len(migrated.get_all_customers())}")
+
+    # 缓存容量有限：被淘汰的客户从数据库重新加载，统计不受影响
+    migrated.record_interaction("user_002", "李四", "note_004", "好的", "谢谢")
+    migrated.record_interactions([
+        {"user_id": "user_003", "user_name": "王五", "note_id": "note_004", "comment": "在吗", "reply": "在的"},
+        {"user_id": "user_003", "user_name": "王五", "note_id": "note_004", "comment": "多少钱", "reply": "私信"},
+        {"user_id": "user_002", "user_name": "李四", "note_id": "note_004", "comment": "收到", "reply": "好的"}
+    ])
+    assert migrated.cached_count() == 1
+    assert migrated.get_user_history("user_001")["interaction_count"] == 5
+    assert migrated.get_user_history("user_002")["interaction_count"] == 3
+    assert migrated.get_user_history("user_003")["interaction_count"] == 2
+    assert migrated.export_summary()["total_customers"] == 3
+    assert migrated.count_by_status("active") == 1
+    print(f"  缓存上限 1 时客户统计: {migrated.export_summary()}")
+
     # 清理测试数据
-    Path(test_db).unlink(missing_ok=True)
+    tracker.close()
+    migrated.close()
+    for path in [test_db, "./data/test_customers.db", "./data/test_customers_migrated.db"]:
+        for suffix in ["", "-wal", "-shm"]:
+            Path(path + suffix).unlink(missing_ok=True)
 
     print("\n✅ 客户跟踪模块测试通过")
 
 
+def test_concurrent_poller():
+    """测试并发轮询模块"""
+    print("\n" + "=" * 60)
+    print("测试并发轮询模块")
+    print("=" * 60)
+
+    import threading
+    import time
+
+    class FakeMonitor(XHSMonitor):
+        def __init__(self):
+            super().__init__(config_file="./not_exists.json")
+            self.active = 0
+            self.peak = 0
+            self._lock = threading.Lock()
+
+        def check_new_comments(self, note_id):
+            with self._lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.05)
+            with self._lock:
+                self.active -= 1
+            return [{"comment_id": f"{note_id}_c1", "content": "你好"}]
+
+    monitor = FakeMonitor()
+    poller = ConcurrentPoller(monitor, max_workers=4)
+    received = []
+
+    start = time.time()
+    results = poller.poll_once([f"note_{i}" for i in range(12)],
+                               callback=lambda note_id, comment: received.append((note_id, comment)))
+    elapsed = time.time() - start
+    poller.shutdown()
+
+    assert len(results) == 12
+    assert len(received) == 12
+    assert all(comment["comment_id"] == f"{note_id}_c1" for note_id, comment in received)
+    assert monitor.peak <= 4
+    print(f"\n  12 个笔记耗时: {elapsed:.2f}s | 最大并发: {monitor.peak}")
+
+    # 单条评论回调异常不影响同一轮的其他评论
+    def flaky_callback(note_id, comment):
+        if note_id == "note_0":
+            raise RuntimeError("回调失败")
+        received.append((note_id, comment))
+
+    received.clear()
+    poller = ConcurrentPoller(monitor, max_workers=4)
+    poller.poll_once([f"note_{i}" for i in range(4)], callback=flaky_callback)
+    poller.shutdown()
+    assert sorted(note_id for note_id, _ in received) == ["note_1", "note_2", "note_3"]
+
+    # 令牌桶限速
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    print("  令牌桶突发上限: 2")
+
+    print("\n✅ 并发轮询模块测试通过")
+
+
+def test_dedup_store():
+    """测试评论去重存储"""
+    print("\n" + "=" * 60)
+    print("测试评论去重存储")
+    print("=" * 60)
+
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "processed.db"
+
+        store = DedupStore(db_file=db_file, max_per_note=3, ttl_days=30)
+        store.add_many("note_001", ["c1", "c2", "c3"])
+        store.add("note_002", "c9")
+        assert "c1" in store and "c9" in store
+        assert "c_missing" not in store
+
+        # 超过单笔记上限时淘汰最早的记录
+        store.add_many("note_001", ["c4"])
+        assert "c1" not in store
+        assert "c4" in store
+        store.close()
+
+        # 重启后仍能识别已处理评论
+        reloaded = DedupStore(db_file=db_file, max_per_note=3, ttl_days=30)
+        assert len(reloaded) == 4
+        assert "c2" in reloaded and "c9" in reloaded and "c1" not in reloaded
+        print(f"\n  重启后加载: {len(reloaded)} 条")
+
+        # 过期淘汰
+        reloaded.ttl_seconds = -1
+        evicted = reloaded.evict_expired()
+        assert evicted == 4 and len(reloaded) == 0
+        print(f"  过期淘汰: {evicted} 条")
+        reloaded.close()
+
+    print("\n✅ 评论去重存储测试通过")
+
+
+def test_incremental_fetch():
+    """测试游标增量拉取评论"""
+    print("\n" + "=" * 60)
+    print("测试游标增量拉取评论")
+    print("=" * 60)
+
+    import tempfile
+
+    def make_comment(index, **extra):
+        comment = {
+            "id": f"c{index}",
+            "user": {"user_id": f"u{index}", "nickname": f"用户{index}"},
+            "content": f"评论{index}",
+            "create_time": 1000 + index
+        }
+        comment.update(extra)
+        return comment
+
+    class FakeMonitor(XHSMonitor):
+        def __init__(self, config_file):
+            super().__init__(config_file=config_file)
+            # 按时间倒序的评论，每页 5 条
+            self.comments = [make_comment(i) for i in range(12, 0, -1)]
+            self.page_requests = 0
+            self.sub_page_requests = 0
+
+        def get_comment_page(self, note_id, cursor=""):
+            self.page_requests += 1
+            start = int(cursor or 0)
+            page = self.comments[start:start + 5]
+            has_more = start + 5 < len(self.comments)
+            return page, str(start + 5) if has_more else "", has_more
+
+        def get_sub_comment_page(self, note_id, root_comment_id, cursor="", num=10):
+            self.sub_page_requests += 1
+            return [make_comment(100, id="s100")], "", False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = Path(tmp_dir) / "config.json"
+        config_file.write_text(json.dumps({
+            "storage": {"dedup_db": str(Path(tmp_dir) / "processed.db")}
+        }), encoding="utf-8")
+
+        monitor = FakeMonitor(config_file)
+
+        # 首次检查翻完所有页
+        first = monitor.check_new_comments("note_001")
+        assert len(first) == 12
+        assert monitor.page_requests == 3
+        assert monitor.processed_comments.get_watermark("note_001") == 1012
+
+        # 无新评论时只请求首页
+        monitor.page_requests = 0
+        assert monitor.check_new_comments("note_001") == []
+        assert monitor.page_requests == 1
+
+        # 新增 2 条评论，其中一条带有更多子评论
+        monitor.comments.insert(0, make_comment(13))
+        monitor.comments.insert(0, make_comment(
+            14,
+            sub_comments=[make_comment(99, id="s99")],
+            sub_comment_count=2,
+            sub_comment_has_more=True,
+            sub_comment_cursor="s99"
+        ))
+        monitor.page_requests = 0
+        new_comments = monitor.check_new_comments("note_001")
+        ids = [comment["comment_id"] for comment in new_comments]
+        assert ids == ["c14", "c13", "s99", "s100"]
+        assert new_comments[2]["is_sub_comment"]
+        assert monitor.page_requests == 1
+        assert monitor.sub_page_requests == 1
+
+        # 子评论数未变化时不再翻子评论页
+        monitor.check_new_comments("note_001")
+        assert monitor.sub_page_requests == 1
+        print(f"\n  新增评论: {ids} | 首页请求: {monitor.page_requests}")
+        monitor.processed_comments.close()
+
+    print("\n✅ 游标增量拉取测试通过")
+
+
+def test_adaptive_scheduler():
+    """测试自适应轮询调度"""
+    print("\n" + "=" * 60)
+    print("测试自适应轮询调度")
+    print("=" * 60)
+
+    now = 1_700_000_000.0
+    scheduler = AdaptiveScheduler(["hot", "cold"], base_interval=300,
+                                  min_interval=30, max_interval=3600)
+    scheduler.started_at = now
+    for schedule in scheduler.notes.values():
+        schedule.next_due = now
+    scheduler._heap = [(now, note_id) for note_id in scheduler.notes]
+
+    assert sorted(scheduler.pop_due(now)) == ["cold", "hot"]
+    assert scheduler.pop_due(now) == []
+
+    # 热门笔记持续有评论，冷门笔记一直没有
+    for step in range(1, 20):
+        current = now + step * 300
+        hot_comments = [{"create_time": int((current - 10) * 1000)} for _ in range(5)]
+        scheduler.record_poll("hot", hot_comments, now=current)
+        scheduler.record_poll("cold", [], now=current)
+
+    hot_interval = scheduler.notes["hot"].interval
+    cold_interval = scheduler.notes["cold"].interval
+    assert hot_interval < 300 < cold_interval
+    assert cold_interval == 3600
+
+    scheduler.record_requests(40)
+    stats = scheduler.stats(now=now + 3600)
+    assert stats["total_comments"] == 95
+    assert stats["avg_detection_latency"] == 10
+    assert stats["hot_notes"] == 0 and stats["dormant_notes"] == 1
+    print(f"\n  热门笔记间隔: {hot_interval:.0f}s | 冷门笔记间隔: {cold_interval:.0f}s")
+    print(f"  请求/小时: {stats['requests_per_hour']} | 平均发现延迟: {stats['avg_detection_latency']}s")
+
+    # 批量回调异常时，本轮取出的笔记仍然重新排期
+    import tempfile
+    import threading
+
+    class FailingMonitor(XHSMonitor):
+        def check_new_comments(self, note_id):
+            return [{"comment_id": f"{note_id}_c1", "content": "你好"}]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        monitor = FailingMonitor(config={
+            "xiaohongshu": {"note_ids": ["note_a", "note_b"]},
+            "storage": {
+                "dedup_db": str(Path(tmp_dir) / "dedup.db"),
+                "scheduler_stats": str(Path(tmp_dir) / "stats.json")
+            }
+        })
+        stop_event = threading.Event()
+
+        def failing_batch(results):
+            stop_event.set()
+            raise RuntimeError("批量处理失败")
+
+        monitor.start_monitoring(batch_callback=failing_batch, stop_event=stop_event)
+        assert sorted(note_id for _, note_id in monitor.scheduler._heap) == ["note_a", "note_b"]
+        print("  回调异常后笔记仍在调度中")
+
+    print("\n✅ 自适应轮询调度测试通过")
+
+
+def test_reply_outbox():
+    """测试回复发件箱"""
+    print("\n" + "=" * 60)
+    print("测试回复发件箱")
+    print("=" * 60)
+
+    import tempfile
+    import time
+
+    sent = []
+    calls = []
+
+    def fake_send(note_id, comment_id, content):
+        calls.append(comment_id)
+        # 第一次发送 c2 失败，之后成功
+        if comment_id == "c2" and calls.count("c2") == 1:
+            return False
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "outbox.db"
+        outbox = ReplyOutbox(fake_send, db_file=db_file, on_sent=sent.append,
+                             reply_delay=0, reply_delay_jitter=0, daily_cap=2,
+                             retry_base_delay=0)
+
+        assert outbox.enqueue("note_001", {"comment_id": "c1", "content": "谢谢"}, "回复1", priority=2)
+        assert outbox.enqueue("note_001", {"comment_id": "c2", "content": "多少钱"}, "回复2", priority=0)
+        assert outbox.enqueue("note_001", {"comment_id": "c3", "content": "好看"}, "回复3", priority=2)
+        # 同一评论不会重复入队
+        assert not outbox.enqueue("note_001", {"comment_id": "c1", "content": "谢谢"}, "回复1")
+        outbox.close()
+
+        # 重启后待发送回复仍在
+        outbox = ReplyOutbox(fake_send, db_file=db_file, on_sent=sent.append,
+                             reply_delay=0, reply_delay_jitter=0, daily_cap=2,
+                             retry_base_delay=0)
+        assert outbox.pending_count() == 3
+
+        for _ in range(5):
+            outbox.process_next(now=time.time() + 1)
+
+        # 高优先级先发，失败后重试，达到每日上限后停止
+        assert calls[:3] == ["c2", "c2", "c1"]
+        assert [item["comment_id"] for item in sent] == ["c2", "c1"]
+        assert outbox.sent_today() == 2
+        assert outbox.pending_count() == 1
+        print(f"\n  发送顺序: {calls} | 今日已发送: {outbox.sent_today()} | 待发送: {outbox.pending_count()}")
+        outbox.close()
+
+        # 排队超时的回复过期，并和发送失败一样回调（归还额度）
+        failed = []
+        outbox = ReplyOutbox(fake_send, db_file=db_file, on_failed=failed.append, reply_ttl_hours=1)
+        outbox.process_next(now=time.time() + 7200)
+        assert [item["comment_id"] for item in failed] == ["c3"]
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+    print("\n✅ 回复发件箱测试通过")
+
+
+def test_reply_budget():
+    """测试回复额度令牌桶"""
+    print("\n" + "=" * 60)
+    print("测试回复额度")
+    print("=" * 60)
+
+    import tempfile
+
+    clock = [1_700_000_000.0]
+    limits = {
+        "account": {"capacity": 5, "period": 86400},
+        "note": {"capacity": 2, "period": 86400},
+        "user": {"capacity": 1, "period": 3600}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "budget.db"
+        budget = ReplyBudget(db_file, limits=limits, clock=lambda: clock[0])
+
+        # 单篇笔记上限只影响该笔记，不占用其他笔记的额度
+        assert budget.try_consume("note_hot", "u1") is None
+        assert budget.try_consume("note_hot", "u2") is None
+        assert budget.try_consume("note_hot", "u3") == "note"
+        assert budget.try_consume("note_cold", "u3") is None
+        # 同一用户短时间内只回复一次
+        assert budget.try_consume("note_cold", "u1") == "user"
+        budget.refund("note_cold", "u3")
+        assert budget.remaining("note", "note_cold") == 2
+        budget.close()
+
+        # 重启后额度不重置
+        budget = ReplyBudget(db_file, limits=limits, clock=lambda: clock[0])
+        assert budget.remaining("account", "default") == 3
+        assert budget.try_consume("note_hot", "u4") == "note"
+        assert set(budget.snapshot("user")) == {"u1", "u2"}
+
+        # 按周期匀速补充：用户额度 1 小时补满，笔记额度 12 小时补回 1 次
+        clock[0] += 12 * 3600
+        assert budget.try_consume("note_hot", "u1") is None
+        assert budget.try_consume("note_hot", "u2") == "note"
+        print(f"\n  剩余额度: 账号 {budget.remaining('account', 'default'):.1f}"
+              f" | note_hot {budget.remaining('note', 'note_hot'):.1f}")
+        budget.close()
+
+    print("\n✅ 回复额度测试通过")
+
+
+def test_reply_log():
+    """测试结构化回复日志"""
+    print("\n" + "=" * 60)
+    print("测试结构化回复日志")
+    print("=" * 60)
+
+    import tempfile
+    from datetime import datetime
+
+    day1 = datetime(2024, 1, 1, 12).timestamp()
+    day2 = datetime(2024, 1, 2, 12).timestamp()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reply_log = ReplyLog(tmp_dir, flush_records=10, flush_interval=0, max_file_bytes=600)
+
+        for index in range(12):
+            reply_log.write({
+                "ts": (day1 if index < 6 else day2) + index,
+                "note_id": "note_a" if index % 2 else "note_b",
+                "user_id": f"u{index % 3}",
+                "category": "price" if index % 4 == 0 else "praise",
+                "comment": f"评论{index}",
+                "reply": f"回复{index}"
+            })
+
+        # 达到条数阈值时写入文件，剩余的留在缓冲中
+        assert len(list(Path(tmp_dir).glob("replies-*.jsonl"))) > 0
+        assert len(reply_log._buffer) == 2
+
+        # 按天切分，超过大小上限后写入下一个分片
+        files = sorted(path.name for path in Path(tmp_dir).glob("replies-*.jsonl"))
+        assert "replies-2024-01-01.jsonl" in files and "replies-2024-01-01.1.jsonl" in files
+
+        records = reply_log.query(note_id="note_a", since="2024-01-02")
+        assert [r["comment"] for r in records] == ["评论11", "评论9", "评论7"]
+        assert len(reply_log.query(category="price", until="2024-01-01")) == 2
+        assert len(reply_log.query(user_id="u0", limit=2)) == 2
+        reply_log.close()
+
+        # 重建索引后查询结果不变
+        reply_log = ReplyLog(tmp_dir)
+        assert reply_log.rebuild_index() == 12
+        assert [r["comment"] for r in reply_log.query(note_id="note_a", since="2024-01-02")] == ["评论11", "评论9", "评论7"]
+        print(f"\n  日志文件: {files}")
+        reply_log.close()
+
+    print("\n✅ 结构化回复日志测试通过")
+
+
+def test_intent_model():
+    """测试意图模型打分路径"""
+    print("\n" + "=" * 60)
+    print("测试意图模型打分路径")
+    print("=" * 60)
+
+    if intent_model.np is None:
+        print("\n⚠️ 未安装 numpy，跳过意图模型测试")
+        return
+
+    import tempfile
+
+    samples = [
+        ("这个颜色的链接能发我一下吗我想下单", "price"),
+        ("链接在哪里呀想下单买一个回家", "price"),
+        ("求链接求链接，下单入口在哪里找到", "price"),
+        ("用了一个月皮肤状态真的变化很大", "product"),
+        ("皮肤状态变好了很多用了一个月左右", "product"),
+        ("敏感肌用了一个月也没有过敏的情况", "product"),
+    ]
+    texts = [text for text, _ in samples]
+    labels = [label for _, label in samples]
+
+    model = intent_model.IntentModel(["price", "product"])
+    accuracy = model.fit(texts, labels)
+    assert accuracy == 1.0
+
+    # 批量打分与逐条打分结果一致
+    batch = model.predict_many(texts)
+    single = [model.predict_many([text])[0] for text in texts]
+    assert [label for label, _ in batch] == labels
+    assert all(abs(b[1] - s[1]) < 1e-5 for b, s in zip(batch, single))
+
+    # 按评论ID缓存，同一条评论不重复打分
+    model.predict_many(texts, [f"c{index}" for index in range(len(texts))])
+    assert model.cached_count() == len(texts)
+    model.predict_many(texts[:2], ["c0", "c1"])
+    assert model.cached_count() == len(texts)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = model.save(Path(tmp_dir) / "intent_model.npz")
+        loaded = intent_model.load_intent_model(path)
+        assert [label for label, _ in loaded.predict_many(texts)] == labels
+
+        # 训练只使用人工标注的 label，日志中关键词规则得出的 category 不作为样本
+        log_dir = Path(tmp_dir) / "replies"
+        log_dir.mkdir()
+        with open(log_dir / "replies-2024-01-01.jsonl", 'w', encoding='utf-8') as f:
+            for record in [
+                {"comment": "多少钱", "category": "price"},
+                {"comment": "用了一个月，敏感肌也没有过敏", "category": "default"},
+                {"comment": "想下单买一个，链接在哪里找到呀", "category": "default", "label": "price"},
+            ]:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        assert intent_model.load_samples(log_dir) == (["想下单买一个，链接在哪里找到呀"], ["price"])
+        samples_file = Path(tmp_dir) / "samples.jsonl"
+        assert intent_model.export_unlabelled(log_dir, samples_file) == 2
+        assert intent_model.load_samples(samples_file=samples_file) == ([], [])
+
+    # 关键词命中和短评论走关键词快速路径，其余长评论由模型批量分类
+    strategy = ReplyStrategy(intent_model=loaded, model_threshold=0.5)
+    comments = ["多少钱", "嗯嗯", "想下单买一个，链接在哪里找到呀", "用了一个月，敏感肌也没有过敏"]
+    analyses = strategy.analyze_many(comments, ["k1", "k2", "m1", "m2"])
+    categories = [analysis["category"] for analysis in analyses]
+    print(f"\n  分类结果: {list(zip(comments, categories))}")
+    assert categories == ["price", "default", "price", "product"]
+    assert "intent" not in analyses[0] and "intent" not in analyses[1]
+    assert loaded.cached_count() == 2
+
+    # 逐条分析与批量分析结果一致
+    strategy.begin_cycle()
+    assert [strategy.classify_comment(c) for c in comments] == categories
+
+    print("\n✅ 意图模型测试通过")
+
+
+def test_template_index():
+    """测试回复模板索引"""
+    print("\n" + "=" * 60)
+    print("测试回复模板索引")
+    print("=" * 60)
+
+    import os
+    import random
+    import tempfile
+    from collections import Counter
+
+    # 别名表抽样比例与权重一致
+    alias = AliasTable([1, 2, 7], random.Random(1))
+    counts = Counter(alias.sample() for _ in range(20000))
+    assert abs(counts[2] / 20000 - 0.7) < 0.02 and abs(counts[0] / 20000 - 0.1) < 0.02
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        template_file = Path(tmp_dir) / "reply_templates.json"
+        stats_file = Path(tmp_dir) / "template_stats.json"
+        with open(template_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "praise": {"templates": ["谢谢A", "谢谢B", "谢谢C", "谢谢D"]},
+                "default": {"templates": ["感谢评论"]}
+            }, f, ensure_ascii=False)
+
+        now = [1000.0]
+        index = TemplateIndex(template_file, stats_file=stats_file, recent_size=3,
+                              clock=lambda: now[0], rng=random.Random(0))
+
+        # 同一用户连续多次回复不会重复最近用过的模板
+        picks = [index.choose("praise", "u1") for _ in range(12)]
+        assert all(picks[i] not in picks[max(0, i - 3):i] for i in range(1, len(picks)))
+        assert index.choose("unknown") == "感谢评论"
+
+        # 回复后用户在窗口内再次评论计入互动，周期开始时重建权重
+        for _ in range(20):
+            index.record_sent("praise", "谢谢A", "u2")
+            assert index.record_engagement("u2")
+            index.record_sent("praise", "谢谢B", "u3")
+            index.record_engagement("u3", now=now[0] + index.engagement_window + 1)
+        assert not index.record_engagement("u9")
+        weights = index.weights("praise")
+        assert weights["谢谢A"] > weights["谢谢C"] > weights["谢谢B"]
+        index.refresh()
+        counts = Counter(index.choose("praise") for _ in range(2000))
+        assert counts["谢谢A"] > counts["谢谢C"] > counts["谢谢B"]
+        print(f"\n  模板权重: {weights} | 抽样: {dict(counts)}")
+
+        # 统计持久化，重启后权重不变
+        assert TemplateIndex(template_file, stats_file=stats_file).weights("praise") == weights
+
+        # 模板文件修改后，下一个处理周期开始时重新加载，关键词自动机同步更新
+        strategy = ReplyStrategy(template_file=template_file)
+        fork = strategy.fork()
+        assert strategy.classify_comment("求攻略") == "default"
+        with open(template_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "question": {"keywords": ["攻略"], "templates": ["攻略私信你"]},
+                "default": {"templates": ["感谢评论"]}
+            }, f, ensure_ascii=False)
+        stat = template_file.stat()
+        os.utime(template_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        strategy.begin_cycle()
+        fork.begin_cycle()
+        assert strategy.classify_comment("求攻略") == "question"
+        assert strategy.select_reply("求攻略", user_id="u1") == "攻略私信你"
+        assert fork.matcher is strategy.matcher and fork.templates is strategy.templates
+
+    print("\n✅ 回复模板索引测试通过")
+
+
+def test_ingest():
+    """测试推送接入"""
+    print("\n" + "=" * 60)
+    print("测试推送接入")
+    print("=" * 60)
+
+    import tempfile
+    import threading
+    import time
+
+    import requests
+
+    # 队列层去重，按笔记分组取出，统计从评论发布到取出的延迟
+    comment_queue = CommentQueue(batch_window=0)
+    now_ms = int(time.time() * 1000)
+    assert comment_queue.put("n1", [{"comment_id": "c1", "create_time": now_ms - 2000}]) == 1
+    comment_queue.put_results({"n1": [{"comment_id": "c1"}, {"comment_id": "c2"}], "n2": [{"comment_id": "c3"}]})
+    batch = comment_queue.get_batch(timeout=0.1)
+    assert {note_id: [c["comment_id"] for c in comments] for note_id, comments in batch.items()} == \
+        {"n1": ["c1", "c2"], "n2": ["c3"]}
+    assert comment_queue.get_batch(timeout=0.01) == {}
+    stats = comment_queue.stats()
+    assert stats["received"] == {"push": 1, "poll": 2} and stats["avg_latency"] >= 2
+
+    # 轮询结果已写入去重库，队列满时分段写入并等待消费者腾出空间，不丢弃
+    comment_queue = CommentQueue(max_size=2, batch_window=0)
+    done = []
+    poll_thread = threading.Thread(target=lambda: done.append(
+        comment_queue.put_results({"n1": [{"comment_id": f"q{i}"} for i in range(5)]})))
+    poll_thread.start()
+    received = []
+    deadline = time.time() + 5
+    while len(received) < 5 and time.time() < deadline:
+        received += [c["comment_id"] for c in comment_queue.get_batch(timeout=0.1).get("n1", [])]
+    poll_thread.join()
+    assert received == [f"q{i}" for i in range(5)] and done == [True]
+    assert comment_queue.stats()["dropped"] == 0
+
+    # 消费者停止后关闭队列，等待中的轮询结果不再阻塞，计入丢弃数
+    assert comment_queue.put_results({"n1": [{"comment_id": "q5"}, {"comment_id": "q6"}]})
+    comment_queue.close()
+    assert comment_queue.put_results({"n2": [{"comment_id": "q7"}]}) is False
+    assert comment_queue.stats()["dropped"] == 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 本地推送接口：接口原始结构和回调结构都可以推送，推送过的评论写入去重库
+        dedup = DedupStore(Path(tmp_dir) / "dedup.db")
+        comment_queue = CommentQueue(batch_window=0)
+        server = PushServer(comment_queue, dedup=dedup, port=0, token="secret")
+        server.start()
+        raw = {"id": "r1", "user": {"user_id": "u1", "nickname": "小红"}, "content": "多少钱", "create_time": now_ms}
+        assert push_comments(server.endpoint, "n1", [raw], token="secret") == 1
+        assert push_comments(server.endpoint, "n1", [raw, {"comment_id": "r2", "content": "好看"}], token="secret") == 1
+        assert "r1" in dedup and dedup.get_watermark("n1") == 0
+        assert requests.post(server.endpoint, json={"note_id": "n1", "comments": []}).status_code == 403
+        assert requests.post(server.endpoint, data="{", headers={"X-Ingest-Token": "secret"}).status_code == 400
+        assert requests.post(server.endpoint, data="{}", headers={"X-Ingest-Token": "secret",
+                                                                 "Content-Length": "abc"}).status_code == 400
+        batch = comment_queue.get_batch(timeout=0.1)
+        assert batch["n1"][0] == {"comment_id": "r1", "user_id": "u1", "user_name": "小红", "content": "多少钱",
+                                  "create_time": now_ms, "like_count": 0}
+
+        # 放不下整批时整批拒绝（503），评论不写入去重库
+        comment_queue._queue.maxsize = 2
+        response = requests.post(server.endpoint, headers={"X-Ingest-Token": "secret"}, json={
+            "note_id": "n1", "comments": [{"comment_id": f"f{i}"} for i in range(3)]})
+        assert response.status_code == 503
+        assert "f0" not in dedup and comment_queue.pending() == 0 and comment_queue.stats()["dropped"] == 3
+        assert push_comments(server.endpoint, "n1", [{"comment_id": "f0"}, {"comment_id": "r1"}], token="secret") == 1
+
+        # 一次推送多个批次时按总数检查容量，不会只入队前面的批次
+        response = requests.post(server.endpoint, headers={"X-Ingest-Token": "secret"}, json=[
+            {"note_id": "n2", "comments": [{"comment_id": "m1"}]},
+            {"note_id": "n3", "comments": [{"comment_id": "m2"}]}
+        ])
+        assert response.status_code == 503
+        assert "m1" not in dedup and comment_queue.pending() == 1
+        assert requests.post(server.endpoint, headers={"X-Ingest-Token": "secret"}, json=[
+            {"note_id": "n2", "comments": [{"comment_id": "m1"}]}, {"note_id": "n3", "comments": "x"}
+        ]).status_code == 400
+        assert "m1" not in dedup and comment_queue.pending() == 1
+        server.stop()
+        dedup.close()
+
+        # 推送模式下系统不轮询，推送的评论几秒内进入发件箱
+        config_file = Path(tmp_dir) / "config.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "ingest": {"mode": "push", "port": 0, "batch_window": 0.05},
+                "reply": {"reply_delay": 0, "reply_delay_jitter": 0},
+                "storage": {
+                    "customer_db": str(Path(tmp_dir) / "customers.json"),
+                    "dedup_db": str(Path(tmp_dir) / "processed_comments.db"),
+                    "outbox_db": str(Path(tmp_dir) / "outbox.db"),
+                    "reply_budget_db": str(Path(tmp_dir) / "reply_budget.db"),
+                    "reply_log": str(Path(tmp_dir) / "replies"),
+                    "template_stats": str(Path(tmp_dir) / "template_stats.json")
+                }
+            }, f)
+
+        system = AutoReplySystem(str(config_file))
+        sent = []
+        system.outbox.send_func = lambda note_id, comment_id, content: sent.append(comment_id) or True
+        system.monitor.check_new_comments = lambda note_id: []
+        stop_event = threading.Event()
+        thread = threading.Thread(target=system.run, kwargs={"stop_event": stop_event, "close": False})
+        thread.start()
+
+        deadline = time.time() + 5
+        while system.push_server is None and time.time() < deadline:
+            time.sleep(0.01)
+        start = time.time()
+        push_comments(system.push_server.endpoint, "n1", [
+            {"comment_id": "p1", "user_id": "u1", "user_name": "u1", "content": "多少钱",
+             "create_time": int(start * 1000)}
+        ])
+        while "p1" not in sent and time.time() < deadline:
+            time.sleep(0.01)
+        latency = time.time() - start
+        stop_event.set()
+        thread.join()
+        system.close()
+
+        assert sent == ["p1"]
+        assert system.comment_queue.stats()["received"] == {"push": 1}
+        print(f"\n  推送到发送: {latency * 1000:.0f}ms")
+
+    print("\n✅ 推送接入测试通过")
+
+
+def test_load_harness():
+    """测试压测工具（小规模回放）"""
+    print("\n" + "=" * 60)
+    print("测试压测工具")
+    print("=" * 60)
+
+    import tempfile
+
+    events = load_harness.synthetic_stream(300, notes=10, users=120, duration=300, seed=1)
+    assert events == load_harness.synthetic_stream(300, notes=10, users=120, duration=300, seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixture = Path(tmp_dir) / "stream.jsonl"
+        load_harness.save_fixture(events, fixture)
+        assert load_harness.load_fixture(fixture) == events
+
+    # 模拟接口按最新在前分页
+    server = load_harness.MockEdithServer(page_size=2)
+    server.publish("n1", [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    page = server._comment_page({"note_id": ["n1"], "cursor": [""]})
+    assert [c["id"] for c in page["comments"]] == ["c", "b"] and page["has_more"]
+    assert [c["id"] for c in server._comment_page({"note_id": ["n1"], "cursor": [page["cursor"]]})["comments"]] == ["a"]
+    server.stop()
+
+    # 全部评论经过监控 → 策略 → 发件箱 → 客户跟踪
+    stats = load_harness.run_load(events, round_seconds=30)
+    users = {event["comment"]["user"]["user_id"] for event in events}
+    assert stats["processed"] == 300 and stats["rounds"] == 10
+    assert stats["customers"] == len(users)
+    assert 0 < stats["replies"] <= 300
+    assert stats["comments_per_second"] > 0 and stats["p99_latency_ms"] >= stats["p50_latency_ms"]
+    print(f"\n  吞吐量: {stats['comments_per_second']} 条/秒 | P50 {stats['p50_latency_ms']}ms"
+          f" | P99 {stats['p99_latency_ms']}ms | 峰值内存 {stats['peak_rss_mb']} MB")
+
+    # 与基线对比
+    assert load_harness.compare_with_baseline(stats, dict(stats)) == []
+    slower = dict(stats, comments_per_second=stats["comments_per_second"] / 2)
+    assert len(load_harness.compare_with_baseline(slower, stats)) == 1
+
+    print("\n✅ 压测工具测试通过")
+
+
+def test_batch_reply():
+    """测试批量回复规划"""
+    print("\n" + "=" * 60)
+    print("测试批量回复规划")
+    print("=" * 60)
+
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = Path(tmp_dir) / "config.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "reply": {"max_reply_per_day": 5, "max_reply_per_note": 3,
+                          "reply_delay": 0, "reply_delay_jitter": 0},
+                "storage": {
+                    "customer_db": str(Path(tmp_dir) / "customers.json"),
+                    "dedup_db": str(Path(tmp_dir) / "processed_comments.db"),
+                    "outbox_db": str(Path(tmp_dir) / "outbox.db"),
+                    "reply_budget_db": str(Path(tmp_dir) / "reply_budget.db"),
+                    "reply_log": str(Path(tmp_dir) / "replies"),
+                    "template_stats": str(Path(tmp_dir) / "template_stats.json")
+                }
+            }, f)
+
+        system = AutoReplySystem(str(config_file))
+        system.outbox.send_func = lambda note_id, comment_id, content: True
+
+        def comment(comment_id, user_id, content, **extra):
+            return dict({"comment_id": comment_id, "user_id": user_id, "user_name": user_id,
+                         "content": content}, **extra)
+
+        results = {
+            "note_hot": [
+                comment("h1", "u1", "谢谢分享"),
+                comment("h2", "u1", "多少钱？"),
+                comment("h3", "u2", "好看"),
+                comment("h4", "u3", "怎么买"),
+                comment("h5", "u4", "喜欢"),
+                comment("h6", "u5", "不错"),
+                comment("h7", "u6", "同问", is_sub_comment=True)
+            ],
+            "note_cold": [
+                comment("c1", "u7", "你好"),
+                comment("c2", "u8", "效果怎么样")
+            ]
+        }
+
+        # 热门笔记受单篇上限限制，剩余额度分给其他笔记
+        assert system.process_batch(results) == 5
+        # 账号额度已用完；用另一个账号探测单篇额度：热门笔记已满 3 条，冷门笔记还剩 1 条
+        assert system.budget.try_consume("note_new", "u_probe", system.account) == "account"
+        assert system.budget.try_consume("note_hot", "u_probe", "probe") == "note"
+        assert system.budget.try_consume("note_cold", "u_probe", "probe") is None
+        assert system.budget.try_consume("note_cold", "u_probe2", "probe") == "note"
+
+        # 同一用户在同一笔记下只回复优先级最高的评论
+        for _ in range(10):
+            system.outbox.process_next(now=time.time() + 1)
+        sent_ids = {item["comment_id"] for item in system.outbox.unrecorded_sent()}
+        assert "h2" in sent_ids and "h1" not in sent_ids and "h7" not in sent_ids
+        assert [r["comment_id"] for r in system.reply_log.query(category="price")] == ["h2"]
+
+        # 今日额度已满，新评论不再入队；已发送回复在下一轮开始时一次写入客户跟踪
+        assert system.process_batch({"note_cold": [comment("c3", "u9", "多少钱")]}) == 0
+        assert system.outbox.unrecorded_sent() == []
+        assert system.tracker.export_summary()["total_customers"] == 5
+        print(f"\n  已发送: {sorted(sent_ids)}")
+
+        system.close()
+
+    print("\n✅ 批量回复规划测试通过")
+
+
+def test_multi_account():
+    """测试多账号运行器"""
+    print("\n" + "=" * 60)
+    print("测试多账号运行器")
+    print("=" * 60)
+
+    import tempfile
+    import threading
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = Path(tmp_dir) / "config.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "xiaohongshu": {"note_ids": [f"note_{index}" for index in range(8)]},
+                "accounts": [
+                    {"name": "a", "cookies": "cookie_a", "note_ids": ["note_a"]},
+                    {"name": "b", "cookies": "cookie_b", "reply": {"max_reply_per_user": 1}}
+                ],
+                "storage": {key: str(Path(tmp_dir) / "data" / Path(default).name)
+                            for key, default in STORAGE_DEFAULTS.items()}
+            }, f)
+
+        runner = MultiAccountRunner(config_file)
+        system_a, system_b = runner.systems["a"], runner.systems["b"]
+
+        # 公共笔记按哈希分给各账号，账号自己的笔记只归自己
+        notes_a = system_a.config["xiaohongshu"]["note_ids"]
+        notes_b = system_b.config["xiaohongshu"]["note_ids"]
+        assert notes_a[0] == "note_a"
+        assert sorted(notes_a[1:] + notes_b) == [f"note_{index}" for index in range(8)]
+        assert runner.systems["b"].monitor.cookies == "cookie_b"
+        assert system_b.budget.limits["user"]["capacity"] == 1
+
+        # 模板和关键词自动机共享一份，周期缓存和数据文件各自独立
+        assert system_a.strategy.matcher is system_b.strategy.matcher
+        assert system_a.strategy.templates is system_b.strategy.templates
+        assert system_a.strategy._cycle_cache is not system_b.strategy._cycle_cache
+        assert system_a.outbox.db_file != system_b.outbox.db_file
+        # 模板效果统计和用户最近模板按账号隔离
+        index_a, index_b = system_a.strategy.template_index, system_b.strategy.template_index
+        assert index_a is not runner.strategy.template_index and index_a._recent is not index_b._recent
+        assert index_a.stats_file == Path(tmp_dir) / "data" / "a" / "template_stats.json"
+        assert index_b.stats_file == Path(tmp_dir) / "data" / "b" / "template_stats.json"
+        template = index_a.choose("price", "u1")
+        assert "u1" not in index_b._recent
+        index_a.record_sent("price", template, "u1")
+        assert index_b._stats == {} and index_a.weights("price") != index_b.weights("price")
+        assert system_b.config["storage"]["accounts_stats"] == str(Path(tmp_dir) / "data" / "b" / "accounts_stats.json")
+
+        system_a.process_batch({"note_a": [
+            {"comment_id": "c1", "user_id": "u1", "user_name": "u1", "content": "多少钱"},
+            {"comment_id": "c2", "user_id": "u2", "user_name": "u2", "content": "好看"}
+        ]})
+        stats = runner.collect_stats()
+        assert stats["a"]["total_comments"] == 2 and stats["a"]["pending"] == 2
+        assert stats["b"]["comments_per_minute"] == 0
+        print(f"\n  账号笔记: a={notes_a} b={notes_b}")
+
+        # 所有账号在线程中运行，停止后统一汇报并关闭（不发送真实请求）
+        for system in runner.systems.values():
+            system.monitor.check_new_comments = lambda note_id: []
+            system.outbox.send_func = lambda note_id, comment_id, content: True
+        timer = threading.Timer(0.5, runner.stop)
+        timer.start()
+        runner.run()
+        timer.join()
+
+    print("\n✅ 多账号运行器测试通过")
+
+
+def test_xhs_client():
+    """测试 API 客户端连接复用与延迟统计"""
+    print("\n" + "=" * 60)
+    print("测试 API 客户端")
+    print("=" * 60)
+
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    connections = []
+    failures = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            if "flaky" in self.path and not failures:
+                # 第一次返回 503，客户端退避后重试
+                failures.append(self.path)
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"data": {"comments": [], "cursor": "", "has_more": False}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = XHSClient(cookies="a=1", user_agent="test", rate_limit=0, http2=False)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    for _ in range(10):
+        response = client.get(base_url + "/api/sns/web/v1/comment/page", params={"note_id": "n1"})
+        assert response.status_code == 200
+        assert response.json()["data"]["has_more"] is False
+
+    stats = client.latency_stats()["/api/sns/web/v1/comment/page"]
+    assert client.request_count == 10
+    assert stats["count"] == 10 and stats["errors"] == 0
+    # keep-alive：10 次请求只建立 1 个连接
+    assert len(connections) == 1
+    print(f"\n  请求: {stats['count']} | 连接: {len(connections)} | P50: {stats['p50_ms']}ms")
+
+    # 503 按退避重试后成功，两次请求都计入统计
+    client.backoff_factor = 0.01
+    response = client.get(base_url + "/flaky")
+    assert response.status_code == 200 and failures == ["/flaky"]
+    flaky_stats = client.latency_stats()["/flaky"]
+    assert flaky_stats["count"] == 2 and flaky_stats["errors"] == 1
+
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+    histogram = LatencyHistogram()
+    for latency in [5, 20, 40, 80, 3000]:
+        histogram.observe(latency)
+    assert histogram.percentile(0.5) == 50
+    assert histogram.percentile(0.99) == 5000
+
+    print("\n✅ API 客户端测试通过")
+
+
 def test_templates():
     """测试模板加载"""
     print("\n" + "=" * 60)
@@ -179,6 +1201,20 @@ def run_all_tests():
 
     test_reply_strategy()
     test_customer_tracker()
+    test_concurrent_poller()
+    test_dedup_store()
+    test_incremental_fetch()
+    test_adaptive_scheduler()
+    test_reply_outbox()
+    test_reply_budget()
+    test_reply_log()
+    test_intent_model()
+    test_template_index()
+    test_ingest()
+    test_load_harness()
+    test_batch_reply()
+    test_multi_account()
+    test_xhs_client()
 
     # 输出测试总结
     print("\n" + "=" * 60)
@@ -212,12 +1248,40 @@ if __name__ == "__main__":
             test_reply_strategy()
         elif test_name == "tracker":
             test_customer_tracker()
+        elif test_name == "poller":
+            test_concurrent_poller()
+        elif test_name == "dedup":
+            test_dedup_store()
+        elif test_name == "incremental":
+            test_incremental_fetch()
+        elif test_name == "scheduler":
+            test_adaptive_scheduler()
+        elif test_name == "outbox":
+            test_reply_outbox()
+        elif test_name == "budget":
+            test_reply_budget()
+        elif test_name == "log":
+            test_reply_log()
+        elif test_name == "intent":
+            test_intent_model()
+        elif test_name == "index":
+            test_template_index()
+        elif test_name == "ingest":
+            test_ingest()
+        elif test_name == "load":
+            test_load_harness()
+        elif test_name == "batch":
+            test_batch_reply()
+        elif test_name == "accounts":
+            test_multi_account()
+        elif test_name == "client":
+            test_xhs_client()
         elif test_name == "templates":
             test_templates()
         elif test_name == "config":
             test_config()
         else:
             print(f"未知测试: {test_name}")
-            print("可用测试: strategy, tracker, templates, config")
+            print("可用测试: strategy, tracker, poller, dedup, incremental, scheduler, outbox, budget, log, intent, index, ingest, load, batch, accounts, client, templates, config")
     else:
         run_all_tests()
@@ -0,0 +1,203 @@
+"""
+小红书 Web API 客户端
+共享连接池（keep-alive）、超时与重试配置、限速，以及按接口统计的延迟直方图
+安装了 httpx[http2] 时自动使用 HTTP/2，否则使用 requests 连接池
+"""
+import bisect
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limit import HostRateLimiter
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+except ImportError:
+    httpx = None
+
+
+API_BASE = "https://edith.xiaohongshu.com"
+
+# 需要重试的响应状态码（限流和服务端错误）
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 延迟直方图桶上界（毫秒）
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        # 最后一个桶存放超过最大上界的请求
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms, error=False):
+        """记录一次请求耗时"""
+        self.counts[bisect.bisect_left(self.buckets, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, ratio):
+        """按桶估算分位数（返回所在桶的上界）"""
+        if not self.total:
+            return None
+        target = self.total * ratio
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets[index] if index < len(self.buckets) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def summary(self):
+        """统计摘要"""
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "avg_ms": round(self.sum_ms / self.total, 1) if self.total else None,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip([f"<={bound}ms" for bound in self.buckets] + ["slower"], self.counts))
+        }
+
+
+class XHSClient:
+    def __init__(self, cookies="", user_agent="", timeout=10, retries=2, backoff_factor=0.5,
+                 pool_size=8, rate_limit=5, http2=True, api_base=API_BASE):
+        """
+        :param cookies: 登录 Cookie
+        :param user_agent: 用户代理
+        :param timeout: 请求超时（秒）
+        :param retries: 连接失败、429/5xx 时的重试次数（只重试 GET）
+        :param backoff_factor: 重试退避系数，第 n 次重试前等待 backoff_factor * 2^(n-1) 秒（429 带 Retry-After 时按其等待）
+        :param pool_size: 连接池大小，应不小于并发数
+        :param rate_limit: 每个域名每秒最多请求数
+        :param http2: 可用时是否启用 HTTP/2
+        :param api_base: 接口路径的前缀地址（压测时指向模拟服务器）
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.api_base = api_base.rstrip("/")
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.headers = {
+            "User-Agent": user_agent,
+            "Cookie": cookies,
+            "Content-Type": "application/json"
+        }
+
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            # 传入 transport 时 httpx.Client 会忽略 limits，连接池大小要设在 transport 上
+            # HTTPTransport 的 retries 只重试连接失败，429/5xx 由 _request 重试
+            self._session = httpx.Client(
+                headers=self.headers,
+                timeout=timeout,
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    retries=retries,
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+                )
+            )
+        else:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+            # 连接失败由 urllib3 重试，429/5xx 与 HTTP/2 一样由 _request 重试
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                allowed_methods=["GET"],
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        self.request_count = 0
+        self._histograms = {}
+        self._stats_lock = threading.Lock()
+
+    def set_cookies(self, cookies):
+        """更新 Cookie（连接池保持不变）"""
+        self.headers["Cookie"] = cookies
+        self._session.headers["Cookie"] = cookies
+
+    def get(self, url, params=None):
+        """
+        发送 GET 请求
+        :param url: 完整地址或以 / 开头的接口路径
+        :param params: 查询参数
+        :return: 响应对象（status_code / json()）
+        """
+        return self._request("GET", url, params=params)
+
+    def post(self, url, json=None):
+        """
+        发送 POST 请求
+        :param url: 完整地址或以 / 开头的接口路径
+        :param json: 请求体
+        :return: 响应对象（status_code / json()）
+        """
+        return self._request("POST", url, json=json)
+
+    def _request(self, method, url, **kwargs):
+        if url.startswith("/"):
+            url = self.api_base + url
+
+        endpoint = urlparse(url).path
+        attempts = self.retries + 1 if method == "GET" else 1
+        for attempt in range(attempts):
+            self.rate_limiter.acquire(url)
+            start = time.perf_counter()
+            error = True
+            try:
+                response = self._session.request(method, url, timeout=self.timeout, **kwargs)
+                error = response.status_code >= 400
+            finally:
+                self._observe(endpoint, (time.perf_counter() - start) * 1000, error)
+
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            time.sleep(self._retry_delay(response, attempt))
+
+    def _retry_delay(self, response, attempt):
+        """第 attempt+1 次重试前的等待秒数：优先使用 Retry-After（秒数形式），否则指数退避"""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    def _observe(self, endpoint, latency_ms, error):
+        with self._stats_lock:
+            self.request_count += 1
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._histograms[endpoint] = histogram
+            histogram.observe(latency_ms, error)
+
+    def latency_stats(self):
+        """
+        各接口的延迟统计
+        :return: {接口路径: 统计摘要}
+        """
+        with self._stats_lock:
+            return {endpoint: histogram.summary() for endpoint, histogram in self._histograms.items()}
+
+    def close(self):
+        """关闭连接池"""
+        self._session.close()